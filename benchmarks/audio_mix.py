@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""Benchmark the in-process NumPy mix against the ffmpeg amix path.
+
+Synthesizes a narration-like track (tone bursts with pauses) and a music
+bed as 48 kHz WAV files, then times both mixing paths on them.
+
+Usage:
+    python benchmarks/audio_mix.py [seconds ...] [--repeat N]
+"""
+
+import argparse
+from pathlib import Path
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from core.services import audio_engine  # noqa: E402
+
+RATE = 48000
+
+
+def synthesize(directory: Path, seconds: float):
+    """Write voice.wav and music.wav of ``seconds`` length into ``directory``."""
+    np = audio_engine.np
+    rng = np.random.default_rng(0)
+    t = np.arange(int(seconds * RATE)) / RATE
+    # Two seconds of "speech" out of every three, with a wobbling pitch
+    speaking = (t % 3.0) < 2.0
+    voice = 0.3 * np.sin(2 * np.pi * (180 + 40 * np.sin(2 * np.pi * 3 * t)) * t) * speaking
+    voice += 0.01 * rng.standard_normal(t.size) * speaking
+    music = 0.4 * (np.sin(2 * np.pi * 220 * t) + 0.5 * np.sin(2 * np.pi * 330 * t))
+    voice_path, music_path = directory / "voice.wav", directory / "music.wav"
+    audio_engine.write_wav(str(voice_path), voice[:, None].astype(np.float32))
+    audio_engine.write_wav(str(music_path), np.stack([music, music], axis=1).astype(np.float32))
+    return voice_path, music_path
+
+
+def time_call(fn, repeat: int) -> float:
+    """Best wall time of ``repeat`` calls, in seconds."""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("seconds", nargs="*", type=float, default=[60, 300, 900])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    if not audio_engine.has_numpy:
+        sys.exit("NumPy is not installed")
+    has_ffmpeg = shutil.which("ffmpeg") is not None
+
+    print(f"{'length':>8}  {'numpy mix':>10}  {'ffmpeg mix':>10}  {'numpy LUFS':>10}")
+    with tempfile.TemporaryDirectory() as tmp:
+        directory = Path(tmp)
+        for seconds in args.seconds:
+            voice, music = synthesize(directory, seconds)
+            out_numpy = directory / "mix_numpy.wav"
+            numpy_time = time_call(
+                lambda: audio_engine.mix_tracks(str(voice), str(music), str(out_numpy), 0.15), args.repeat
+            )
+            lufs = audio_engine.integrated_loudness(audio_engine.decode_audio(str(out_numpy)))
+
+            ffmpeg_time = "n/a"
+            if has_ffmpeg:
+                cmd = ["ffmpeg", "-y", "-i", str(voice), "-i", str(music), "-filter_complex",
+                       "[1:a]volume=0.15[music];[0:a][music]amix=inputs=2:duration=shortest",
+                       "-ac", "2", str(directory / "mix_ffmpeg.mp3")]
+                ffmpeg_time = f"{time_call(lambda: subprocess.run(cmd, check=True, capture_output=True), args.repeat):.2f}s"
+
+            print(f"{seconds:>7.0f}s  {numpy_time:>9.2f}s  {ffmpeg_time:>10}  {lufs:>10.1f}")
+
+    if not has_ffmpeg:
+        print("ffmpeg not found; only the in-process path was timed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""Measure CLI import time with ``python -X importtime`` against a startup budget.
+
+Imports the entry point in fresh interpreters and reports the cumulative
+import time of the module and its slowest direct dependencies. Exits
+non-zero when the best run is over budget, so it can gate CI.
+
+Usage:
+    python benchmarks/import_time.py [--module cli.build_project] [--budget-ms 250] [--repeat 5]
+"""
+
+import argparse
+from pathlib import Path
+import re
+import subprocess
+import sys
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# "import time: self [us] | cumulative | imported package"
+_LINE = re.compile(r'^import time:\s+(\d+)\s*\|\s*(\d+)\s*\|(\s*)(\S+)$')
+
+# Provider SDKs that should only load when a live call needs them
+HEAVY_MODULES = ("replicate", "boto3", "botocore", "requests", "jinja2", "numpy", "yaml")
+
+
+def measure(module: str):
+    """Import ``module`` in a fresh interpreter.
+
+    Returns:
+        (total microseconds, {top-level module: cumulative microseconds},
+        set of every module imported)
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    )
+    total = 0
+    children = {}
+    pending = {}
+    pending_all = set()
+    imported = set()
+    # Lines are written as each import finishes, so a module's dependencies
+    # come just before it, indented two spaces deeper
+    for line in result.stderr.splitlines():
+        match = _LINE.match(line)
+        if not match:
+            continue
+        cumulative, depth, name = int(match.group(2)), len(match.group(3)), match.group(4)
+        if depth == 1:
+            if name == module:
+                total, children = cumulative, pending
+                imported.update(pending_all)
+            pending, pending_all = {}, set()
+            continue
+        if depth == 3:
+            pending[name] = cumulative
+        pending_all.add(name)
+    return total, children, imported
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--module", default="cli.build_project")
+    parser.add_argument("--budget-ms", type=float, default=250.0)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    runs = [measure(args.module) for _ in range(max(1, args.repeat))]
+    total, children, imported = min(runs, key=lambda run: run[0])
+
+    print(f"{args.module}: {total / 1000:.1f} ms (best of {len(runs)}, budget {args.budget_ms:.0f} ms)")
+    for name, cumulative in sorted(children.items(), key=lambda item: -item[1])[:args.top]:
+        print(f"  {cumulative / 1000:>7.1f} ms  {name}")
+
+    eager = sorted(name for name in HEAVY_MODULES if name in imported)
+    if eager:
+        print(f"Loaded at import time (should be deferred): {', '.join(eager)}")
+
+    if total / 1000 > args.budget_ms:
+        sys.exit(f"Over budget by {total / 1000 - args.budget_ms:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,6 +5,7 @@ from pathlib import Path
 import time
 import os
 import sys
+from typing import Optional
 
 # Load environment variables from .env file
 try:
@@ -24,13 +25,10 @@ except ImportError:
                     key, value = line.split('=', 1)
                     os.environ[key.strip()] = value.strip()
 
-try:  # pragma: no cover - optional dependency
-    import yaml
-except ModuleNotFoundError:  # pragma: no cover - optional dependency
-    yaml = None
-
-from core.utils.config import config
-from core.utils.logger import setup_logger, log_step, log_timing
+from core.utils.config import Config, config, config_for, load_profile, has_yaml
+from core.utils.logger import setup_logger, log_step, log_timing, get_log_context
+from core.utils import metrics
+from core.utils.clock import clock_for, use_clock
 import re
 from datetime import datetime
 
@@ -117,24 +115,52 @@ def _simple_yaml(text: str) -> dict:
             stack[-1][1][key] = value
     return data
 
-from core.chains.cohesive_script_builder import generate_cohesive_script, validate_script_timing
-from core.chains.segment_visualizer import generate_segment_visuals, create_storyboard_summary
+from core.chains.cohesive_script_builder import (
+    generate_cohesive_script, validate_script_timing, plan_chapters, iter_chapter_scripts
+)
+from core.chains.segment_visualizer import (
+    generate_segment_visuals, create_storyboard_summary, generate_visual_theme,
+    iter_segment_visuals, format_storyboard_header, format_storyboard_scene, generate_single_visual
+)
+from core.chains.build_manifest import (
+    MANIFEST_NAME, clip_missing, load_manifest, plan_rebuild, resolve_path, stale_segments, write_manifest
+)
 from core.chains.narrator_voice_gen import build_voiceover
-from core.services.replicate_api import render_video_segments
-from core.services.video_composer import compose_video_segments
+from core.chains.narration_timing import apply_narration_timing
+from core.chains.visual_dedup import VisualDeduplicator, dedupe_visual_segments
+from core.services.replicate_api import render_video_segments, estimate_render_seconds
+from core.services.model_router import route_segments
+from core.services.video_composer import compose_video_segments, concat_audio_tracks
 from core.services.music_generator import generate_background_music, mix_audio_tracks
-from core.services.s3_deployer import deploy
+from core.services.video_packager import package_video
+from core.services.preview_composer import PreviewComposer
+from core.services.s3_deployer import BackgroundUploader, deploy_package
 from core.services.dashboard_generator import generate_dashboard, collect_prompts_from_logs
 
 
-def build_project_from_dict(project_config: dict) -> None:
-    """Run the full pipeline using the given project configuration dictionary."""
-    # Merge project config with global config
-    merged_config = config.merge_project_config(project_config)
-    _run_pipeline(merged_config)
+def build_project_from_dict(project_config: dict, profile: Optional[str] = None,
+                            overrides: Optional[dict] = None) -> None:
+    """Run the full pipeline using the given project configuration dictionary.
+    
+    Args:
+        project_config: Project settings; an optional nested ``config`` key
+            overrides global settings for this project only
+        profile: Config profile to layer over the base config (e.g. "test")
+        overrides: Nested or dotted-key config overrides from the CLI
+    """
+    # Layer base, profile, project and CLI settings in memory
+    settings = config
+    if profile or project_config.get('config') or overrides:
+        settings = load_profile(profile, project_config.get('config'), overrides)
+    merged_config = settings.merge_project_config(project_config)
+    with use_clock(clock_for(merged_config)) as run_clock:
+        _run_pipeline(merged_config)
+    if run_clock.virtual:
+        print(f"🕒 Simulated provider time: {run_clock.elapsed:.1f}s (virtual clock)")
 
 
-def build_project(config_input: str) -> None:
+def build_project(config_input: str, profile: Optional[str] = None,
+                  overrides: Optional[dict] = None) -> None:
     """Run the full pipeline using the given YAML configuration or text prompt."""
     
     # Check if input is a file path or a text prompt
@@ -143,7 +169,8 @@ def build_project(config_input: str) -> None:
         with open(config_input) as f:
             text = f.read()
 
-        if yaml is not None:
+        if has_yaml:
+            import yaml
             project_config = yaml.safe_load(text)
         else:
             project_config = _simple_yaml(text)
@@ -151,11 +178,114 @@ def build_project(config_input: str) -> None:
         # It's a text prompt - create a simple project config
         project_config = create_project_from_prompt(config_input)
     
-    build_project_from_dict(project_config)
+    build_project_from_dict(project_config, profile, overrides)
+
+
+def _use_long_form(merged_config: dict) -> bool:
+    """Decide whether a run should use the chunked long-form pipeline."""
+    settings = config_for(merged_config)
+    if 'long_form' in merged_config:
+        return bool(merged_config['long_form'])
+    if settings.get('pipeline.long_form.enabled', False):
+        return True
+    duration = merged_config.get('total_duration', settings.get_int('pipeline.video.total_duration'))
+    return duration >= settings.get('pipeline.long_form.threshold_seconds', 600)
+
+
+def _start_uploader(merged_config: dict, output_dir: Path) -> Optional[BackgroundUploader]:
+    """Start uploading artifacts to S3 as soon as they land in ``output_dir``.
+    
+    Returns None in stub mode, where nothing is deployed.
+    """
+    settings = config_for(merged_config)
+    if settings.get_bool('development.use_stubs'):
+        return None
+    uploader = BackgroundUploader(merged_config, base_dir=output_dir)
+    if settings.get('api.s3.background.enabled', True):
+        uploader.watch()
+    return uploader
+
+
+def _stream_sink(uploader: Optional[BackgroundUploader], merged_config: dict):
+    """Return the callback that uploads the final video while it is muxed."""
+    if uploader is None or not config_for(merged_config).get('api.s3.background.stream_final_video', True):
+        return None
+    return uploader.upload_stream
+
+
+def _start_preview(merged_config: dict, segment_info: list, output_dir: Path,
+                   audio_path: Optional[str] = None) -> Optional[PreviewComposer]:
+    """Start the rolling preview if ``pipeline.preview.enabled`` is set."""
+    if not config_for(merged_config).get('pipeline.preview.enabled', False):
+        return None
+    return PreviewComposer(segment_info, output_dir, merged_config, audio_path)
+
+
+def _write_preview_dashboard(preview: Optional[PreviewComposer], project_data: dict, output_dir: Path,
+                             pipeline_start: float) -> None:
+    """Write the dashboard while segments render so it can play the rolling preview.
+    
+    The page plays ``preview/preview.mp4`` until ``final_video.mp4`` exists;
+    the dashboard written at the end of the run replaces it.
+    """
+    if preview is None:
+        return
+    generate_dashboard(project_data, output_dir, time.time() - pipeline_start)
+
+
+def _long_form_dashboard_data(merged_config: dict, segments_path: Path, segment_count: int,
+                              total_words: int, routing: dict) -> dict:
+    """Dashboard data for a long-form run, which reads segments from disk rather than memory."""
+    settings = config_for(merged_config)
+    project_data = {
+        **merged_config,
+        'segments_file': str(segments_path),
+        'segment_count': segment_count,
+        'total_words': total_words,
+        'video_model': merged_config.get('video_model', settings.get('api.replicate.video_model', 'unknown')),
+        'routing': routing,
+    }
+    # ``segments`` in the project config is the CLI's segment count, not a list
+    project_data.pop('segments', None)
+    return project_data
+
+
+def _route(merged_config: dict, visual_segments: list, share: float = 1.0) -> Optional[dict]:
+    """Assign per-segment video models if ``api.replicate.routing.enabled`` is set.
+    
+    Args:
+        merged_config: Merged project configuration
+        visual_segments: Segments about to be rendered
+        share: Fraction of the render deadline available to these segments
+    """
+    settings = config_for(merged_config)
+    if not settings.get('api.replicate.routing.enabled', False):
+        return None
+    deadline = float(settings.get('api.replicate.routing.deadline_minutes', 30)) * 60 * share
+    return route_segments(visual_segments, merged_config, deadline)
+
+
+def _segment_callback(uploader: Optional[BackgroundUploader], preview: Optional[PreviewComposer]):
+    """Return the callback run as each video segment finishes rendering."""
+    if uploader is None and preview is None:
+        return None
+    
+    def on_segment(segment: dict, path: str) -> None:
+        if uploader is not None:
+            uploader.submit(path)
+        if preview is not None:
+            preview.add_segment(segment['index'], path)
+    
+    return on_segment
 
 
 def _run_pipeline(merged_config: dict) -> None:
     """Execute the actual pipeline with the merged configuration."""
+    settings = config_for(merged_config)
+    if _use_long_form(merged_config):
+        _run_long_form_pipeline(merged_config)
+        return
+    
     # Start overall timing
     pipeline_start = time.time()
     
@@ -165,11 +295,12 @@ def _run_pipeline(merged_config: dict) -> None:
     # Set up logger
     logger = setup_logger(__name__, project_name)
     
-    output_dir = Path(merged_config.get("output_dir", config.get("pipeline.output.directory", "output")))
+    output_dir = Path(merged_config.get("output_dir", settings.get("pipeline.output.directory", "output")))
     output_dir.mkdir(parents=True, exist_ok=True)
+    uploader = _start_uploader(merged_config, output_dir)
 
     topic = merged_config.get('technical_topic', 'your topic')
-    duration = merged_config.get('total_duration', config.get('pipeline.video.total_duration', 45))
+    duration = merged_config.get('total_duration', settings.get_int('pipeline.video.total_duration'))
     
     # Log pipeline start
     logger.info("=" * 60)
@@ -177,7 +308,7 @@ def _run_pipeline(merged_config: dict) -> None:
     logger.info(f"Topic: {topic}")
     logger.info(f"Duration: {duration} seconds")
     logger.info(f"Output directory: {output_dir}")
-    logger.info(f"Mode: {'STUB' if config.get('development.use_stubs', True) else 'PRODUCTION'}")
+    logger.info(f"Mode: {'STUB' if settings.get_bool('development.use_stubs') else 'PRODUCTION'}")
     logger.info("=" * 60)
     
     print(f"\n🎬 Creating {duration}-second video about: {topic}")
@@ -195,7 +326,14 @@ def _run_pipeline(merged_config: dict) -> None:
     step_start = time.time()
     log_step(logger, 2, "Validating segment timing")
     print("2️⃣  Validating segment timing...")
-    segments = validate_script_timing(segments, config.get('pipeline.timing.words_per_minute', 150))
+    segments = validate_script_timing(segments, settings.get_int('pipeline.timing.words_per_minute'), merged_config)
+    voice_path = None
+    narration_timing = None
+    if settings.get('pipeline.timing.audio_driven.enabled', False):
+        # Narrate first so segment lengths come from the measured audio
+        print("   Measuring narration timing...")
+        voice_path = build_voiceover(full_script, merged_config)
+        narration_timing = apply_narration_timing(segments, voice_path, merged_config)
     log_timing(logger, "Timing validation", time.time() - step_start)
     
     # Step 3: Generate visuals for each segment
@@ -203,6 +341,7 @@ def _run_pipeline(merged_config: dict) -> None:
     log_step(logger, 3, "Creating visual descriptions for each segment")
     print("3️⃣  Creating visual descriptions for each segment...")
     visual_segments = generate_segment_visuals(topic, segments, merged_config)
+    visual_segments = dedupe_visual_segments(visual_segments, merged_config)
     log_timing(logger, "Visual description generation", time.time() - step_start)
     
     # Step 4: Create storyboard
@@ -227,13 +366,14 @@ def _run_pipeline(merged_config: dict) -> None:
     step_start = time.time()
     log_step(logger, 5, "Synthesizing voiceover")
     print("5️⃣  Synthesizing voiceover...")
-    voice_path = build_voiceover(full_script, merged_config)
+    if voice_path is None:
+        voice_path = build_voiceover(full_script, merged_config)
     log_timing(logger, "Voice synthesis", time.time() - step_start)
     logger.debug(f"Voice file saved to: {voice_path}")
     
     # Step 6: Generate background music (optional)
     music_path = None
-    if config.get('api.music.enabled', False):
+    if settings.get_bool('api.music.enabled'):
         print("6️⃣  Creating background music...")
         music_path = generate_background_music(topic, duration, merged_config)
         
@@ -243,8 +383,9 @@ def _run_pipeline(merged_config: dict) -> None:
             mixed_audio_path = mix_audio_tracks(
                 voice_path, 
                 music_path, 
-                output_dir / "final_audio.mp3",
-                music_volume=0.15  # Keep music subtle
+                output_dir / "final_audio.wav",
+                music_volume=0.15,  # Keep music subtle
+                project_config=merged_config
             )
             # Use mixed audio for video
             audio_for_video = mixed_audio_path
@@ -257,7 +398,22 @@ def _run_pipeline(merged_config: dict) -> None:
     step_start = time.time()
     log_step(logger, 7, "Generating video segments", f"{len(visual_segments)} segments")
     print("7️⃣  Generating video segments...")
-    video_segments = render_video_segments(visual_segments, merged_config)
+    preview = _start_preview(merged_config, visual_segments, output_dir, audio_for_video)
+    routing = _route(merged_config, visual_segments)
+    dashboard_data = {
+        **merged_config,
+        'segments': segments,
+        'visual_segments': visual_segments,
+        'video_model': merged_config.get('video_model', settings.get('api.replicate.video_model', 'unknown')),
+        'routing': routing,
+    }
+    _write_preview_dashboard(preview, dashboard_data, output_dir, pipeline_start)
+    render_eta = estimate_render_seconds(visual_segments, merged_config)
+    logger.info(f"Estimated render time: {render_eta / 60:.1f} min")
+    print(f"   Estimated render time: ~{render_eta / 60:.1f} min")
+    video_segments = render_video_segments(
+        visual_segments, merged_config, on_segment=_segment_callback(uploader, preview)
+    )
     log_timing(logger, "Video segment generation", time.time() - step_start)
     
     # Step 8: Compose final video
@@ -268,44 +424,64 @@ def _run_pipeline(merged_config: dict) -> None:
         video_segments, 
         audio_for_video, 
         visual_segments,
-        output_dir / "final_video.mp4"
+        output_dir / "final_video.mp4",
+        merged_config,
+        stream_sink=_stream_sink(uploader, merged_config)
     )
+    if preview is not None:
+        preview.close()
     log_timing(logger, "Video composition", time.time() - step_start)
     
+    # Package for progressive web playback
+    package = None
+    if settings.get('pipeline.packaging.enabled', True):
+        step_start = time.time()
+        log_step(logger, 8, "Packaging for web playback")
+        print("   Packaging fragmented MP4 and HLS...")
+        package = package_video(
+            final_video,
+            output_dir,
+            merged_config.get('segment_duration', settings.get_int('pipeline.video.segment_duration')),
+            len(visual_segments),
+            merged_config
+        )
+        log_timing(logger, "Web packaging", time.time() - step_start)
+    
     # Save metadata
     metadata = {
         'topic': topic,
         'duration': duration,
         'segments': len(segments),
-        'words_per_minute': config.get('pipeline.timing.words_per_minute', 150),
+        'words_per_minute': settings.get_int('pipeline.timing.words_per_minute'),
         'total_words': sum(s['words'] for s in segments),
-        'video_model': merged_config.get('video_model', config.get('api.replicate.video_model', 'unknown'))
+        'video_model': merged_config.get('video_model', settings.get('api.replicate.video_model', 'unknown')),
+        'routing': routing,
+        'estimated_render_seconds': round(render_eta, 1),
+        'narration_timing': narration_timing,
+        'package': package,
+        'metrics': metrics.snapshot(get_log_context().get('run_id'))
     }
     
     import json
     (output_dir / "metadata.json").write_text(json.dumps(metadata, indent=2))
+    # Record what each artifact was built from for `--rebuild`
+    if len(video_segments) == len(visual_segments):
+        write_manifest(output_dir, merged_config, full_script, visual_segments, video_segments,
+                       voice_path, music_path, audio_for_video, final_video)
     
-    if not config.get('development.use_stubs', True):
+    if uploader is not None:
+        # Uploads have been running in the background; wait for the rest
         step_start = time.time()
         log_step(logger, 9, "Deploying to S3")
         print("9️⃣  Deploying to S3...")
-        deploy(voice_path, merged_config)
-        deploy(final_video, merged_config)
-        if music_path:
-            deploy(music_path, merged_config)
+        if package:
+            deploy_package(package, merged_config, uploader=uploader)
+        uploader.wait([voice_path, final_video, music_path])
         log_timing(logger, "S3 deployment", time.time() - step_start)
 
     # Generate dashboard before final summary
-    # Prepare project data for dashboard
-    project_data = {
-        **merged_config,
-        'segments': segments,
-        'visual_segments': visual_segments,
-        'video_model': merged_config.get('video_model', config.get('api.replicate.video_model', 'unknown')),
-    }
-    
     # Collect prompts from logs
-    prompts_log = collect_prompts_from_logs(Path("logs"), project_name)
+    prompts_log = collect_prompts_from_logs(Path("logs"), project_name, merged_config)
     
     # Calculate total time before dashboard generation
     total_time = time.time() - pipeline_start
@@ -314,7 +490,7 @@ def _run_pipeline(merged_config: dict) -> None:
     step_start = time.time()
     log_step(logger, 10, "Generating project dashboard")
     dashboard_path = generate_dashboard(
-        project_data,
+        dashboard_data,
         output_dir,
         total_time,
         prompts_log
@@ -342,6 +518,459 @@ def _run_pipeline(merged_config: dict) -> None:
         print(f"   file://{dashboard_path.absolute()}")
 
 
+def _run_long_form_pipeline(merged_config: dict) -> None:
+    """Execute the pipeline chapter by chapter for long videos.
+    
+    Each chapter is scripted, visualized, voiced and rendered before the
+    next one starts. Text artifacts are appended to disk as they are
+    produced and only file paths are kept between chapters, so memory use
+    stays flat regardless of video duration.
+    """
+    settings = config_for(merged_config)
+    import json
+    
+    pipeline_start = time.time()
+    
+    project_name = merged_config.get('project_name', f"video_{datetime.now().strftime('%Y%m%d_%H%M%S')}")
+    logger = setup_logger(__name__, project_name)
+    
+    output_dir = Path(merged_config.get("output_dir", settings.get("pipeline.output.directory", "output")))
+    output_dir.mkdir(parents=True, exist_ok=True)
+    uploader = _start_uploader(merged_config, output_dir)
+    
+    topic = merged_config.get('technical_topic', 'your topic')
+    duration = merged_config.get('total_duration', settings.get_int('pipeline.video.total_duration'))
+    segment_duration = merged_config.get('segment_duration', settings.get_int('pipeline.video.segment_duration'))
+    wpm = settings.get_int('pipeline.timing.words_per_minute')
+    total_segments = int(duration / segment_duration)
+    
+    logger.info("=" * 60)
+    logger.info(f"Starting long-form pipeline for project: {project_name}")
+    logger.info(f"Topic: {topic}")
+    logger.info(f"Duration: {duration} seconds ({total_segments} segments)")
+    logger.info(f"Output directory: {output_dir}")
+    logger.info(f"Mode: {'STUB' if settings.get_bool('development.use_stubs') else 'PRODUCTION'}")
+    logger.info("=" * 60)
+    
+    print(f"\n🎬 Creating {duration / 60:.0f}-minute video about: {topic}")
+    print(f"📁 Output directory: {output_dir}\n")
+    
+    # Step 1: Outline chapters and a shared visual theme
+    step_start = time.time()
+    log_step(logger, 1, "Outlining chapters")
+    print("1️⃣  Outlining chapters...")
+    chapters = plan_chapters(topic, merged_config)
+    visual_theme = generate_visual_theme(topic, total_segments, segment_duration, merged_config)
+    log_timing(logger, "Chapter outline", time.time() - step_start)
+    logger.debug(f"Planned {len(chapters)} chapters")
+    
+    # Incrementally written artifacts
+    script_path = output_dir / "full_script.txt"
+    storyboard_path = output_dir / "storyboard.md"
+    breakdown_path = output_dir / "segment_breakdown.txt"
+    segments_path = output_dir / "segments.jsonl"
+    script_path.write_text("")
+    storyboard_path.write_text(format_storyboard_header(topic, duration, total_segments))
+    breakdown_path.write_text("")
+    segments_path.write_text("")
+    
+    video_paths = []
+    segment_info = []
+    voice_paths = []
+    total_words = 0
+    routing = {'met': True, 'assignments': {}}
+    deduplicator = VisualDeduplicator(merged_config)
+    audio_driven = settings.get('pipeline.timing.audio_driven.enabled', False)
+    narration_timing = None
+    narration_clock = 0.0
+    
+    preview = _start_preview(
+        merged_config,
+        [{'index': i + 1, 'duration': segment_duration} for i in range(total_segments)],
+        output_dir
+    )
+    on_segment = _segment_callback(uploader, preview)
+    _write_preview_dashboard(preview, _long_form_dashboard_data(merged_config, segments_path, 0, 0, routing),
+                             output_dir, pipeline_start)
+    
+    # Steps 2-7 run per chapter
+    step_start = time.time()
+    for chapter, chapter_text, segments in iter_chapter_scripts(topic, chapters, merged_config):
+        print(f"📖 Chapter {chapter['index']}/{len(chapters)}: {chapter['title']}")
+        log_step(logger, 2, "Processing chapter",
+                 f"{chapter['index']}/{len(chapters)} '{chapter['title']}'")
+        
+        segments = validate_script_timing(segments, wpm, merged_config)
+        voice_paths.append(build_voiceover(
+            chapter_text, merged_config, f"voice/chapter_{chapter['index']:03d}.mp3"
+        ))
+        if audio_driven:
+            timing = apply_narration_timing(segments, voice_paths[-1], merged_config, offset=narration_clock)
+            if timing is not None and narration_timing is None:
+                narration_timing = timing
+            elif timing is not None:
+                narration_timing['render_seconds'] += timing['render_seconds']
+                narration_timing['nominal_seconds'] += timing['nominal_seconds']
+            narration_clock = segments[-1]['end_time']
+        
+        visual_segments = deduplicator.apply(list(iter_segment_visuals(
+            topic, segments, merged_config, visual_theme, total_segments
+        )))
+        # Each chapter gets its share of the render deadline
+        plan = _route(merged_config, visual_segments, len(visual_segments) / total_segments)
+        if plan is not None:
+            routing['assignments'].update(plan['assignments'])
+            routing['met'] = routing['met'] and plan['met']
+        
+        with open(script_path, 'a') as f:
+            f.write(chapter_text.strip() + "\n\n")
+        with open(storyboard_path, 'a') as f:
+            f.write(f"# Chapter {chapter['index']}: {chapter['title']}\n\n")
+            for seg in visual_segments:
+                f.write(format_storyboard_scene(seg))
+        with open(breakdown_path, 'a') as f:
+            for s in segments:
+                f.write(f"[{s['start_time']:02.0f}-{s['end_time']:02.0f}s] {s['text']}\n")
+        with open(segments_path, 'a') as f:
+            for seg in visual_segments:
+                f.write(json.dumps({k: v for k, v in seg.items() if k != 'visual_theme'}) + "\n")
+        
+        video_paths.extend(render_video_segments(visual_segments, merged_config, on_segment=on_segment))
+        segment_info.extend({k: s[k] for k in ('index', 'duration', 'narration_seconds') if k in s}
+                            for s in visual_segments)
+        total_words += sum(s['words'] for s in segments)
+        _write_preview_dashboard(
+            preview, _long_form_dashboard_data(merged_config, segments_path, len(segment_info), total_words, routing),
+            output_dir, pipeline_start
+        )
+        
+        log_timing(logger, f"Chapter {chapter['index']}", time.time() - step_start)
+        step_start = time.time()
+    
+    # Step 5: Join chapter narration
+    step_start = time.time()
+    log_step(logger, 5, "Joining chapter voiceovers", f"{len(voice_paths)} chapters")
+    print("5️⃣  Joining chapter voiceovers...")
+    voice_filename = settings.get("pipeline.output.filenames.voiceover", "final_voiceover.mp3")
+    voice_path = concat_audio_tracks(voice_paths, output_dir / voice_filename, merged_config)
+    if voice_path is None:
+        # Composing without the narration would produce a silent video
+        if preview is not None:
+            preview.close()
+        raise RuntimeError(f"Could not join {len(voice_paths)} chapter voiceovers into {voice_filename}")
+    log_timing(logger, "Voiceover join", time.time() - step_start)
+    
+    # Step 6: Generate background music (optional)
+    music_path = None
+    audio_for_video = voice_path
+    if settings.get_bool('api.music.enabled'):
+        print("6️⃣  Creating background music...")
+        music_path = generate_background_music(topic, duration, merged_config)
+        if music_path:
+            print("   Mixing audio tracks...")
+            audio_for_video = mix_audio_tracks(
+                voice_path,
+                music_path,
+                output_dir / "final_audio.wav",
+                music_volume=0.15,
+                project_config=merged_config
+            )
+    if preview is not None:
+        preview.set_audio(audio_for_video)
+    
+    # Step 8: Compose final video
+    step_start = time.time()
+    log_step(logger, 8, "Assembling final video", f"{len(video_paths)} segments")
+    print("8️⃣  Assembling final video...")
+    final_video = compose_video_segments(
+        video_paths,
+        audio_for_video,
+        segment_info,
+        output_dir / "final_video.mp4",
+        merged_config,
+        stream_sink=_stream_sink(uploader, merged_config)
+    )
+    if preview is not None:
+        preview.close()
+    log_timing(logger, "Video composition", time.time() - step_start)
+    
+    package = None
+    if settings.get('pipeline.packaging.enabled', True):
+        step_start = time.time()
+        log_step(logger, 8, "Packaging for web playback")
+        print("   Packaging fragmented MP4 and HLS...")
+        package = package_video(final_video, output_dir, segment_duration, len(segment_info), merged_config)
+        log_timing(logger, "Web packaging", time.time() - step_start)
+    
+    metadata = {
+        'topic': topic,
+        'duration': duration,
+        'segments': len(segment_info),
+        'chapters': len(chapters),
+        'long_form': True,
+        'words_per_minute': wpm,
+        'total_words': total_words,
+        'video_model': merged_config.get('video_model', settings.get('api.replicate.video_model', 'unknown')),
+        'routing': routing if routing['assignments'] else None,
+        'narration_timing': (dict(narration_timing, narration_seconds=round(narration_clock, 3))
+                             if narration_timing else None),
+        'package': package,
+        'metrics': metrics.snapshot(get_log_context().get('run_id'))
+    }
+    (output_dir / "metadata.json").write_text(json.dumps(metadata, indent=2))
+    
+    if uploader is not None:
+        # Uploads have been running in the background; wait for the rest
+        step_start = time.time()
+        log_step(logger, 9, "Deploying to S3")
+        print("9️⃣  Deploying to S3...")
+        if package:
+            deploy_package(package, merged_config, uploader=uploader)
+        uploader.wait([voice_path, final_video, music_path])
+        log_timing(logger, "S3 deployment", time.time() - step_start)
+    
+    project_data = _long_form_dashboard_data(merged_config, segments_path, len(segment_info), total_words, routing)
+    prompts_log = collect_prompts_from_logs(Path("logs"), project_name, merged_config)
+    
+    step_start = time.time()
+    log_step(logger, 10, "Generating project dashboard")
+    dashboard_path = generate_dashboard(
+        project_data,
+        output_dir,
+        time.time() - pipeline_start,
+        prompts_log
+    )
+    log_timing(logger, "Dashboard generation", time.time() - step_start)
+    
+    total_time = time.time() - pipeline_start
+    logger.info("=" * 60)
+    logger.info(f"Long-form pipeline completed successfully in {total_time:.2f} seconds")
+    logger.info(f"Final video: {final_video}")
+    logger.info(f"Chapters: {len(chapters)} | Segments: {len(segment_info)} | Words: {total_words}")
+    logger.info("=" * 60)
+    
+    print("\n✅ Video creation complete!")
+    print(f"🎥 Final video: {final_video}")
+    print(f"📊 Duration: {duration}s | Chapters: {len(chapters)} | Segments: {len(segment_info)}")
+    print(f"📝 Full script: {script_path}")
+    print(f"⏱️  Total time: {total_time:.2f}s")
+    
+    if dashboard_path:
+        print(f"📋 Dashboard: {dashboard_path}")
+
+
+def rebuild_project(output_dir: str) -> None:
+    """Re-run only the parts of a finished run affected by edits to its script or storyboard.
+    
+    ``full_script.txt`` and ``storyboard.md`` in ``output_dir`` are compared
+    with the run's ``build_manifest.json``. Segments whose narration changed
+    get a new visual prompt (unless their storyboard prompt was edited too),
+    and segments whose prompt or length changed get a new clip. Every other
+    clip is reused, and the video is recomposed. The run's own settings and
+    project config are used, as recorded in the manifest.
+    
+    Args:
+        output_dir: Output directory of a finished short-form run
+    """
+    output_dir = Path(output_dir)
+    try:
+        manifest = load_manifest(output_dir)
+    except FileNotFoundError:
+        print(f"❌ Error: No {MANIFEST_NAME} in {output_dir}; only finished short-form runs can be rebuilt")
+        sys.exit(1)
+    settings = Config.from_spec(manifest['settings'])
+    merged_config = settings.merge_project_config({**manifest['project'], 'output_dir': str(output_dir)})
+    with use_clock(clock_for(merged_config)) as run_clock:
+        _run_rebuild(merged_config, manifest)
+    if run_clock.virtual:
+        print(f"🕒 Simulated provider time: {run_clock.elapsed:.1f}s (virtual clock)")
+
+
+def _run_rebuild(merged_config: dict, manifest: dict) -> None:
+    """Execute an incremental rebuild with the merged configuration of the original run."""
+    settings = config_for(merged_config)
+    pipeline_start = time.time()
+    project_name = merged_config.get('project_name', f"video_{datetime.now().strftime('%Y%m%d_%H%M%S')}")
+    logger = setup_logger(__name__, project_name)
+    output_dir = Path(merged_config['output_dir'])
+    topic = merged_config.get('technical_topic', 'your topic')
+    model_name = merged_config.get('video_model', settings.get('api.replicate.video_model', 'unknown'))
+    clip_paths = [resolve_path(segment['clip_path'], output_dir) for segment in manifest['segments']]
+    final_video = resolve_path(manifest['final_video'], output_dir)
+    
+    logger.info("=" * 60)
+    logger.info(f"Rebuilding project: {project_name}")
+    logger.info(f"Output directory: {output_dir}")
+    logger.info("=" * 60)
+    print(f"\n🔁 Rebuilding video about: {topic}")
+    print(f"📁 Output directory: {output_dir}\n")
+    
+    # Step 1: Find what was edited
+    log_step(logger, 1, "Comparing edits with the last build")
+    print("1️⃣  Comparing edits with the last build...")
+    plan = plan_rebuild(manifest, output_dir)
+    visual_segments = plan['segments']
+    text_changed, prompt_edited = plan['text_changed'], plan['prompt_edited']
+    for segment in visual_segments:
+        edits = [name for name, changed in (('narration', text_changed), ('visual prompt', prompt_edited))
+                 if segment['index'] in changed]
+        if edits:
+            print(f"   Scene {segment['index']}: {' and '.join(edits)} edited")
+    missing = [path for path in clip_paths + [final_video] if clip_missing(path)]
+    if not plan['script_changed'] and not prompt_edited and not missing:
+        print("\n✅ Nothing to rebuild: script, storyboard and clips match the last build")
+        return
+    logger.info(f"Narration edited in segments {sorted(text_changed)}; "
+                f"prompts edited in segments {sorted(prompt_edited)}")
+    uploader = _start_uploader(merged_config, output_dir)
+    
+    # Step 2: New visual prompts for re-narrated segments, unless the editor rewrote the prompt too
+    step_start = time.time()
+    log_step(logger, 2, "Regenerating visual prompts for edited segments")
+    reprompt = text_changed - prompt_edited
+    if reprompt:
+        print(f"2️⃣  Regenerating {len(reprompt)} visual prompts...")
+    metaphor = merged_config.get('metaphor_world')
+    tone = merged_config.get('tone', settings.get('pipeline.defaults.tone', 'educational'))
+    for i, segment in enumerate(visual_segments):
+        if segment['index'] in reprompt:
+            segment['visual_prompt'] = generate_single_visual({
+                'segment_text': segment['text'],
+                'segment_number': segment['index'],
+                'total_segments': len(visual_segments),
+                'visual_theme': segment.get('visual_theme', ''),
+                'previous_text': visual_segments[i-1]['text'] if i > 0 else None,
+                'next_text': visual_segments[i+1]['text'] if i < len(visual_segments)-1 else None,
+                'duration': segment['duration'],
+                'topic': topic,
+                'metaphor': metaphor,
+                'tone': tone
+            }, merged_config)
+    log_timing(logger, "Visual prompt regeneration", time.time() - step_start)
+    
+    # Step 3: Narration is a single take, so any script edit re-synthesizes it
+    voice_path = resolve_path(manifest['voice_path'], output_dir)
+    music_path = resolve_path(manifest['music_path'], output_dir)
+    audio_for_video = resolve_path(manifest['audio_path'], output_dir)
+    narration_timing = None
+    if plan['script_changed']:
+        step_start = time.time()
+        log_step(logger, 3, "Re-synthesizing voiceover")
+        print("3️⃣  Re-synthesizing voiceover...")
+        voice_path = build_voiceover(plan['script'], merged_config)
+        if settings.get('pipeline.timing.audio_driven.enabled', False):
+            narration_timing = apply_narration_timing(visual_segments, voice_path, merged_config)
+        else:
+            for segment in visual_segments:
+                if segment['index'] in text_changed:
+                    for key in ('warning', 'suggested_edit', 'timing_status'):
+                        segment.pop(key, None)
+            validate_script_timing(visual_segments, settings.get_int('pipeline.timing.words_per_minute'),
+                                   merged_config)
+        audio_for_video = voice_path
+        if music_path and os.path.exists(music_path):
+            print("   Remixing audio tracks...")
+            audio_for_video = mix_audio_tracks(
+                voice_path,
+                music_path,
+                output_dir / "final_audio.wav",
+                music_volume=0.15,
+                project_config=merged_config
+            )
+        log_timing(logger, "Voice synthesis", time.time() - step_start)
+    
+    # Step 4: Render clips whose prompt, model or length changed, or that are missing
+    step_start = time.time()
+    stale = stale_segments(visual_segments, manifest, output_dir, model_name, text_changed | prompt_edited)
+    affected = [segment for segment in visual_segments if segment['index'] in stale]
+    log_step(logger, 4, "Re-rendering affected video segments", f"{len(affected)} of {len(visual_segments)}")
+    print(f"4️⃣  Re-rendering {len(affected)} of {len(visual_segments)} video segments...")
+    if affected:
+        rendered = render_video_segments(affected, merged_config, on_segment=_segment_callback(uploader, None))
+        positions = {segment['index']: i for i, segment in enumerate(visual_segments)}
+        for segment, path in zip(affected, rendered):
+            clip_paths[positions[segment['index']]] = path
+    log_timing(logger, "Video segment generation", time.time() - step_start)
+    
+    # Step 5: Recompose
+    step_start = time.time()
+    log_step(logger, 5, "Assembling final video")
+    print("5️⃣  Assembling final video...")
+    final_video = compose_video_segments(
+        clip_paths,
+        audio_for_video,
+        visual_segments,
+        output_dir / "final_video.mp4",
+        merged_config,
+        stream_sink=_stream_sink(uploader, merged_config)
+    )
+    log_timing(logger, "Video composition", time.time() - step_start)
+    package = None
+    if settings.get('pipeline.packaging.enabled', True):
+        print("   Packaging fragmented MP4 and HLS...")
+        package = package_video(
+            final_video,
+            output_dir,
+            merged_config.get('segment_duration', settings.get_int('pipeline.video.segment_duration')),
+            len(visual_segments),
+            merged_config
+        )
+    
+    # Step 6: Refresh the written artifacts; full_script.txt is the editor's and stays as is
+    (output_dir / "storyboard.md").write_text(create_storyboard_summary(visual_segments))
+    (output_dir / "segment_breakdown.txt").write_text("\n".join([
+        f"[{s['start_time']:02.0f}-{s['end_time']:02.0f}s] {s['text']}"
+        for s in visual_segments
+    ]))
+    import json
+    metadata_path = output_dir / "metadata.json"
+    metadata = json.loads(metadata_path.read_text()) if metadata_path.exists() else {'topic': topic}
+    metadata.update({
+        'total_words': sum(s['words'] for s in visual_segments),
+        'package': package,
+        'rebuild': {
+            'rebuilt_at': datetime.now().isoformat(timespec='seconds'),
+            'narration_edited': sorted(text_changed),
+            'prompts_edited': sorted(prompt_edited),
+            'segments_rendered': sorted(stale),
+        },
+        'metrics': metrics.snapshot(get_log_context().get('run_id'))
+    })
+    if narration_timing is not None:
+        metadata['narration_timing'] = narration_timing
+    metadata_path.write_text(json.dumps(metadata, indent=2))
+    write_manifest(output_dir, merged_config, plan['script'], visual_segments, clip_paths,
+                   voice_path, music_path, audio_for_video, final_video)
+    
+    if uploader is not None:
+        step_start = time.time()
+        log_step(logger, 7, "Deploying to S3")
+        print("   Deploying to S3...")
+        if package:
+            deploy_package(package, merged_config, uploader=uploader)
+        uploader.wait([voice_path, final_video])
+        log_timing(logger, "S3 deployment", time.time() - step_start)
+    
+    project_data = {
+        **merged_config,
+        'segments': visual_segments,
+        'visual_segments': visual_segments,
+        'video_model': model_name,
+    }
+    prompts_log = collect_prompts_from_logs(Path("logs"), project_name, merged_config)
+    dashboard_path = generate_dashboard(project_data, output_dir, time.time() - pipeline_start, prompts_log)
+    
+    total_time = time.time() - pipeline_start
+    logger.info(f"Rebuild completed in {total_time:.2f} seconds: {len(stale)} segments re-rendered")
+    print("\n✅ Rebuild complete!")
+    print(f"🎥 Final video: {final_video}")
+    print(f"🔁 Re-rendered {len(stale)} of {len(visual_segments)} segments"
+          f"{' and the narration' if plan['script_changed'] else ''}")
+    print(f"⏱️  Total time: {total_time:.2f}s")
+    if dashboard_path:
+        print(f"📋 Dashboard: {dashboard_path}")
+
+
 def main() -> None:
     parser = argparse.ArgumentParser(
         description="Create beautiful explainer videos with AI",
@@ -349,6 +978,7 @@ def main() -> None:
     )
     parser.add_argument(
         "topic", 
+        nargs="?",
         help="What to explain (e.g., 'how docker technology works')"
     )
     parser.add_argument(
@@ -390,6 +1020,24 @@ def main() -> None:
         default=False,
         help="Disable background music"
     )
+    parser.add_argument(
+        "--preview",
+        action="store_true",
+        default=False,
+        help="Keep a low-resolution preview of the rendered segments up to date while rendering"
+    )
+    parser.add_argument(
+        "--long-form",
+        action="store_true",
+        default=False,
+        help="Generate chapter by chapter for long videos (automatic above the configured threshold)"
+    )
+    parser.add_argument(
+        "--deadline",
+        type=float,
+        default=None,
+        help="Finish rendering within this many minutes, mixing in faster video models as needed"
+    )
     parser.add_argument(
         "--test",
         action="store_true",
@@ -402,32 +1050,45 @@ def main() -> None:
         default=False,
         help="Use production mode (best quality models)"
     )
+    parser.add_argument(
+        "--profile",
+        default=None,
+        help="Config profile to layer over config.yaml (loads config.<profile>.yaml)"
+    )
+    parser.add_argument(
+        "--rebuild",
+        metavar="OUTPUT_DIR",
+        default=None,
+        help="Re-run only what edits to OUTPUT_DIR's full_script.txt or storyboard.md affect"
+    )
     args = parser.parse_args()
     
+    if args.rebuild:
+        # The run's own settings are reused; other flags do not apply
+        rebuild_project(args.rebuild)
+        return
+    if not args.topic:
+        parser.error("a topic is required unless --rebuild is given")
+    
     # Handle mode switching
     if args.test and args.production:
         print("❌ Error: Cannot use both --test and --production flags")
         sys.exit(1)
     
+    # Profiles are layered in memory; config.yaml is never rewritten, so
+    # test and production runs can proceed side by side
+    profile = args.profile
     if args.test:
-        # Load test configuration
-        import shutil
-        config_path = Path(__file__).parent.parent / "config.test.yaml"
-        if config_path.exists():
-            shutil.copy(config_path, Path(__file__).parent.parent / "config.yaml")
-            print("🚀 Using TEST MODE (fast models)")
-            # Override duration for test mode if not specified
-            if args.duration == 45:  # Default value
-                args.duration = 10
-                print("   Duration set to 10s for testing")
+        profile = "test"
+        print("🚀 Using TEST MODE (fast models)")
+        # Override duration for test mode if not specified
+        if args.duration == 45:  # Default value
+            args.duration = 10
+            print("   Duration set to 10s for testing")
     elif args.production:
-        # Load production configuration
-        import shutil
-        config_path = Path(__file__).parent.parent / "config.production.yaml"
-        if config_path.exists():
-            shutil.copy(config_path, Path(__file__).parent.parent / "config.yaml")
-            print("🏆 Using PRODUCTION MODE (best quality)")
-            print("⚠️  This will take 30-45 minutes and cost more")
+        profile = "production"
+        print("🏆 Using PRODUCTION MODE (best quality)")
+        print("⚠️  This will take 30-45 minutes and cost more")
     
     # Create configuration from arguments
     project_name = f"video_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
@@ -445,12 +1106,25 @@ def main() -> None:
         "output_dir": f"output/{project_name}"
     }
     
+    if args.long_form:
+        config_dict['long_form'] = True
+    
     # Handle music configuration
+    overrides = {}
     if args.music:
         config_dict['enable_music'] = True
+        overrides['api.music.enabled'] = True
     elif args.no_music:
         config_dict['enable_music'] = False
-    # Otherwise use config.yaml default
+        overrides['api.music.enabled'] = False
+    # Otherwise use the profile default
+    
+    if args.preview:
+        overrides['pipeline.preview.enabled'] = True
+    
+    if args.deadline is not None:
+        overrides['api.replicate.routing.enabled'] = True
+        overrides['api.replicate.routing.deadline_minutes'] = args.deadline
     
     # Save the generated config for reference
     import json
@@ -460,7 +1134,7 @@ def main() -> None:
         json.dump(config_dict, f, indent=2)
     
     # Run the pipeline
-    build_project_from_dict(config_dict)
+    build_project_from_dict(config_dict, profile, overrides)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,97 @@
+"""Worker process that renders segments queued by build_project runs.
+
+Start any number of these, on this host or on others that share the
+work queue (``pipeline.work_queue``) and the output directory:
+
+    python -m cli.render_worker --threads 2
+"""
+
+import argparse
+from pathlib import Path
+import signal
+import threading
+from typing import Optional
+
+# Load API tokens from .env, as build_project does
+try:
+    from dotenv import load_dotenv
+    env_path = Path(__file__).parent.parent / '.env'
+    if env_path.exists():
+        load_dotenv(env_path)
+except ImportError:
+    pass
+
+from core.utils.config import load_profile
+from core.utils.logger import setup_logger
+from core.utils.work_queue import default_worker_id, open_work_queue, serve
+from core.services.replicate_api import render_segment_job
+
+# Job kinds this worker can run
+HANDLERS = {'render_segment': render_segment_job}
+
+
+def run_worker(profile: Optional[str] = None, threads: int = 1, worker_id: Optional[str] = None,
+               idle_exit: Optional[float] = None) -> int:
+    """Serve jobs from the configured queue until interrupted.
+
+    Args:
+        profile: Config profile used to locate the queue
+        threads: Jobs rendered at the same time
+        worker_id: Name recorded on claimed jobs (defaults to ``host:pid``)
+        idle_exit: Exit after this many seconds without a job
+
+    Returns:
+        Number of jobs handled
+    """
+    settings = load_profile(profile)
+    project_config = {'_settings': settings}
+    logger = setup_logger(__name__)
+    queue = open_work_queue(project_config)
+    if queue is None:
+        raise SystemExit("pipeline.work_queue.backend is 'none'; set it to 'sqlite' or 'file' to use workers")
+
+    worker_id = worker_id or default_worker_id()
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    poll_interval = float(settings.get('pipeline.work_queue.poll_interval', 1.0))
+    heartbeat = float(settings.get('pipeline.work_queue.heartbeat_seconds', 30))
+
+    handled = [0] * threads
+
+    def _serve(slot: int) -> None:
+        handled[slot] = serve(queue, HANDLERS, f"{worker_id}:{slot}", stop, None, poll_interval,
+                              heartbeat, idle_exit, logger)
+
+    logger.info(f"Worker {worker_id} serving {', '.join(HANDLERS)} with {threads} threads")
+    pool = [threading.Thread(target=_serve, args=(slot,), name=f"worker-{slot}") for slot in range(threads)]
+    for thread in pool:
+        thread.start()
+    try:
+        for thread in pool:
+            while thread.is_alive():
+                thread.join(0.5)
+    except KeyboardInterrupt:
+        print("\n⏹️  Finishing current jobs, then stopping...")
+        stop.set()
+        for thread in pool:
+            thread.join()
+    logger.info(f"Worker {worker_id} stopped after {sum(handled)} jobs")
+    return sum(handled)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Render queued video segments")
+    parser.add_argument("--profile", default=None,
+                        help="Config profile used to locate the work queue (loads config.<profile>.yaml)")
+    parser.add_argument("--threads", type=int, default=1, help="Segments rendered at the same time (default: 1)")
+    parser.add_argument("--worker-id", default=None, help="Worker name recorded on jobs (default: host:pid)")
+    parser.add_argument("--idle-exit", type=float, default=None,
+                        help="Exit after this many seconds without work (default: run until stopped)")
+    args = parser.parse_args()
+
+    handled = run_worker(args.profile, max(1, args.threads), args.worker_id, args.idle_exit)
+    print(f"✅ Rendered {handled} queued segments")
+
+
+if __name__ == "__main__":
+    main()
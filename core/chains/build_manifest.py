@@ -0,0 +1,255 @@
+"""Record what each output artifact was built from, and work out what an edit invalidates.
+
+A short-form run writes ``build_manifest.json`` next to its outputs. It
+holds the run's settings and project config, every segment (text, visual
+prompt, clip path and the key the clip was rendered from), and the
+narration, music and final video paths. ``plan_rebuild`` compares the
+editable artifacts (``full_script.txt`` and ``storyboard.md``) against it.
+The dependency chain is script text -> segment -> visual prompt -> clip ->
+composition, and the narration depends on the whole script.
+"""
+
+import difflib
+import hashlib
+import json
+import os
+from pathlib import Path
+import re
+from typing import Any, Dict, List, Optional, Set
+
+from core.utils.config import config_for
+
+MANIFEST_NAME = "build_manifest.json"
+MANIFEST_VERSION = 1
+
+# Lines that follow a scene's visual prompt in storyboard.md (see format_storyboard_scene)
+_AFTER_VISUALS = ('**Clip:**', '**Words:**')
+
+# Fields visual_dedup sets on a segment that reuses another segment's clip
+_REUSE_FIELDS = ('reuse_of', 'reuse_similarity', 'reuse_source_duration', 'reuse_action')
+
+
+def _sha(text: str) -> str:
+    return hashlib.sha256(text.encode()).hexdigest()[:16]
+
+
+def _relative(path: Optional[str], output_dir: Path) -> Optional[str]:
+    """Store artifact paths relative to the output directory so a moved run can still be rebuilt."""
+    if not path:
+        return None
+    try:
+        return str(Path(path).resolve().relative_to(output_dir.resolve()))
+    except ValueError:
+        return str(Path(path).resolve())
+
+
+def resolve_path(path: Optional[str], output_dir: Path) -> Optional[str]:
+    """Turn a path stored in the manifest back into a usable one."""
+    if not path:
+        return None
+    return path if Path(path).is_absolute() else str(output_dir / path)
+
+
+def clip_missing(path: Optional[str]) -> bool:
+    """True if an artifact was never written or is an empty placeholder."""
+    return not path or not os.path.exists(path) or os.path.getsize(path) == 0
+
+
+def clip_key(segment: Dict, model_name: str) -> str:
+    """Identify what a segment's clip is rendered from (prompt, model, length or reuse source)."""
+    if segment.get('reuse_of') is not None:
+        parts = ['reuse', segment['reuse_of'], segment['reuse_action'], segment['reuse_source_duration']]
+    else:
+        parts = [segment['visual_prompt'], segment.get('video_model', model_name)]
+    return _sha(json.dumps(parts + [segment['duration']], default=str))
+
+
+def parse_storyboard(text: str) -> Dict[int, str]:
+    """Return the visual prompt of each scene in a storyboard written by ``create_storyboard_summary``."""
+    prompts: Dict[int, str] = {}
+    scene = None
+    lines: Optional[List[str]] = None
+    for line in text.splitlines():
+        header = re.match(r'^## Scene (\d+)\b', line)
+        if header or (lines is not None and line.startswith(_AFTER_VISUALS)):
+            if scene is not None and lines is not None:
+                prompts[scene] = "\n".join(lines).strip()
+            lines = None
+            if header:
+                scene = int(header.group(1))
+            continue
+        if scene is not None and line.startswith('**Visuals:**'):
+            lines = [line[len('**Visuals:**'):].strip()]
+        elif lines is not None:
+            lines.append(line)
+    if scene is not None and lines is not None:
+        prompts[scene] = "\n".join(lines).strip()
+    return prompts
+
+
+def retext_segments(old_texts: List[str], script: str) -> List[str]:
+    """Split an edited script back into the original segments.
+
+    The edited script is aligned word by word with the original segment
+    texts. Each segment keeps the words now standing where its words
+    were. Words inserted at a boundary stay with the segment before it,
+    and a replacement spanning a boundary is shared out proportionally.
+    The segment count never changes, so untouched segments keep exactly
+    their text.
+    """
+    old_words: List[str] = []
+    bounds = [0]
+    for text in old_texts:
+        old_words.extend(text.split())
+        bounds.append(len(old_words))
+    new_words = script.split()
+    opcodes = difflib.SequenceMatcher(None, old_words, new_words, autojunk=False).get_opcodes()
+
+    def _position(p: int) -> int:
+        for tag, i1, i2, j1, j2 in opcodes:
+            if i1 <= p < i2:
+                if tag == 'equal':
+                    return j1 + p - i1
+                return j1 + round((p - i1) * (j2 - j1) / (i2 - i1))
+        return len(new_words)
+
+    positions = [0] + [_position(p) for p in bounds[1:-1]] + [len(new_words)]
+    for k in range(1, len(positions)):
+        positions[k] = max(positions[k], positions[k - 1])
+    return [" ".join(new_words[a:b]) for a, b in zip(positions, positions[1:])]
+
+
+def write_manifest(output_dir: Path, project_config: Dict, full_script: str, visual_segments: List[Dict],
+                   clip_paths: List[str], voice_path: Optional[str], music_path: Optional[str],
+                   audio_path: Optional[str], final_video: str) -> Path:
+    """Write ``build_manifest.json`` for a finished run.
+
+    Args:
+        output_dir: Run output directory
+        project_config: Merged project configuration
+        full_script: Narration script as written to ``full_script.txt``
+        visual_segments: Final segments, with visual prompts and timing
+        clip_paths: Clip file of each segment, in the same order
+        voice_path: Narration audio
+        music_path: Background music, if any
+        audio_path: Audio muxed into the final video (narration or mix)
+        final_video: Composed video
+
+    Returns:
+        Path of the manifest
+    """
+    settings = config_for(project_config)
+    model_name = project_config.get("video_model", settings.get("api.replicate.video_model", "unknown"))
+    storyboard_path = output_dir / "storyboard.md"
+    manifest = {
+        'version': MANIFEST_VERSION,
+        'settings': settings.spec(),
+        'project': {key: value for key, value in project_config.items() if not key.startswith('_')},
+        'script_sha': _sha(full_script),
+        'storyboard_prompts': parse_storyboard(storyboard_path.read_text()) if storyboard_path.exists() else {},
+        'voice_path': _relative(voice_path, output_dir),
+        'music_path': _relative(music_path, output_dir),
+        'audio_path': _relative(audio_path, output_dir),
+        'final_video': _relative(final_video, output_dir),
+        'segments': [
+            {**segment, 'clip_path': _relative(path, output_dir), 'clip_key': clip_key(segment, model_name)}
+            for segment, path in zip(visual_segments, clip_paths)
+        ],
+    }
+    path = output_dir / MANIFEST_NAME
+    path.write_text(json.dumps(manifest, indent=2, default=str))
+    return path
+
+
+def load_manifest(output_dir: Path) -> Dict[str, Any]:
+    """Read the manifest of a previous run.
+
+    Raises:
+        FileNotFoundError: The directory has no manifest (it was not built
+            by a short-form run, or predates manifests)
+        ValueError: The manifest was written by an incompatible version
+    """
+    manifest = json.loads((output_dir / MANIFEST_NAME).read_text())
+    if manifest.get('version') != MANIFEST_VERSION:
+        raise ValueError(f"Unsupported build manifest version: {manifest.get('version')}")
+    # JSON object keys are strings
+    manifest['storyboard_prompts'] = {int(k): v for k, v in manifest['storyboard_prompts'].items()}
+    return manifest
+
+
+def plan_rebuild(manifest: Dict[str, Any], output_dir: Path) -> Dict[str, Any]:
+    """Diff the edited artifacts against the manifest.
+
+    Returns:
+        ``segments`` (copies updated with edited text and prompts, without
+        the manifest's clip fields), ``script`` (the edited script),
+        ``script_changed``, ``text_changed`` (indexes whose narration
+        changed) and ``prompt_edited`` (indexes whose visual prompt was
+        edited in the storyboard)
+    """
+    segments = [{key: value for key, value in segment.items() if key not in ('clip_path', 'clip_key')}
+                for segment in manifest['segments']]
+    script_path = output_dir / "full_script.txt"
+    script = script_path.read_text() if script_path.exists() else " ".join(s['text'] for s in segments)
+    script_changed = _sha(script) != manifest['script_sha']
+
+    text_changed = set()
+    if script_changed:
+        for segment, text in zip(segments, retext_segments([s['text'] for s in segments], script)):
+            if text != " ".join(segment['text'].split()):
+                segment.update(text=text, words=len(text.split()))
+                text_changed.add(segment['index'])
+
+    prompt_edited = set()
+    storyboard_path = output_dir / "storyboard.md"
+    if storyboard_path.exists():
+        edited = parse_storyboard(storyboard_path.read_text())
+        for segment in segments:
+            prompt = edited.get(segment['index'])
+            if prompt is not None and prompt != manifest['storyboard_prompts'].get(segment['index']):
+                segment['visual_prompt'] = prompt
+                prompt_edited.add(segment['index'])
+
+    return {
+        'segments': segments,
+        'script': script,
+        'script_changed': script_changed,
+        'text_changed': text_changed,
+        'prompt_edited': prompt_edited,
+    }
+
+
+def stale_segments(segments: List[Dict], manifest: Dict[str, Any], output_dir: Path, model_name: str,
+                   edited: Set[int]) -> Set[int]:
+    """Work out which clips must be rendered again, updating ``segments`` in place.
+
+    Edited segments stop reusing another segment's clip, since their new
+    prompt no longer matches it. A clip is stale when its key changed or
+    its file is missing. A segment reusing a stale clip is rendered from
+    its own prompt, because the reuse was matched against the source's
+    old prompt.
+
+    Args:
+        segments: Segments from ``plan_rebuild``, with any new prompts and timing
+        manifest: Manifest of the previous build
+        output_dir: Run output directory
+        model_name: Video model used when a segment names none
+        edited: Indexes whose narration or prompt was edited
+
+    Returns:
+        Indexes of the segments to render
+    """
+    for segment in segments:
+        if segment['index'] in edited:
+            for key in _REUSE_FIELDS:
+                segment.pop(key, None)
+    previous = {segment['index']: segment for segment in manifest['segments']}
+    stale = {segment['index'] for segment in segments
+             if clip_key(segment, model_name) != previous[segment['index']]['clip_key']
+             or clip_missing(resolve_path(previous[segment['index']]['clip_path'], output_dir))}
+    for segment in segments:
+        if segment.get('reuse_of') in stale:
+            for key in _REUSE_FIELDS:
+                segment.pop(key, None)
+            stale.add(segment['index'])
+    return stale
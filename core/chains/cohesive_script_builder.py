@@ -1,11 +1,11 @@
 """Generate a cohesive script that flows naturally for the entire duration."""
 
-from typing import List, Dict, Tuple
+from typing import List, Dict, Tuple, Iterator, Optional
 from pathlib import Path
 
 from core.utils.template_renderer import render_template
 from core.services.bedrock_nova import run_prompt
-from core.utils.config import config as global_config
+from core.utils.config import config_for
 from core.utils.tokenizer import count_tokens
 
 
@@ -16,15 +16,16 @@ def generate_cohesive_script(topic: str, project_config: Dict) -> Tuple[str, Lis
         - Full script text
         - List of segments with text and timing
     """
+    settings = config_for(project_config)
     # Get video configuration
     total_duration = project_config.get('total_duration', 
-                                       global_config.get('pipeline.video.total_duration', 45))
+                                       settings.get_int('pipeline.video.total_duration'))
     segment_duration = project_config.get('segment_duration',
-                                        global_config.get('pipeline.video.segment_duration', 5))
+                                        settings.get_int('pipeline.video.segment_duration'))
     num_segments = int(total_duration / segment_duration)
     
     # Calculate target words for the script
-    wpm = global_config.get('pipeline.timing.words_per_minute', 150)
+    wpm = settings.get_int('pipeline.timing.words_per_minute')
     target_words = int((total_duration / 60) * wpm)
     
     # Generate the full script first
@@ -40,15 +41,120 @@ Requirements:
 
 Write ONLY the narration text, no formatting or metadata."""
 
-    full_script = run_prompt(script_prompt)
+    full_script = run_prompt(script_prompt, project_config)
     
     # Now intelligently segment the script
-    segments = segment_script(full_script, num_segments, segment_duration, wpm)
+    segments = segment_script(full_script, num_segments, segment_duration, wpm, project_config)
     
     return full_script, segments
 
 
-def segment_script(script: str, num_segments: int, segment_duration: float, wpm: int) -> List[Dict]:
+def plan_chapters(topic: str, project_config: Dict) -> List[Dict]:
+    """Outline a long-form video as a list of chapters.
+    
+    A single short LLM call returns one chapter title per line. The outline
+    is the only thing kept for the whole video; chapter scripts are generated
+    and discarded one at a time by ``iter_chapter_scripts``.
+    
+    Returns:
+        List of chapters with index, title, duration and start_time
+    """
+    settings = config_for(project_config)
+    total_duration = project_config.get('total_duration',
+                                       settings.get_int('pipeline.video.total_duration'))
+    segment_duration = project_config.get('segment_duration',
+                                        settings.get_int('pipeline.video.segment_duration'))
+    chapter_duration = project_config.get('chapter_duration',
+                                        settings.get('pipeline.long_form.chapter_duration', 120))
+    
+    # Chapters must hold a whole number of segments
+    chapter_duration = max(segment_duration, int(chapter_duration // segment_duration) * segment_duration)
+    num_chapters = max(1, -(-int(total_duration) // int(chapter_duration)))
+    
+    outline_prompt = f"""Outline a {total_duration // 60}-minute narrated video explaining "{topic}".
+
+Split it into exactly {num_chapters} chapters that build on each other.
+Write ONLY the chapter titles, one per line, no numbering or extra text."""
+
+    titles = []
+    for line in run_prompt(outline_prompt, project_config).splitlines():
+        title = line.strip().lstrip('0123456789.-*) ').strip()
+        if title:
+            titles.append(title)
+    
+    chapters = []
+    start_time = 0
+    for i in range(num_chapters):
+        duration = min(chapter_duration, total_duration - start_time)
+        chapters.append({
+            'index': i + 1,
+            'title': titles[i] if i < len(titles) else f"Part {i + 1}",
+            'duration': duration,
+            'start_time': start_time
+        })
+        start_time += duration
+    
+    return chapters
+
+
+def iter_chapter_scripts(topic: str, chapters: List[Dict],
+                         project_config: Dict) -> Iterator[Tuple[Dict, str, List[Dict]]]:
+    """Generate the script chapter by chapter with rolling context.
+    
+    Each chapter prompt sees the outline and the tail of the previous
+    chapter, so the narration flows across chapter boundaries without
+    holding the whole script in memory.
+    
+    Yields:
+        (chapter, chapter script text, timed segments for the chapter)
+    """
+    settings = config_for(project_config)
+    segment_duration = project_config.get('segment_duration',
+                                        settings.get_int('pipeline.video.segment_duration'))
+    wpm = settings.get_int('pipeline.timing.words_per_minute')
+    context_words = settings.get('pipeline.long_form.context_words', 150)
+    outline = "\n".join(f"{c['index']}. {c['title']}" for c in chapters)
+    
+    previous_tail = ""
+    segment_offset = 0
+    for chapter in chapters:
+        target_words = int((chapter['duration'] / 60) * wpm)
+        continuity = (f'The previous chapter ended with:\n"...{previous_tail}"\n\n'
+                      "Continue naturally from there without repeating it.\n"
+                      if previous_tail else "This is the opening chapter.\n")
+        
+        chapter_prompt = f"""You are writing chapter {chapter['index']} of {len(chapters)} of a narration script explaining "{topic}".
+
+Chapter outline:
+{outline}
+
+This chapter: "{chapter['title']}"
+{continuity}
+Requirements:
+- Exactly {target_words} words (for {wpm} words per minute pace)
+- Clear, flowing explanation that builds understanding
+- Engaging and easy to understand (ELI5 level)
+- Must work as continuous narration (no headings or scene breaks)
+
+Write ONLY the narration text, no formatting or metadata."""
+
+        chapter_text = run_prompt(chapter_prompt, project_config)
+        
+        num_segments = max(1, int(chapter['duration'] / segment_duration))
+        segments = segment_script(chapter_text, num_segments, segment_duration, wpm, project_config)
+        for seg in segments:
+            seg['index'] += segment_offset
+            seg['start_time'] += chapter['start_time']
+            seg['end_time'] += chapter['start_time']
+            seg['chapter'] = chapter['index']
+        segment_offset += len(segments)
+        
+        previous_tail = " ".join(chapter_text.split()[-context_words:])
+        yield chapter, chapter_text, segments
+
+
+def segment_script(script: str, num_segments: int, segment_duration: float, wpm: int,
+                   project_config: Optional[Dict] = None) -> List[Dict]:
     """Break a script into timed segments at natural breaking points.
     
     This function tries to:
@@ -56,9 +162,10 @@ def segment_script(script: str, num_segments: int, segment_duration: float, wpm:
     2. Break at punctuation when possible
     3. Maintain roughly equal timing per segment
     """
+    settings = config_for(project_config)
     # Target words per segment
     words_per_segment = int((segment_duration / 60) * wpm * 
-                           global_config.get('pipeline.timing.buffer_percentage', 0.9))
+                           settings.get_float('pipeline.timing.buffer_percentage'))
     
     # Split into sentences first
     import re
@@ -163,9 +270,10 @@ def segment_script(script: str, num_segments: int, segment_duration: float, wpm:
     return segments
 
 
-def validate_script_timing(segments: List[Dict], wpm: int) -> List[Dict]:
+def validate_script_timing(segments: List[Dict], wpm: int, project_config: Optional[Dict] = None) -> List[Dict]:
     """Validate and adjust segment timing to ensure speakability."""
-    buffer = global_config.get('pipeline.timing.buffer_percentage', 0.9)
+    settings = config_for(project_config)
+    buffer = settings.get_float('pipeline.timing.buffer_percentage')
     
     for seg in segments:
         # Calculate actual speaking time needed
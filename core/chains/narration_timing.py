@@ -0,0 +1,141 @@
+"""Set segment timing from the synthesized narration instead of words-per-minute estimates."""
+
+import math
+from typing import Dict, List, Optional, Tuple
+
+from core.utils.config import config_for
+from core.utils.logger import setup_logger
+from core.services.elevenlabs_api import load_alignment
+from core.services.music_library import probe_duration
+
+
+def _alignment_words(alignment: Dict) -> List[Tuple[float, float]]:
+    """Return (start, end) seconds for each whitespace-separated word in an alignment."""
+    words = []
+    current = None
+    for char, start, end in zip(alignment.get('characters', []),
+                                alignment.get('character_start_times_seconds', []),
+                                alignment.get('character_end_times_seconds', [])):
+        if char.isspace():
+            if current is not None:
+                words.append(current)
+                current = None
+        elif current is None:
+            current = (start, end)
+        else:
+            current = (current[0], end)
+    if current is not None:
+        words.append(current)
+    return words
+
+
+def _timestamp_boundaries(segments: List[Dict], alignment: Dict,
+                          total: Optional[float]) -> Optional[List[float]]:
+    """Segment boundaries (seconds) from provider word timestamps.
+
+    Each segment runs from the start of its first word to the start of the
+    next segment's first word, so pauses stay with the segment before them.
+    """
+    words = _alignment_words(alignment)
+    counts = [len(seg['text'].split()) for seg in segments]
+    if not words or not sum(counts):
+        return None
+
+    # Scale script word positions onto the alignment in case the provider
+    # normalized the text (numbers spelled out, punctuation split off)
+    scale = len(words) / sum(counts)
+    boundaries = [0.0]
+    position = 0
+    for count in counts[:-1]:
+        position += count
+        boundaries.append(words[min(len(words) - 1, round(position * scale))][0])
+    boundaries.append(max(words[-1][1], total or 0.0))
+    return boundaries
+
+
+def _proportional_boundaries(segments: List[Dict], total: float) -> List[float]:
+    """Segment boundaries from the narration length, shared out by character count."""
+    weights = [max(1, len(seg['text'].replace(' ', ''))) for seg in segments]
+    boundaries = [0.0]
+    for weight in weights:
+        boundaries.append(boundaries[-1] + total * weight / sum(weights))
+    return boundaries
+
+
+def render_length(narration_seconds: float, step: float, minimum: float) -> float:
+    """Round a narration length up to the render granularity.
+
+    Returns:
+        Seconds to request from the video model (an int for whole seconds)
+    """
+    length = max(minimum, math.ceil(narration_seconds / step - 1e-6) * step)
+    return int(length) if float(length).is_integer() else round(length, 2)
+
+
+def apply_narration_timing(segments: List[Dict], voice_path: str, project_config: Optional[Dict] = None,
+                           offset: float = 0.0) -> Optional[Dict]:
+    """Time ``segments`` (in place) by their measured narration.
+
+    Word timestamps saved by the TTS provider are used when present.
+    Otherwise the narration length is probed and shared out by character
+    count. Each segment gets ``narration_start`` and ``narration_seconds``;
+    ``start_time`` and ``end_time`` follow the narration, and ``duration``
+    (the render length) is the narration rounded up to
+    ``pipeline.timing.audio_driven.render_step``.
+
+    Args:
+        segments: Script segments covering the whole of ``voice_path``
+        voice_path: Synthesized narration for these segments
+        project_config: Optional project configuration
+        offset: Start of this narration within the final video (long-form
+            chapters)
+
+    Returns:
+        Summary with ``source``, ``narration_seconds``, ``render_seconds``
+        and ``nominal_seconds``, or None if the narration could not be
+        measured (segments are then left unchanged)
+    """
+    settings = config_for(project_config)
+    logger = setup_logger(__name__)
+    if not segments:
+        return None
+
+    total = probe_duration(voice_path)
+    alignment = load_alignment(voice_path)
+    boundaries = None
+    source = 'timestamps'
+    if alignment:
+        boundaries = _timestamp_boundaries(segments, alignment, total)
+    if boundaries is None and total:
+        boundaries = _proportional_boundaries(segments, total)
+        source = 'audio'
+    if boundaries is None:
+        logger.warning(f"Could not measure narration in {voice_path}; keeping estimated segment timing")
+        return None
+
+    step = float(settings.get('pipeline.timing.audio_driven.render_step', 1.0))
+    minimum = float(settings.get('pipeline.timing.audio_driven.min_render_seconds', 2))
+    nominal = sum(seg['duration'] for seg in segments)
+    for seg, start, end in zip(segments, boundaries, boundaries[1:]):
+        seconds = round(end - start, 3)
+        seg.update({
+            'narration_start': round(offset + start, 3),
+            'narration_seconds': seconds,
+            'start_time': round(offset + start, 3),
+            'end_time': round(offset + end, 3),
+            'duration': render_length(seconds, step, minimum),
+            'timing_status': 'measured',
+        })
+        seg.pop('warning', None)
+        seg.pop('suggested_edit', None)
+
+    narration = boundaries[-1]
+    rendered = sum(seg['duration'] for seg in segments)
+    logger.info(f"Timed {len(segments)} segments from narration ({source}): {narration:.1f}s spoken, "
+                f"{rendered}s to render instead of {nominal}s")
+    return {
+        'source': source,
+        'narration_seconds': round(narration, 3),
+        'render_seconds': rendered,
+        'nominal_seconds': nominal,
+    }
@@ -1,13 +1,13 @@
 """Narrator voice generation chain."""
 
-from typing import List
+from typing import List, Optional, Union
 
 from core.services.elevenlabs_api import synthesize_voice
 
 
-def build_voiceover(script: List[str], config: dict) -> str:
+def build_voiceover(script: Union[str, List[str]], config: dict, filename: Optional[str] = None) -> str:
     """Generate a voiceover file using the ElevenLabs service."""
 
-    text = "\n".join(script)
-    return synthesize_voice(text, config)
+    text = script if isinstance(script, str) else "\n".join(script)
+    return synthesize_voice(text, config, filename)
 
@@ -1,11 +1,11 @@
 """Generate visual prompts for each script segment."""
 
-from typing import List, Dict
+from typing import List, Dict, Iterator, Optional
 from pathlib import Path
 
 from core.utils.template_renderer import render_template
 from core.services.bedrock_nova import run_prompt
-from core.utils.config import config as global_config
+from core.utils.config import config_for
 
 
 def generate_segment_visuals(topic: str, segments: List[Dict], project_config: Dict) -> List[Dict]:
@@ -16,14 +16,20 @@ def generate_segment_visuals(topic: str, segments: List[Dict], project_config: D
     2. Maintain visual continuity across segments
     3. Are appropriate for the topic and tone
     """
+    visual_theme = generate_visual_theme(topic, len(segments), segments[0]['duration'], project_config)
+    return list(iter_segment_visuals(topic, segments, project_config, visual_theme))
+
+
+def generate_visual_theme(topic: str, num_segments: int, segment_duration: float, project_config: Dict) -> str:
+    """Generate the overall visual theme shared by every segment."""
+    settings = config_for(project_config)
     # Determine visual style
     metaphor = project_config.get('metaphor_world')
-    tone = project_config.get('tone', global_config.get('pipeline.defaults.tone', 'educational'))
+    tone = project_config.get('tone', settings.get('pipeline.defaults.tone', 'educational'))
     
-    # Generate overall visual theme first
     theme_prompt = f"""Define a consistent visual style for a video explaining "{topic}".
 
-The video will have {len(segments)} scenes, each {segments[0]['duration']} seconds long.
+The video will have {num_segments} scenes, each {segment_duration} seconds long.
 {"Use the metaphor of " + metaphor + " throughout." if metaphor else "Use clear, literal visuals."}
 Tone: {tone}
 
@@ -35,17 +41,32 @@ Describe:
 
 Keep it brief and actionable."""
 
-    visual_theme = run_prompt(theme_prompt)
+    return run_prompt(theme_prompt, project_config)
+
+
+def iter_segment_visuals(
+    topic: str,
+    segments: List[Dict],
+    project_config: Dict,
+    visual_theme: str,
+    total_segments: Optional[int] = None
+) -> Iterator[Dict]:
+    """Yield visual segments one at a time for a batch of script segments.
     
-    # Generate visual for each segment
-    visual_segments = []
+    Long-form runs call this once per chapter, passing the video-wide
+    ``total_segments`` so scene numbering stays consistent.
+    """
+    settings = config_for(project_config)
+    metaphor = project_config.get('metaphor_world')
+    tone = project_config.get('tone', settings.get('pipeline.defaults.tone', 'educational'))
+    total_segments = total_segments or len(segments)
     
     for i, segment in enumerate(segments):
         # Create context from previous and next segments
         context = {
             'segment_text': segment['text'],
             'segment_number': segment['index'],
-            'total_segments': len(segments),
+            'total_segments': total_segments,
             'visual_theme': visual_theme,
             'previous_text': segments[i-1]['text'] if i > 0 else None,
             'next_text': segments[i+1]['text'] if i < len(segments)-1 else None,
@@ -56,18 +77,16 @@ Keep it brief and actionable."""
         }
         
         # Generate visual prompt
-        visual_prompt = generate_single_visual(context)
+        visual_prompt = generate_single_visual(context, project_config)
         
-        visual_segments.append({
+        yield {
             **segment,  # Include all timing info
             'visual_prompt': visual_prompt,
             'visual_theme': visual_theme
-        })
-    
-    return visual_segments
+        }
 
 
-def generate_single_visual(context: Dict) -> str:
+def generate_single_visual(context: Dict, project_config: Optional[Dict] = None) -> str:
     """Generate a visual prompt for a single segment."""
     
     prompt = f"""Create a {context['duration']}-second video scene prompt.
@@ -87,26 +106,46 @@ Requirements:
 
 Write a concise, specific prompt for video generation:"""
 
-    return run_prompt(prompt)
+    return run_prompt(prompt, project_config)
 
 
 def create_storyboard_summary(visual_segments: List[Dict]) -> str:
     """Create a summary storyboard of all segments."""
     
-    storyboard = f"# Storyboard: {visual_segments[0].get('topic', 'Video')}\n\n"
-    storyboard += f"Total Duration: {sum(s['duration'] for s in visual_segments)} seconds\n"
-    storyboard += f"Segments: {len(visual_segments)}\n\n"
+    storyboard = format_storyboard_header(
+        visual_segments[0].get('topic', 'Video'),
+        sum(s['duration'] for s in visual_segments),
+        len(visual_segments)
+    )
     
     for seg in visual_segments:
-        time_range = f"[{seg['start_time']:02.0f}:{seg['end_time']:02.0f}]"
-        storyboard += f"## Scene {seg['index']} {time_range}\n"
-        storyboard += f"**Narration:** {seg['text'][:100]}...\n" if len(seg['text']) > 100 else f"**Narration:** {seg['text']}\n"
-        storyboard += f"**Visuals:** {seg['visual_prompt']}\n"
-        storyboard += f"**Words:** {seg['words']} | **Duration:** {seg['duration']}s\n\n"
+        storyboard += format_storyboard_scene(seg)
     
     return storyboard
 
 
+def format_storyboard_header(topic: str, total_duration: float, segment_count: int) -> str:
+    """Format the storyboard title block."""
+    header = f"# Storyboard: {topic}\n\n"
+    header += f"Total Duration: {total_duration} seconds\n"
+    header += f"Segments: {segment_count}\n\n"
+    return header
+
+
+def format_storyboard_scene(seg: Dict) -> str:
+    """Format a single storyboard scene entry."""
+    time_range = f"[{seg['start_time']:02.0f}:{seg['end_time']:02.0f}]"
+    scene = f"## Scene {seg['index']} {time_range}\n"
+    scene += f"**Narration:** {seg['text'][:100]}...\n" if len(seg['text']) > 100 else f"**Narration:** {seg['text']}\n"
+    scene += f"**Visuals:** {seg['visual_prompt']}\n"
+    if seg.get('reuse_of') is not None:
+        action = {'reuse': 'reused as is', 'trim': 'trimmed', 'retime': 're-timed'}[seg['reuse_action']]
+        scene += (f"**Clip:** reuses Scene {seg['reuse_of']} ({seg['reuse_similarity']:.0%} similar prompt, "
+                  f"{action} from {seg['reuse_source_duration']}s)\n")
+    scene += f"**Words:** {seg['words']} | **Duration:** {seg['duration']}s\n\n"
+    return scene
+
+
 def optimize_visual_transitions(visual_segments: List[Dict]) -> List[Dict]:
     """Add transition hints to ensure smooth visual flow."""
     
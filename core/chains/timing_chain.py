@@ -10,7 +10,7 @@ def estimate_timing(script: List[str], wpm: int = None) -> List[Dict[str, float]
     if wpm is None:
         wpm = global_config.get('pipeline.timing.words_per_minute', 120)
     
-    min_seconds = global_config.get('pipeline.timing.minimum_seconds_per_line', 1.0)
+    min_seconds = global_config.get_float('pipeline.timing.minimum_seconds_per_line')
     
     timings = []
     for line in script:
@@ -4,23 +4,21 @@ from pathlib import Path
 from typing import List, Dict
 
 from core.utils.template_renderer import render_template
-from jinja2 import Template
 from core.utils.prompt_cleaner import clean_prompt
-from core.utils.config import config as global_config
+from core.utils.config import config_for
 
 
 def generate_video_prompts(storyboard: List[str], config: Dict) -> List[str]:
     """Render a prompt for each storyboard line."""
-    template_file = global_config.get("templates.files.video_prompt", "video_prompt.jinja")
+    settings = config_for(config)
+    template_file = settings.get("templates.files.video_prompt", "video_prompt.jinja")
     template_path = (
         Path(__file__).resolve().parent.parent / "templates" / template_file
     )
 
-    template = Template(template_path.read_text())
-
     ctx = {
-        "metaphor_world": config.get("metaphor_world", global_config.get("pipeline.defaults.metaphor_world", "demo")),
-        "tone": config.get("tone", global_config.get("pipeline.defaults.tone", "neutral")),
+        "metaphor_world": config.get("metaphor_world", settings.get("pipeline.defaults.metaphor_world", "demo")),
+        "tone": config.get("tone", settings.get("pipeline.defaults.tone", "neutral")),
     }
 
     prompts = []
@@ -0,0 +1,116 @@
+"""Detect near-identical visual prompts so one rendered clip can serve several segments."""
+
+import re
+from typing import Dict, FrozenSet, List, Optional
+
+from core.utils.config import config_for
+from core.utils.logger import setup_logger
+from core.utils import metrics
+
+# Words that carry no visual information and only dilute the comparison
+_STOPWORDS = frozenset(
+    "a an the of and or to in on with for at by from as is are be this that it its into over "
+    "while then than so very".split()
+)
+
+
+def normalize_prompt(text: str) -> List[str]:
+    """Lowercase ``text``, strip punctuation and drop stopwords, returning its tokens."""
+    words = re.sub(r'[^a-z0-9\s]', ' ', text.lower()).split()
+    return [word for word in words if word not in _STOPWORDS]
+
+
+def _features(text: str) -> FrozenSet[str]:
+    """Unigrams plus bigrams, so word order counts for something."""
+    tokens = normalize_prompt(text)
+    return frozenset(tokens) | frozenset(f"{a} {b}" for a, b in zip(tokens, tokens[1:]))
+
+
+def _jaccard(a: FrozenSet[str], b: FrozenSet[str]) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def prompt_similarity(a: str, b: str) -> float:
+    """Jaccard similarity of two prompts' word and word-pair sets (0 to 1)."""
+    return _jaccard(_features(a), _features(b))
+
+
+class VisualDeduplicator:
+    """Mark segments whose visual prompt nearly repeats an earlier rendered one.
+
+    A marked segment gets ``reuse_of`` (the source segment index),
+    ``reuse_similarity``, ``reuse_source_duration`` and ``reuse_action``:
+    ``reuse`` for equal durations, ``trim`` when it is shorter than the
+    source and ``retime`` when it is longer (stretched by at most
+    ``max_stretch``). Only segments that are rendered themselves can be
+    sources. Sources are remembered across calls, so long-form chapters can
+    reuse clips from earlier chapters within ``window`` segments.
+    """
+
+    def __init__(self, project_config: Optional[Dict] = None):
+        settings = config_for(project_config)
+        self.enabled = bool(settings.get('pipeline.visual_dedup.enabled', True))
+        self.threshold = float(settings.get('pipeline.visual_dedup.threshold', 0.9))
+        self.window = int(settings.get('pipeline.visual_dedup.window', 10))
+        self.max_stretch = float(settings.get('pipeline.visual_dedup.max_stretch', 1.25))
+        self._sources: List[Dict] = []
+        self._logger = setup_logger(__name__)
+
+    def apply(self, visual_segments: List[Dict]) -> List[Dict]:
+        """Mark near-duplicates in ``visual_segments`` (in place) and return them."""
+        if not self.enabled:
+            return visual_segments
+
+        for segment in visual_segments:
+            features = _features(segment['visual_prompt'])
+            best, best_score = None, 0.0
+            for source in self._sources:
+                if segment['index'] - source['index'] > self.window:
+                    continue
+                if segment['duration'] > source['duration'] * self.max_stretch:
+                    continue
+                score = _jaccard(features, source['features'])
+                if score > best_score:
+                    best, best_score = source, score
+
+            if best is None or best_score < self.threshold:
+                self._sources.append({'index': segment['index'], 'duration': segment['duration'],
+                                      'features': features})
+                continue
+
+            if segment['duration'] < best['duration']:
+                action = 'trim'
+            elif segment['duration'] > best['duration']:
+                action = 'retime'
+            else:
+                action = 'reuse'
+            segment.update({
+                'reuse_of': best['index'],
+                'reuse_similarity': round(best_score, 3),
+                'reuse_source_duration': best['duration'],
+                'reuse_action': action,
+            })
+            metrics.increment('visual_dedup', action=action)
+            self._logger.info(f"Segment {segment['index']} reuses segment {best['index']} "
+                              f"({best_score:.0%} similar, {action})")
+
+        # Forget sources that have fallen out of the window
+        if visual_segments:
+            last = visual_segments[-1]['index']
+            self._sources = [s for s in self._sources if last - s['index'] < self.window]
+        return visual_segments
+
+
+def dedupe_visual_segments(visual_segments: List[Dict], project_config: Optional[Dict] = None) -> List[Dict]:
+    """Mark near-duplicate visual prompts within one batch of segments.
+
+    Args:
+        visual_segments: Segments with visual prompts
+        project_config: Optional project configuration
+
+    Returns:
+        The same segments, with reuse decisions added (see ``VisualDeduplicator``)
+    """
+    return VisualDeduplicator(project_config).apply(visual_segments)
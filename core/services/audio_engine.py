@@ -0,0 +1,237 @@
+"""In-process audio mixing, ducking and loudness normalization with NumPy."""
+
+from pathlib import Path
+import subprocess
+import wave
+from typing import Dict, Optional, Tuple
+from core.utils.config import config_for
+from core.utils.logger import setup_logger
+from core.utils.ffmpeg_runner import FFmpegProcess
+
+try:  # pragma: no cover - optional dependency
+    import numpy as np
+    has_numpy = True
+except ImportError:  # pragma: no cover - optional dependency
+    np = None
+    has_numpy = False
+
+# ITU-R BS.1770 K-weighting at 48 kHz: high shelf, then high pass
+_K_SHELF = ([1.53512485958697, -2.69169618940638, 1.19839281085285],
+            [1.0, -1.69065929318241, 0.73248077421585])
+_K_HIGHPASS = ([1.0, -2.0, 1.0],
+               [1.0, -1.99004745483398, 0.99007225036621])
+_K_RATE = 48000
+
+# Samples per FFT block when filtering long signals
+_CHUNK = 1 << 18
+
+
+def decode_audio(path: str, rate: int = _K_RATE, channels: int = 2,
+                 project_config: Optional[Dict] = None) -> "np.ndarray":
+    """Decode an audio file to a float32 array of shape (samples, channels).
+
+    16-bit WAV files at ``rate`` are read directly; anything else is
+    decoded by ffmpeg into raw float PCM through a pipe.
+    """
+    try:
+        with wave.open(str(path), 'rb') as wav:
+            if wav.getframerate() == rate and wav.getsampwidth() == 2:
+                data = np.frombuffer(wav.readframes(wav.getnframes()), dtype='<i2')
+                samples = data.reshape(-1, wav.getnchannels()).astype(np.float32) / 32768
+                return _to_channels(samples, channels)
+    except (wave.Error, EOFError, OSError):
+        pass
+
+    cmd = ["ffmpeg", "-v", "error", "-i", str(path), "-f", "f32le",
+           "-ac", str(channels), "-ar", str(rate), "pipe:1"]
+    with FFmpegProcess(cmd, "audio_decode", stdout=subprocess.PIPE, project_config=project_config) as process:
+        data = process.stdout.read()
+        process.wait()
+    return np.frombuffer(data, dtype='<f4').reshape(-1, channels).copy()
+
+
+def _to_channels(samples: "np.ndarray", channels: int) -> "np.ndarray":
+    if samples.shape[1] == channels:
+        return samples
+    mono = samples.mean(axis=1, keepdims=True)
+    return np.repeat(mono, channels, axis=1)
+
+
+def write_wav(path: str, samples: "np.ndarray", rate: int = _K_RATE) -> None:
+    """Write float samples in [-1, 1] as 16-bit PCM WAV."""
+    pcm = (np.clip(samples, -1.0, 1.0) * 32767).round().astype('<i2')
+    with wave.open(str(path), 'wb') as wav:
+        wav.setnchannels(samples.shape[1])
+        wav.setsampwidth(2)
+        wav.setframerate(rate)
+        wav.writeframes(pcm.tobytes())
+
+
+def _k_weighting_response(n: int) -> "np.ndarray":
+    """Frequency response of the K-weighting filter on an ``n``-point rfft grid."""
+    z_inv = np.exp(-2j * np.pi * np.arange(n // 2 + 1) / n)
+    response = np.ones_like(z_inv)
+    for b, a in (_K_SHELF, _K_HIGHPASS):
+        response *= np.polyval(b[::-1], z_inv) / np.polyval(a[::-1], z_inv)
+    return response
+
+
+def k_weighted_power(samples: "np.ndarray") -> "np.ndarray":
+    """Channel-summed power of the K-weighted signal, per sample.
+
+    K-weighting is applied by FFT overlap-add with the filter's impulse
+    response. The IIR response decays below float precision within a few
+    thousand samples, so 16k taps are exact for practical purposes.
+    """
+    taps = 1 << 14
+    impulse = np.fft.irfft(_k_weighting_response(taps), taps)
+    n_fft = _CHUNK + taps
+    kernel = np.fft.rfft(impulse, n_fft)[:, None]
+
+    n = samples.shape[0]
+    power = np.zeros(n, dtype=np.float64)
+    tail = np.zeros((taps, samples.shape[1]))
+    for start in range(0, n, _CHUNK):
+        block = samples[start:start + _CHUNK]
+        filtered = np.fft.irfft(np.fft.rfft(block, n_fft, axis=0) * kernel, n_fft, axis=0)
+        filtered[:taps] += tail
+        tail = filtered[_CHUNK:_CHUNK + taps].copy()
+        size = block.shape[0]
+        power[start:start + size] = np.square(filtered[:size]).sum(axis=1)
+    return power
+
+
+def integrated_loudness(samples: "np.ndarray", rate: int = _K_RATE) -> float:
+    """Integrated loudness in LUFS (ITU-R BS.1770-4, gated).
+
+    400 ms blocks with 75% overlap are measured on the K-weighted signal,
+    then gated at -70 LUFS and at 10 LU below the mean of what remains.
+    Channel weights are 1.0 (mono and stereo).
+
+    Returns:
+        Loudness in LUFS, or ``-inf`` for silence
+    """
+    if rate != _K_RATE:
+        raise ValueError(f"Loudness is measured at {_K_RATE} Hz, got {rate}")
+    block, hop = int(0.4 * rate), int(0.1 * rate)
+    if samples.shape[0] < block:
+        return float('-inf')
+
+    power = k_weighted_power(samples)
+    cumulative = np.concatenate(([0.0], np.cumsum(power)))
+    starts = np.arange(0, samples.shape[0] - block + 1, hop)
+    energies = (cumulative[starts + block] - cumulative[starts]) / block
+
+    def _lufs(energy):
+        return -0.691 + 10 * np.log10(energy)
+
+    with np.errstate(divide='ignore'):
+        loudness = _lufs(energies)
+    gated = energies[loudness > -70]
+    if gated.size == 0:
+        return float('-inf')
+    relative = _lufs(gated.mean()) - 10
+    gated = gated[_lufs(gated) > relative]
+    return float(_lufs(gated.mean()))
+
+
+def voice_activity(voice: "np.ndarray", rate: int, threshold_db: float, frame_ms: float = 20,
+                   hold_ms: float = 300) -> Tuple["np.ndarray", int]:
+    """Detect speech frames by short-term RMS, held open across short pauses.
+
+    Returns:
+        Boolean activity per frame and the frame length in samples
+    """
+    frame = max(1, int(rate * frame_ms / 1000))
+    n_frames = -(-voice.shape[0] // frame)
+    mono = np.zeros(n_frames * frame, dtype=np.float32)
+    mono[:voice.shape[0]] = voice.mean(axis=1)
+    with np.errstate(divide='ignore'):
+        rms_db = 10 * np.log10(np.square(mono.reshape(n_frames, frame)).mean(axis=1))
+    active = rms_db > threshold_db
+
+    # Dilate so the music stays down between words and comes up after pauses
+    hold = max(1, int(hold_ms / frame_ms))
+    active = np.convolve(active.astype(np.float32), np.ones(2 * hold + 1), mode='same') > 0
+    return active, frame
+
+
+def ducking_gain(active: "np.ndarray", frame: int, n_samples: int, duck_db: float,
+                 ramp_ms: float = 150, rate: int = _K_RATE) -> "np.ndarray":
+    """Per-sample music gain: 1.0 in pauses, ``duck_db`` down under speech, with smooth ramps."""
+    gain_db = np.where(active, -abs(duck_db), 0.0)
+    ramp = max(1, int(ramp_ms * rate / 1000 / frame))
+    window = np.ones(ramp) / ramp
+    padded = np.pad(gain_db, (ramp, ramp), mode='edge')
+    gain_db = np.convolve(padded, window, mode='same')[ramp:-ramp]
+    centers = (np.arange(gain_db.size) + 0.5) * frame
+    return np.interp(np.arange(n_samples), centers, 10 ** (gain_db / 20)).astype(np.float32)
+
+
+def normalize_loudness(samples: "np.ndarray", target_lufs: float, peak_db: float,
+                       rate: int = _K_RATE) -> Tuple["np.ndarray", float, float]:
+    """Scale ``samples`` to ``target_lufs``, backing off if the peak would exceed ``peak_db``.
+
+    Returns:
+        Normalized samples, measured loudness before and after (LUFS)
+    """
+    before = integrated_loudness(samples, rate)
+    if not np.isfinite(before):
+        return samples, before, before
+    gain = 10 ** ((target_lufs - before) / 20)
+    peak = float(np.abs(samples).max()) * gain
+    ceiling = 10 ** (peak_db / 20)
+    if peak > ceiling:
+        gain *= ceiling / peak
+    return samples * gain, before, before + 20 * np.log10(gain)
+
+
+def mix_tracks(voice_path: str, music_path: Optional[str], output_path: str, music_volume: float = 0.2,
+               project_config: Optional[Dict] = None) -> str:
+    """Mix narration and music in memory and write one PCM WAV for the final mux.
+
+    Both tracks are decoded once. The music is scaled by ``music_volume``
+    and ducked by ``pipeline.audio.duck_db`` while the narrator speaks. The
+    mix is normalized to ``pipeline.audio.target_lufs`` under a peak
+    ceiling and written as 16-bit PCM, so the only lossy encode left is the
+    final mux.
+
+    Args:
+        voice_path: Narration audio
+        music_path: Background music, or None for narration only
+        output_path: Output WAV path
+        music_volume: Music gain (0.0-1.0) while nobody is speaking
+        project_config: Optional merged project configuration
+
+    Returns:
+        Path to the written WAV
+    """
+    settings = config_for(project_config)
+    logger = setup_logger(__name__)
+    rate = _K_RATE
+
+    voice = decode_audio(voice_path, rate, project_config=project_config)
+    mix = voice.astype(np.float32, copy=True)
+    if music_path:
+        music = decode_audio(music_path, rate, project_config=project_config)[:voice.shape[0]]
+        active, frame = voice_activity(
+            voice, rate,
+            threshold_db=float(settings.get('pipeline.audio.voice_threshold_db', -45)),
+            hold_ms=float(settings.get('pipeline.audio.hold_ms', 300))
+        )
+        gain = ducking_gain(active, frame, music.shape[0],
+                            float(settings.get('pipeline.audio.duck_db', 8)), rate=rate)
+        mix[:music.shape[0]] += music * (gain * music_volume)[:, None]
+
+    mix, before, after = normalize_loudness(
+        mix,
+        float(settings.get('pipeline.audio.target_lufs', -16)),
+        float(settings.get('pipeline.audio.peak_db', -1)),
+        rate
+    )
+    out_file = Path(output_path)
+    out_file.parent.mkdir(parents=True, exist_ok=True)
+    write_wav(str(out_file), mix, rate)
+    logger.info(f"Mixed audio in process: {before:.1f} LUFS -> {after:.1f} LUFS, "
+                f"{mix.shape[0] / rate:.1f}s written to {out_file}")
+    return str(out_file)
@@ -1,30 +1,33 @@
 """Bedrock Nova LLM wrapper for text generation."""
 
-from core.utils.config import config as global_config
+from core.utils.config import config_for
+from core.utils import clock
 from core.utils.logger import setup_logger, log_api_call
-from pathlib import Path
+from core.utils.prompt_store import record_prompt
+from core.utils.rate_limiter import get_rate_limiter
+from core.utils.retry import RetryPolicy, call_with_retry
+from typing import Optional
+from core.utils.lazy_imports import has_module
 
-try:
-    import boto3
-    has_boto3 = True
-except ImportError:
-    has_boto3 = False
+# Imported on first live call; see core.utils.lazy_imports
+has_boto3 = has_module('boto3')
 
 
-def run_prompt(prompt: str) -> str:
+def run_prompt(prompt: str, config: Optional[dict] = None) -> str:
     """Run a prompt through Bedrock and return the result.
     
     This is a compatibility wrapper for the existing codebase.
     """
-    return bedrock_complete(prompt, {})
+    return bedrock_complete(prompt, config or {})
 
 
 def bedrock_complete(prompt: str, config: dict) -> str:
     """Complete a prompt using the configured Bedrock model."""
+    settings = config_for(config)
     logger = setup_logger(__name__)
     
     # Check if we're in development mode with stubs
-    use_stubs = global_config.get('development.use_stubs', True) or not has_boto3
+    use_stubs = settings.get_bool('development.use_stubs') or not has_boto3
     
     if use_stubs:
         # Log stub API call
@@ -32,26 +35,20 @@ def bedrock_complete(prompt: str, config: dict) -> str:
                     {"prompt_length": len(prompt), "model": "stub"}, 
                     stub_mode=True)
         
+        start = clock.now()
+        
         # Check for specific development mode handling
-        placeholder = global_config.get('placeholders.llm_output', '[LLM output for: {prompt}...]')
+        placeholder = settings.get('placeholders.llm_output', '[LLM output for: {prompt}...]')
         response = placeholder.format(prompt=prompt[:50])
         
-        # Save prompt for debugging
-        if global_config.get('development.save_prompts', True):
-            prompt_dir = Path(global_config.get('development.prompt_directory', 'debug/prompts'))
-            prompt_dir.mkdir(parents=True, exist_ok=True)
-            
-            import time
-            timestamp = int(time.time() * 1000)
-            prompt_file = prompt_dir / f"bedrock_prompt_{timestamp}.txt"
-            prompt_file.write_text(prompt)
-            logger.debug(f"Saved prompt to: {prompt_file}")
-        
         # Add artificial delay if configured
-        import time
-        delay = global_config.get('development.stub_delay', 0.5)
+        delay = settings.get_float('development.stub_delay')
         if delay > 0:
-            time.sleep(delay)
+            clock.sleep(delay)
+        
+        # Save prompt for debugging
+        if settings.get_bool('development.save_prompts'):
+            record_prompt(prompt, response, "stub", clock.now() - start, project_config=config)
         
         return response
     
@@ -59,11 +56,11 @@ def bedrock_complete(prompt: str, config: dict) -> str:
     import boto3
     
     # Get model from config
-    model_id = config.get('bedrock_model', global_config.get('api.bedrock.model', 'anthropic.claude-3-haiku-20240307-v1:0'))
+    model_id = config.get('bedrock_model', settings.get('api.bedrock.model', 'anthropic.claude-3-haiku-20240307-v1:0'))
     
     # Create Bedrock client with profile
-    profile = config.get('aws_profile', global_config.get('api.bedrock.profile', 'personal'))
-    region = config.get('aws_region', global_config.get('api.bedrock.region', 'us-east-1'))
+    profile = config.get('aws_profile', settings.get('api.bedrock.profile', 'personal'))
+    region = config.get('aws_region', settings.get('api.bedrock.region', 'us-east-1'))
     
     # Log API call
     log_api_call(logger, "Bedrock", "generate", 
@@ -71,6 +68,7 @@ def bedrock_complete(prompt: str, config: dict) -> str:
                  "prompt_length": len(prompt)}, 
                 stub_mode=False)
     
+    start = clock.now()
     try:
         session = boto3.Session(profile_name=profile)
         bedrock = session.client('bedrock-runtime', region_name=region)
@@ -108,12 +106,19 @@ def bedrock_complete(prompt: str, config: dict) -> str:
         
         # Call Bedrock
         import json
-        response = bedrock.invoke_model(
-            modelId=model_id,
-            body=json.dumps(request_body),
-            contentType='application/json',
-            accept='application/json'
-        )
+        limiter = get_rate_limiter('bedrock', model_id, config)
+        
+        def _invoke():
+            with limiter.acquire():
+                return bedrock.invoke_model(
+                    modelId=model_id,
+                    body=json.dumps(request_body),
+                    contentType='application/json',
+                    accept='application/json'
+                )
+        
+        response = call_with_retry(_invoke, RetryPolicy.from_config('bedrock', config),
+                                   'bedrock', 'generate', logger)
         
         # Extract text from response
         response_body = json.loads(response['body'].read())
@@ -136,10 +141,32 @@ def bedrock_complete(prompt: str, config: dict) -> str:
             result = str(response_body)
         
         logger.debug(f"Bedrock response length: {len(result)} characters")
+        
+        if settings.get_bool('development.save_prompts'):
+            input_tokens, output_tokens = _token_counts(response, response_body)
+            record_prompt(prompt, result, model_id, clock.now() - start,
+                          input_tokens, output_tokens, project_config=config)
         return result
     
     except Exception as e:
         logger.error(f"Error calling Bedrock: {type(e).__name__}: {str(e)}")
+        if settings.get_bool('development.save_prompts'):
+            record_prompt(prompt, None, model_id, clock.now() - start, project_config=config)
         # Fallback to placeholder
-        placeholder = global_config.get('placeholders.llm_output', '[LLM output for: {prompt}...]')
-        return placeholder.format(prompt=prompt[:50])
\ No newline at end of file
+        placeholder = settings.get('placeholders.llm_output', '[LLM output for: {prompt}...]')
+        return placeholder.format(prompt=prompt[:50])
+
+def _token_counts(response: dict, response_body: dict) -> tuple:
+    """Extract input/output token counts from a Bedrock response.
+    
+    Claude 3 bodies carry a ``usage`` block; other models only report
+    counts in the invocation response headers.
+    """
+    usage = response_body.get('usage') or {}
+    headers = response.get('ResponseMetadata', {}).get('HTTPHeaders', {})
+    input_tokens = usage.get('input_tokens', headers.get('x-amzn-bedrock-input-token-count'))
+    output_tokens = usage.get('output_tokens', headers.get('x-amzn-bedrock-output-token-count'))
+    return (
+        int(input_tokens) if input_tokens is not None else None,
+        int(output_tokens) if output_tokens is not None else None,
+    )
@@ -2,17 +2,14 @@
 
 from pathlib import Path
 from datetime import datetime
-from typing import Dict, List, Optional
+from typing import Dict, Iterator, List, Optional
 import json
 
-from core.utils.config import config as global_config
-from core.utils.logger import setup_logger
-
-try:
-    from jinja2 import Template
-    has_jinja2 = True
-except ImportError:
-    has_jinja2 = False
+from core.utils.config import config_for
+from core.utils.latency_history import estimate_latency
+from core.utils.logger import setup_logger, get_log_context
+from core.utils.prompt_store import get_run_prompts
+from core.utils.template_renderer import get_template, has_jinja2
 
 
 def generate_dashboard(
@@ -32,6 +29,7 @@ def generate_dashboard(
     Returns:
         Path to the generated dashboard HTML file
     """
+    settings = config_for(project_data)
     logger = setup_logger(__name__)
     logger.info("Generating project dashboard...")
     
@@ -42,14 +40,13 @@ def generate_dashboard(
         logger.error(f"Dashboard template not found at {template_path}")
         return None
     
-    with open(template_path, 'r') as f:
-        template_content = f.read()
-    
     # Prepare data for template
     segments_data = []
-    for i, segment in enumerate(project_data.get('segments', [])):
+    for i, segment in enumerate(_iter_dashboard_segments(project_data)):
         visual_segment = None
-        if 'visual_segments' in project_data:
+        if 'visual_prompt' in segment:
+            visual_segment = segment
+        elif 'visual_segments' in project_data:
             visual_segment = next(
                 (vs for vs in project_data['visual_segments'] if vs.get('index', i) == i),
                 None
@@ -63,13 +60,15 @@ def generate_dashboard(
         })
     
     # Get model information
-    script_model = global_config.get('api.bedrock.model', 'anthropic.claude-3-haiku')
-    voice_model = global_config.get('api.elevenlabs.model_id', 'eleven_monolingual_v1')
-    video_model = project_data.get('video_model', global_config.get('api.replicate.video_model', 'google/veo'))
-    music_model = global_config.get('api.music.model', 'meta/musicgen') if global_config.get('api.music.enabled', False) else None
+    script_model = settings.get('api.bedrock.model', 'anthropic.claude-3-haiku')
+    voice_model = settings.get('api.elevenlabs.model_id', 'eleven_monolingual_v1')
+    video_model = project_data.get('video_model', settings.get('api.replicate.video_model', 'google/veo'))
+    music_model = settings.get('api.music.model', 'meta/musicgen') if settings.get_bool('api.music.enabled') else None
     
     # Calculate statistics
-    total_words = sum(s.get('words', 0) for s in project_data.get('segments', []))
+    total_words = project_data.get('total_words')
+    if total_words is None:
+        total_words = sum(len(s['text'].split()) for s in segments_data)
     
     # Prepare template context
     context = {
@@ -77,7 +76,7 @@ def generate_dashboard(
         'topic': project_data.get('technical_topic', 'Unknown Topic'),
         'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
         'total_duration': project_data.get('total_duration', 45),
-        'segment_count': len(segments_data),
+        'segment_count': project_data.get('segment_count', len(segments_data)),
         'segment_duration': project_data.get('segment_duration', 5),
         'total_words': total_words,
         'generation_time': f"{generation_time:.1f}",
@@ -90,16 +89,16 @@ def generate_dashboard(
         'tone': project_data.get('tone', 'educational'),
         'metaphor_world': project_data.get('metaphor_world'),
         'segments': segments_data,
+        'render_times': _render_times(project_data, video_model),
         'prompts': prompts_log or []
     }
     
     # Render template
     if has_jinja2:
-        template = Template(template_content)
-        html_content = template.render(**context)
+        html_content = get_template(template_path).render(**context)
     else:
         # Simple template replacement if Jinja2 not available
-        html_content = template_content
+        html_content = template_path.read_text()
         for key, value in context.items():
             if isinstance(value, list):
                 # Skip complex replacements for lists
@@ -126,33 +125,79 @@ def generate_dashboard(
     return dashboard_path
 
 
-def collect_prompts_from_logs(log_dir: Path, project_name: str) -> List[Dict]:
-    """Collect all prompts used during generation from logs.
+def _render_times(project_data: Dict, video_model: str) -> List[Dict]:
+    """Typical and slow render times per segment for the video models this run used."""
+    routing = project_data.get('routing') or {}
+    models = [video_model] + [m for m in (routing.get('assignments') or {}).values() if m != video_model]
+    duration = project_data.get('segment_duration', 5)
+    
+    render_times = []
+    for model in dict.fromkeys(models):
+        estimate = estimate_latency('replicate', model, duration, project_config=project_data)
+        render_times.append({
+            'model': model.split('/')[-1],
+            'p50': f"{estimate['p50'] / 60:.1f} min" if estimate else None,
+            'p90': f"{estimate['p90'] / 60:.1f} min" if estimate else None,
+            'samples': estimate['samples'] if estimate else 0,
+        })
+    return render_times
+
+
+def _iter_dashboard_segments(project_data: Dict) -> Iterator[Dict]:
+    """Yield the segments to show on the dashboard.
+    
+    Long-form runs don't keep segments in memory; they pass a
+    ``segments_file`` (one JSON object per line) instead, and only the first
+    ``dashboard.max_segments`` entries are embedded in the page.
+    """
+    settings = config_for(project_data)
+    # Project files may also carry ``segments`` as a count
+    if isinstance(project_data.get('segments'), list):
+        yield from project_data['segments']
+        return
+    
+    segments_file = project_data.get('segments_file')
+    if not segments_file or not Path(segments_file).exists():
+        return
+    
+    max_segments = settings.get('dashboard.max_segments', 200)
+    with open(segments_file) as f:
+        for i, line in enumerate(f):
+            if i >= max_segments:
+                break
+            yield json.loads(line)
+
+
+def collect_prompts_from_logs(log_dir: Path, project_name: str,
+                              project_config: Optional[Dict] = None) -> List[Dict]:
+    """Collect the prompts used during this run.
+    
+    Prompts are looked up in the prompt store by the current run id (see
+    ``setup_logger``), so only this run's prompts are returned no matter
+    how many earlier runs the store holds.
     
     Args:
-        log_dir: Base logs directory
-        project_name: Name of the project
+        log_dir: Base logs directory (unused; kept for compatibility)
+        project_name: Name of the project, used if no run id is bound
+        project_config: Optional merged project configuration
         
     Returns:
         List of prompt dictionaries
     """
+    settings = config_for(project_config)
+    limit = settings.get('dashboard.max_prompts', 50)
+    run_id = get_log_context().get('run_id') or project_name
+    
     prompts = []
+    for record in get_run_prompts(run_id, limit=limit, project_config=project_config):
+        content = record['prompt']
+        prompts.append({
+            'type': record['stage'] or 'Prompt',
+            'model': record['model'],
+            'content': content[:500] + "..." if len(content) > 500 else content,
+            'latency_ms': round(record['latency_ms'] or 0),
+            'input_tokens': record['input_tokens'],
+            'output_tokens': record['output_tokens'],
+        })
     
-    # Look for saved prompts in debug directory
-    prompt_dir = Path(global_config.get('development.prompt_directory', 'debug/prompts'))
-    if prompt_dir.exists():
-        # Get prompts created during this session
-        # Note: In production, you'd want to filter by timestamp or session ID
-        for prompt_file in sorted(prompt_dir.glob("*.txt"), key=lambda p: p.stat().st_mtime, reverse=True)[:10]:
-            try:
-                content = prompt_file.read_text()
-                prompt_type = "Script Generation" if "script" in content.lower() else "Visual Generation"
-                prompts.append({
-                    'type': prompt_type,
-                    'model': 'bedrock/claude',
-                    'content': content[:500] + "..." if len(content) > 500 else content
-                })
-            except:
-                pass
-    
-    return prompts
\ No newline at end of file
+    return prompts
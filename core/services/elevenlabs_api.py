@@ -1,37 +1,75 @@
 """Simple ElevenLabs wrapper."""
 
+import base64
+import json
 import os
 from pathlib import Path
-from core.utils.config import config as global_config
+from typing import Dict, Optional
+from core.utils.config import config_for
 from core.utils.logger import setup_logger, log_api_call
+from core.utils.rate_limiter import get_rate_limiter
+from core.utils.retry import RetryPolicy, call_with_retry
+from core.utils.lazy_imports import has_module
 
-try:
-    import requests
-    has_requests = True
-except ImportError:
-    has_requests = False
+# Imported on first live call; see core.utils.lazy_imports
+has_requests = has_module('requests')
 
 
-def synthesize_voice(text: str, config: dict) -> str:
-    """Create an MP3 file with ElevenLabs text-to-speech."""
+def alignment_path(audio_path: str) -> Path:
+    """Return the path of the character timestamps saved next to ``audio_path``."""
+    audio_file = Path(audio_path)
+    return audio_file.with_name(audio_file.stem + ".alignment.json")
+
+
+def load_alignment(audio_path: str) -> Optional[Dict]:
+    """Load the character timestamps for ``audio_path``, if they were saved.
+    
+    Returns:
+        ElevenLabs alignment (``characters``, ``character_start_times_seconds``
+        and ``character_end_times_seconds``), or None
+    """
+    path = alignment_path(audio_path)
+    if not path.exists():
+        return None
+    try:
+        return json.loads(path.read_text())
+    except (OSError, ValueError):
+        return None
+
+
+def synthesize_voice(text: str, config: dict, filename: Optional[str] = None) -> str:
+    """Create an MP3 file with ElevenLabs text-to-speech.
+    
+    With ``pipeline.timing.audio_driven.enabled`` the with-timestamps
+    endpoint is used and the character alignment is saved next to the
+    audio (see ``load_alignment``).
+    
+    Args:
+        text: Narration text
+        config: Project configuration
+        filename: Optional file name relative to the output directory
+            (defaults to the configured voiceover filename)
+    """
+    settings = config_for(config)
     logger = setup_logger(__name__)
     
-    out_dir = Path(config.get("output_dir", global_config.get("pipeline.output.directory", "output")))
-    out_dir.mkdir(parents=True, exist_ok=True)
+    out_dir = Path(config.get("output_dir", settings.get("pipeline.output.directory", "output")))
     
-    filename = global_config.get("pipeline.output.filenames.voiceover", "final_voiceover.mp3")
+    if filename is None:
+        filename = settings.get("pipeline.output.filenames.voiceover", "final_voiceover.mp3")
     out_file = out_dir / filename
+    out_file.parent.mkdir(parents=True, exist_ok=True)
     
     # Check if we're in development mode with stubs
-    if global_config.get('development.use_stubs', True) or not has_requests:
-        placeholder_text = global_config.get('placeholders.synthetic_audio', 'synthetic audio')
+    if settings.get_bool('development.use_stubs') or not has_requests:
+        placeholder_text = settings.get('placeholders.synthetic_audio', 'synthetic audio')
         out_file.write_text(placeholder_text)
         log_api_call(logger, "ElevenLabs", "text-to-speech (stub)", 
                     {"text_length": len(text)}, stub_mode=True)
         return str(out_file)
     
     # Real ElevenLabs API call
-    api_key_env = global_config.get('api.elevenlabs.api_key_env', 'ELEVENLABS_API_KEY')
+    api_key_env = settings.get('api.elevenlabs.api_key_env', 'ELEVENLABS_API_KEY')
     api_key = os.environ.get(api_key_env)
     
     if not api_key:
@@ -40,8 +78,10 @@ def synthesize_voice(text: str, config: dict) -> str:
         out_file.write_bytes(b'')
         return str(out_file)
     
-    voice_id = config.get('voice_id', global_config.get('api.elevenlabs.voice_id', '21m00Tcm4TlvDq8ikWAM'))
-    model_id = global_config.get('api.elevenlabs.model_id', 'eleven_monolingual_v1')
+    voice_id = config.get('voice_id', settings.get('api.elevenlabs.voice_id', '21m00Tcm4TlvDq8ikWAM'))
+    model_id = settings.get('api.elevenlabs.model_id', 'eleven_monolingual_v1')
+    timestamps = settings.get('pipeline.timing.audio_driven.enabled', False)
+    alignment_path(out_file).unlink(missing_ok=True)
     
     # Log API call
     log_api_call(logger, "ElevenLabs", "text-to-speech", 
@@ -51,9 +91,11 @@ def synthesize_voice(text: str, config: dict) -> str:
     try:
         # ElevenLabs API endpoint
         url = f"https://api.elevenlabs.io/v1/text-to-speech/{voice_id}"
+        if timestamps:
+            url += "/with-timestamps"
         
         headers = {
-            "Accept": "audio/mpeg",
+            "Accept": "application/json" if timestamps else "audio/mpeg",
             "Content-Type": "application/json",
             "xi-api-key": api_key
         }
@@ -67,11 +109,26 @@ def synthesize_voice(text: str, config: dict) -> str:
             }
         }
         
-        response = requests.post(url, json=data, headers=headers)
-        response.raise_for_status()
+        import requests
+        limiter = get_rate_limiter('elevenlabs', model_id, config)
+        
+        def _post():
+            with limiter.acquire(characters=len(text)):
+                response = requests.post(url, json=data, headers=headers)
+                response.raise_for_status()
+                return response
+        
+        response = call_with_retry(_post, RetryPolicy.from_config('elevenlabs', config),
+                                   'elevenlabs', 'text-to-speech', logger)
         
         # Save the audio file
-        out_file.write_bytes(response.content)
+        if timestamps:
+            payload = response.json()
+            out_file.write_bytes(base64.b64decode(payload['audio_base64']))
+            if payload.get('alignment'):
+                alignment_path(out_file).write_text(json.dumps(payload['alignment']))
+        else:
+            out_file.write_bytes(response.content)
         logger.info(f"Successfully synthesized voice to {out_file}")
         
     except Exception as e:
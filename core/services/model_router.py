@@ -0,0 +1,96 @@
+"""Deadline-aware assignment of video models to segments."""
+
+from typing import Dict, List, Optional
+from core.utils.config import config_for
+from core.utils.logger import setup_logger
+from core.utils.rate_limiter import get_rate_limiter
+from core.services.replicate_api import expected_generation_seconds
+
+
+def route_segments(visual_segments: List[Dict], project_config: dict,
+                   deadline_seconds: Optional[float] = None) -> Dict:
+    """Assign each segment a video model so the render finishes by a deadline.
+
+    Models are tried in the preference order of
+    ``api.replicate.routing.models`` (best quality first), and per-segment
+    times come from the latency history estimator. Segments are placed in
+    render order on simulated render slots: one slot per parallel segment
+    worker, further limited by each model's ``max_in_flight``. A segment gets the first model that would finish it
+    within the deadline. Early segments therefore keep the preferred
+    model, and the tail falls back to faster ones once the preferred
+    model's queue is full. If no model fits, the segment goes to whichever
+    would finish first.
+
+    The chosen model is stored on each segment as ``video_model``.
+
+    Args:
+        visual_segments: Segments to render, in order
+        project_config: Project configuration
+        deadline_seconds: Render deadline; defaults to
+            ``api.replicate.routing.deadline_minutes``
+
+    Returns:
+        Plan with ``deadline_seconds``, ``projected_seconds``, ``met`` and
+        ``assignments`` (segment index to model)
+    """
+    settings = config_for(project_config)
+    logger = setup_logger(__name__)
+
+    default_model = project_config.get("video_model", settings.get("api.replicate.video_model"))
+    models = list(settings.get('api.replicate.routing.models', []) or []) or [default_model]
+    if deadline_seconds is None:
+        deadline_seconds = float(settings.get('api.replicate.routing.deadline_minutes', 30)) * 60
+    workers = max(1, int(settings.get('api.replicate.parallel_segments', 1)))
+
+    # Free-at times of the render workers and of each rate-limit key's slots
+    worker_slots = [0.0] * workers
+    model_slots: Dict[str, List[float]] = {}
+    limiter_keys = {}
+    for model_name in models:
+        limiter = get_rate_limiter('replicate', model_name, project_config)
+        limiter_keys[model_name] = limiter.key
+        model_slots.setdefault(limiter.key, [0.0] * (limiter.max_in_flight or workers))
+
+    expected: Dict[tuple, float] = {}
+    assignments = {}
+    projected = 0.0
+    for segment in visual_segments:
+        if segment.get('reuse_of') is not None:
+            # Reuses another segment's clip; nothing to render
+            continue
+        choice = None
+        for model_name in models:
+            slots = model_slots[limiter_keys[model_name]]
+            start = max(min(worker_slots), min(slots))
+            key = (model_name, segment['duration'])
+            if key not in expected:
+                expected[key] = expected_generation_seconds(model_name, segment['duration'], project_config)
+            finish = start + expected[key]
+            if choice is None or finish < choice[1]:
+                choice = (model_name, finish)
+            if finish <= deadline_seconds:
+                choice = (model_name, finish)
+                break
+
+        model_name, finish = choice
+        slots = model_slots[limiter_keys[model_name]]
+        slots[slots.index(min(slots))] = finish
+        worker_slots[worker_slots.index(min(worker_slots))] = finish
+        segment['video_model'] = model_name
+        assignments[segment['index']] = model_name
+        projected = max(projected, finish)
+
+    met = projected <= deadline_seconds
+    summary = ", ".join(f"{m}: {list(assignments.values()).count(m)}" for m in models
+                        if m in assignments.values())
+    logger.info(f"Routed {len(assignments)} segments ({summary}); projected "
+                f"{projected / 60:.1f} min against a {deadline_seconds / 60:.1f} min deadline")
+    if not met:
+        logger.warning("No model mix meets the render deadline; using the fastest available finish")
+
+    return {
+        'deadline_seconds': deadline_seconds,
+        'projected_seconds': round(projected, 1),
+        'met': met,
+        'assignments': assignments,
+    }
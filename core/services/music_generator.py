@@ -2,24 +2,31 @@
 
 import os
 from pathlib import Path
-from typing import Dict
-from core.utils.config import config as global_config
+import shutil
+from typing import Dict, Optional, Tuple
+from core.utils.config import config_for
 from core.utils.logger import setup_logger, log_api_call
+from core.utils import metrics
+from core.utils.ffmpeg_runner import run_ffmpeg
+from core.utils.rate_limiter import get_rate_limiter
+from core.utils.retry import RetryPolicy, call_with_retry
+from core.utils.lazy_imports import has_module
+from core.services.music_library import MusicLibrary, probe_duration
 
-try:
-    import replicate
-except ImportError:
-    replicate = None
-    
-try:
-    import requests
-except ImportError:
-    requests = None
+# SDKs are imported on first live call; see core.utils.lazy_imports
+has_replicate = has_module('replicate')
+has_requests = has_module('requests')
 
 
 def generate_background_music(topic: str, duration: int, merged_config: Dict) -> str:
     """Generate background music that matches the video topic and mood.
     
+    Tracks come from the local music library when one is cached for the
+    topic's style bucket, tone and model (see ``MusicLibrary``). Remote
+    generation only happens on a miss, or when ``api.music.library.variety``
+    asks for a new variant. The track is then looped or trimmed locally to
+    ``duration``.
+    
     Args:
         topic: The video topic (e.g., "how docker technology works")
         duration: Duration in seconds
@@ -28,40 +35,74 @@ def generate_background_music(topic: str, duration: int, merged_config: Dict) ->
     Returns:
         Path to generated music file
     """
+    settings = config_for(merged_config)
     logger = setup_logger(__name__)
     
-    if not global_config.get('api.music.enabled', True):
+    if not settings.get_bool('api.music.enabled'):
         return None
         
-    out_dir = Path(merged_config.get("output_dir", global_config.get("pipeline.output.directory", "output")))
+    out_dir = Path(merged_config.get("output_dir", settings.get("pipeline.output.directory", "output")))
     music_path = out_dir / "background_music.mp3"
     
     # Check if we're in development mode
-    if global_config.get('development.use_stubs', True) or replicate is None or requests is None:
+    if settings.get_bool('development.use_stubs') or not has_replicate or not has_requests:
         # Create placeholder
         music_path.write_text(f"Background music for {topic} ({duration}s)")
         log_api_call(logger, "Replicate", "music generation (stub)", 
                     {"duration": duration}, stub_mode=True)
         return str(music_path)
     
-    # Get API token from environment
-    api_token_env = global_config.get('api.replicate.api_token_env', 'REPLICATE_API_TOKEN')
-    api_token = os.environ.get(api_token_env)
-    
-    if not api_token:
-        logger.error(f"Replicate API token not found in environment variable {api_token_env}")
-        return None
+    # Get model configuration
+    model_name = settings.get('api.music.model', 'riffusion/riffusion')
+    style, tone = music_style(topic, merged_config)
     
-    # Generate music prompt based on topic
-    music_prompt = create_music_prompt(topic, merged_config)
+    library = MusicLibrary(merged_config) if settings.get('api.music.library.enabled', True) else None
+    track = library.pick(style, tone, model_name) if library else None
+    if track is not None:
+        logger.info(f"Using cached {style}/{tone} track {track.name}")
+        metrics.increment('music_library', outcome='hit')
+    else:
+        if library:
+            metrics.increment('music_library', outcome='miss')
+        
+        # Get API token from environment
+        api_token_env = settings.get('api.replicate.api_token_env', 'REPLICATE_API_TOKEN')
+        api_token = os.environ.get(api_token_env)
+        
+        if not api_token:
+            logger.error(f"Replicate API token not found in environment variable {api_token_env}")
+            return None
+        
+        # Library tracks are generated at a fixed length and fitted locally
+        track_duration = settings.get('api.music.library.track_duration', 30) if library else duration
+        generated = _generate_track(create_music_prompt(topic, merged_config), model_name,
+                                    track_duration, merged_config, logger)
+        if generated is None:
+            return None
+        data, suffix = generated
+        if library is None:
+            music_path.write_bytes(data)
+            logger.info(f"Successfully generated music and saved to {music_path}")
+            return str(music_path)
+        track = library.add(style, tone, model_name, data, suffix)
+        logger.info(f"Added {style}/{tone} track {track.name} to the music library")
     
-    # Get model configuration
-    model_name = global_config.get('api.music.model', 'riffusion/riffusion')
+    if library.fit(track, str(music_path), duration):
+        logger.info(f"Fitted music to {duration}s at {music_path}")
+    else:
+        logger.warning(f"Could not fit music to {duration}s; using the track as is")
+        shutil.copyfile(track, music_path)
+    return str(music_path)
+
+
+def _generate_track(music_prompt: str, model_name: str, duration: int, merged_config: Dict,
+                    logger) -> Optional[Tuple[bytes, str]]:
+    """Generate one track on Replicate.
     
+    Returns:
+        The audio bytes and their file suffix, or None on failure
+    """
     try:
-        # Configure Replicate client
-        replicate.Client(api_token=api_token)
-        
         # Log API call
         log_api_call(logger, "Replicate", "music generation", 
                     {"model": model_name, "duration": duration, "prompt_length": len(music_prompt)}, 
@@ -97,16 +138,25 @@ def generate_background_music(topic: str, duration: int, merged_config: Dict) ->
             }
         
         # Run the model
-        output = replicate.run(model_name, input=inputs)
+        limiter = get_rate_limiter('replicate', model_name, merged_config)
+        
+        import replicate
+        
+        def _run():
+            with limiter.acquire():
+                return replicate.run(model_name, input=inputs)
+        
+        output = call_with_retry(_run, RetryPolicy.from_config('replicate', merged_config),
+                                 'replicate', 'music generation', logger)
         
         # Handle different output formats
         output_url = None
         
         if hasattr(output, 'read'):
             # It's a file-like object from Replicate
-            music_path.write_bytes(output.read())
-            logger.info(f"Successfully generated music and saved to {music_path}")
-            return str(music_path)
+            data = output.read()
+            logger.info("Successfully generated music")
+            return data, Path(str(getattr(output, 'url', '') or 'track.mp3')).suffix or '.mp3'
         elif isinstance(output, str):
             output_url = output
         elif isinstance(output, dict) and 'audio' in output:
@@ -118,51 +168,56 @@ def generate_background_music(topic: str, duration: int, merged_config: Dict) ->
         
         # Download the audio file if we have a URL
         if output_url and isinstance(output_url, str) and output_url.startswith('http'):
+            import requests
             response = requests.get(output_url, timeout=60)
             response.raise_for_status()
-            music_path.write_bytes(response.content)
-            logger.info(f"Successfully generated music and saved to {music_path}")
-        else:
-            logger.error(f"Could not handle output from Replicate: {type(output)}")
-            return None
+            logger.info("Successfully generated music")
+            return response.content, Path(output_url.split('?')[0]).suffix or '.mp3'
         
-        return str(music_path)
+        logger.error(f"Could not handle output from Replicate: {type(output)}")
+        return None
         
     except Exception as e:
         logger.error(f"Failed to generate music: {type(e).__name__}: {str(e)}")
         return None
 
 
+# Style buckets: (name, topic keywords, base style, mood); the last is the fallback
+MUSIC_STYLES = [
+    ('technology', ['technology', 'tech', 'software', 'computer', 'digital', 'ai'],
+     "ambient electronic, tech house, futuristic", "innovative, forward-thinking"),
+    ('science', ['science', 'biology', 'chemistry', 'physics', 'nature'],
+     "atmospheric, orchestral, documentary", "wonder, discovery"),
+    ('business', ['business', 'finance', 'corporate', 'management'],
+     "corporate, uplifting, professional", "confident, productive"),
+    ('health', ['health', 'medical', 'medicine', 'wellness'],
+     "calming, healing, ambient", "peaceful, reassuring"),
+    ('history', ['history', 'ancient', 'classical', 'traditional'],
+     "orchestral, period-appropriate, cinematic", "epic, timeless"),
+    ('general', [],
+     "ambient, educational, modern", "engaging, clear"),
+]
+
+# Tones with their own prompt wording; anything else is treated as educational
+MUSIC_TONES = ('epic', 'playful', 'professional', 'educational')
+
+
+def music_style(topic: str, config: Dict) -> Tuple[str, str]:
+    """Return the (style bucket, tone) a topic's music is generated and cached under."""
+    topic_lower = topic.lower()
+    style = next((name for name, keywords, _, _ in MUSIC_STYLES
+                  if any(word in topic_lower for word in keywords)), MUSIC_STYLES[-1][0])
+    tone = config.get('tone', 'educational')
+    return style, tone if tone in MUSIC_TONES else 'educational'
+
+
 def create_music_prompt(topic: str, config: Dict) -> str:
     """Create a music generation prompt based on the video topic.
     
     Maps technical topics to appropriate musical styles.
     """
-    # Extract key themes
-    topic_lower = topic.lower()
-    
-    # Determine music style based on topic
-    if any(word in topic_lower for word in ['technology', 'tech', 'software', 'computer', 'digital', 'ai']):
-        base_style = "ambient electronic, tech house, futuristic"
-        mood = "innovative, forward-thinking"
-    elif any(word in topic_lower for word in ['science', 'biology', 'chemistry', 'physics', 'nature']):
-        base_style = "atmospheric, orchestral, documentary"
-        mood = "wonder, discovery"
-    elif any(word in topic_lower for word in ['business', 'finance', 'corporate', 'management']):
-        base_style = "corporate, uplifting, professional"
-        mood = "confident, productive"
-    elif any(word in topic_lower for word in ['health', 'medical', 'medicine', 'wellness']):
-        base_style = "calming, healing, ambient"
-        mood = "peaceful, reassuring"
-    elif any(word in topic_lower for word in ['history', 'ancient', 'classical', 'traditional']):
-        base_style = "orchestral, period-appropriate, cinematic"
-        mood = "epic, timeless"
-    else:
-        base_style = "ambient, educational, modern"
-        mood = "engaging, clear"
-    
-    # Get tone from config
-    tone = config.get('tone', 'educational')
+    style, tone = music_style(topic, config)
+    _, _, base_style, mood = next(entry for entry in MUSIC_STYLES if entry[0] == style)
     
     # Build the prompt
     if tone == 'epic':
@@ -175,24 +230,53 @@ def create_music_prompt(topic: str, config: Dict) -> str:
         return f"{base_style}, {mood}, clear, supportive, not distracting"
 
 
-def mix_audio_tracks(voice_path: str, music_path: str, output_path: str, music_volume: float = 0.2) -> str:
+def mix_audio_tracks(voice_path: str, music_path: str, output_path: str, music_volume: float = 0.2,
+                     project_config: Optional[Dict] = None) -> str:
     """Mix voice narration with background music.
     
+    With ``pipeline.audio.engine: numpy`` (the default) the mix happens in
+    process: both tracks are decoded once, the music ducks under speech and
+    the result is loudness-normalized and written as PCM WAV, so the final
+    mux is the only lossy encode. Otherwise, or if NumPy is missing or the
+    narration is longer than ``pipeline.audio.max_duration_seconds``,
+    ffmpeg mixes at a static music volume.
+    
     Args:
         voice_path: Path to voice narration
         music_path: Path to background music
-        output_path: Output path for mixed audio
+        output_path: Output path for mixed audio (the in-process engine
+            writes a WAV with the same stem)
         music_volume: Volume level for music (0.0-1.0)
+        project_config: Optional merged project configuration
+    
+    Returns:
+        Path to the mixed audio, or to the narration if mixing failed
     """
+    settings = config_for(project_config)
+    logger = setup_logger(__name__)
     import subprocess
-    from pathlib import Path
     
     out_file = Path(output_path)
     
-    if global_config.get('development.use_stubs', True):
+    if settings.get_bool('development.use_stubs'):
         out_file.write_text(f"Mixed audio: voice + music at {music_volume} volume")
         return str(out_file)
     
+    if settings.get('pipeline.audio.engine', 'numpy') == 'numpy' and has_module('numpy'):
+        # Imported here so runs without music never load NumPy
+        from core.services import audio_engine
+
+        max_seconds = float(settings.get('pipeline.audio.max_duration_seconds', 1800))
+        length = probe_duration(voice_path)
+        if length is None or length <= max_seconds:
+            try:
+                return audio_engine.mix_tracks(voice_path, music_path, str(out_file.with_suffix('.wav')),
+                                               music_volume, project_config)
+            except (OSError, ValueError, subprocess.CalledProcessError) as e:
+                logger.warning(f"In-process mix failed ({type(e).__name__}); falling back to ffmpeg")
+        else:
+            logger.info(f"Narration is {length:.0f}s, above the in-process mix limit; mixing with ffmpeg")
+    
     try:
         # FFmpeg command to mix audio
         # -filter_complex creates a mixing graph
@@ -207,14 +291,14 @@ def mix_audio_tracks(voice_path: str, music_path: str, output_path: str, music_v
             str(out_file)
         ]
         
-        subprocess.run(cmd, check=True, capture_output=True)
+        run_ffmpeg(cmd, "audio_mix", project_config=project_config)
         return str(out_file)
         
     except subprocess.CalledProcessError as e:
-        print(f"Audio mixing error: {e.stderr.decode() if e.stderr else 'Unknown'}")
+        logger.error(f"Audio mixing error: {e.stderr.decode() if e.stderr else 'Unknown'}")
         # Fall back to voice only
-        subprocess.run(["cp", voice_path, str(out_file)])
+        shutil.copyfile(voice_path, out_file)
         return str(out_file)
     except Exception as e:
-        print(f"Mixing error: {e}")
-        return voice_path
\ No newline at end of file
+        logger.error(f"Mixing error: {e}")
+        return voice_path
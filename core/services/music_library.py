@@ -0,0 +1,136 @@
+"""Local library of generated music tracks, fitted to any duration with ffmpeg."""
+
+import os
+from pathlib import Path
+import random
+import re
+import subprocess
+import time
+from typing import Dict, List, Optional
+from core.utils.config import config_for
+from core.utils.logger import setup_logger
+from core.utils.ffmpeg_runner import run_ffmpeg
+
+
+def probe_duration(path: str) -> Optional[float]:
+    """Return the duration of a media file in seconds, or None if ffprobe fails."""
+    cmd = ["ffprobe", "-v", "error", "-show_entries", "format=duration",
+           "-of", "default=noprint_wrappers=1:nokey=1", str(path)]
+    try:
+        result = subprocess.run(cmd, capture_output=True, text=True, check=True)
+        return float(result.stdout.strip())
+    except (OSError, subprocess.CalledProcessError, ValueError):
+        return None
+
+
+class MusicLibrary:
+    """Generated tracks cached per (style bucket, tone, model).
+
+    Tracks live under ``<directory>/<style>/<tone>/<model>/track_*``. A
+    lookup returns a random cached variant. It reports a miss (so a new
+    track is generated) when nothing is cached, or, with probability
+    ``variety``, while fewer than ``max_variants`` are cached.
+    """
+
+    def __init__(self, project_config: Optional[Dict] = None):
+        settings = config_for(project_config)
+        self.project_config = project_config
+        self.directory = Path(settings.get('api.music.library.directory', 'cache/music')).expanduser()
+        self.variety = float(settings.get('api.music.library.variety', 0.0))
+        self.max_variants = int(settings.get('api.music.library.max_variants', 3))
+        self.crossfade = float(settings.get('api.music.library.crossfade_seconds', 2.0))
+        self.fade_out = float(settings.get('api.music.library.fade_out_seconds', 3.0))
+        self.logger = setup_logger(__name__)
+
+    def _key_dir(self, style: str, tone: str, model: str) -> Path:
+        safe_model = re.sub(r'[^A-Za-z0-9_.-]', '_', model.split(':')[0])
+        return self.directory / style / tone / safe_model
+
+    def tracks(self, style: str, tone: str, model: str) -> List[Path]:
+        """Return the cached tracks for a key, oldest first."""
+        key_dir = self._key_dir(style, tone, model)
+        if not key_dir.is_dir():
+            return []
+        return sorted(p for p in key_dir.glob('track_*') if not p.name.endswith('.tmp'))
+
+    def pick(self, style: str, tone: str, model: str) -> Optional[Path]:
+        """Return a cached track for the key, or None if a new one should be generated."""
+        tracks = self.tracks(style, tone, model)
+        if not tracks:
+            return None
+        if len(tracks) < self.max_variants and random.random() < self.variety:
+            return None
+        return random.choice(tracks)
+
+    def add(self, style: str, tone: str, model: str, data: bytes, suffix: str = '.mp3') -> Path:
+        """Store a newly generated track and return its path."""
+        key_dir = self._key_dir(style, tone, model)
+        key_dir.mkdir(parents=True, exist_ok=True)
+        path = key_dir / f"track_{time.strftime('%Y%m%d_%H%M%S')}_{os.getpid()}{suffix}"
+        partial = path.with_name(path.name + '.tmp')
+        partial.write_bytes(data)
+        os.replace(partial, path)
+        return path
+
+    def _loop_unit(self, track: Path, length: float) -> Optional[Path]:
+        """Return a seamless loop of ``track``, creating it on first use.
+
+        The loop is the track from ``crossfade`` seconds in to its end, with
+        the end crossfaded into the opening. Repeating it back to back has no
+        audible seam. It is stored as WAV because MP3 encoder padding would
+        reintroduce a gap at every repeat.
+        """
+        unit = track.with_name(f"loop_{track.stem}.wav")
+        if unit.exists():
+            return unit
+        xf = min(self.crossfade, length / 3)
+        partial = unit.with_name(unit.name + '.tmp.wav')
+        cmd = [
+            "ffmpeg", "-y", "-i", str(track),
+            "-filter_complex",
+            f"[0:a]asplit=2[body][head];"
+            f"[body]atrim=start={xf:.3f},asetpts=PTS-STARTPTS[a];"
+            f"[head]atrim=end={xf:.3f},asetpts=PTS-STARTPTS[b];"
+            f"[a][b]acrossfade=d={xf:.3f}[unit]",
+            "-map", "[unit]",
+            str(partial)
+        ]
+        try:
+            run_ffmpeg(cmd, "music_loop", project_config=self.project_config)
+        except (OSError, subprocess.CalledProcessError) as e:
+            self.logger.error(f"Could not build music loop from {track}: {type(e).__name__}")
+            partial.unlink(missing_ok=True)
+            return None
+        os.replace(partial, unit)
+        return unit
+
+    def fit(self, track: Path, output_path: str, duration: float) -> bool:
+        """Write ``track`` fitted to ``duration`` seconds to ``output_path``.
+
+        Longer tracks are trimmed. Shorter ones are looped seamlessly. Either
+        way the result fades out over its last ``fade_out`` seconds.
+
+        Returns:
+            True if successful, False otherwise
+        """
+        length = probe_duration(str(track))
+        if length is None:
+            return False
+
+        fade = min(self.fade_out, duration / 4)
+        fade_filter = f"afade=t=out:st={max(duration - fade, 0):.3f}:d={fade:.3f}"
+        if length >= duration:
+            source = ["-i", str(track)]
+        else:
+            unit = self._loop_unit(track, length)
+            if unit is None:
+                return False
+            source = ["-stream_loop", "-1", "-i", str(unit)]
+
+        cmd = ["ffmpeg", "-y"] + source + ["-t", f"{duration:.3f}", "-af", fade_filter, str(output_path)]
+        try:
+            run_ffmpeg(cmd, "music_fit", project_config=self.project_config)
+            return True
+        except (OSError, subprocess.CalledProcessError) as e:
+            self.logger.error(f"Could not fit music to {duration}s: {type(e).__name__}")
+            return False
@@ -0,0 +1,217 @@
+"""Rolling low-resolution preview composed while segments are rendering."""
+
+import contextvars
+import json
+import os
+from pathlib import Path
+import subprocess
+import tempfile
+import threading
+import time
+from typing import Dict, List, Optional
+from core.utils.config import config_for
+from core.utils.logger import setup_logger
+from core.utils.ffmpeg_runner import run_ffmpeg
+from core.services.video_composer import validate_video_file
+
+
+class PreviewComposer:
+    """Recompose ``preview/preview.mp4`` each time a segment finishes.
+
+    Every finished segment is transcoded once to a small, uniformly
+    encoded clip, and segments that are not ready yet are filled with
+    placeholder clips cached per duration. Those clips can be joined with
+    stream copy, so an update costs one small transcode plus a remux.
+    The voiceover is attached once it is available.
+
+    Updates run on a single background thread; segments that finish while
+    a remux is in progress are folded into the next one. The preview is
+    replaced atomically and ``preview/status.json`` records progress for
+    the dashboard to poll.
+    """
+
+    def __init__(self, segment_info: List[Dict], output_dir: Path,
+                 project_config: Optional[Dict] = None, audio_path: Optional[str] = None):
+        self.settings = config_for(project_config)
+        self.project_config = project_config
+        self.logger = setup_logger(__name__)
+        self.segments = [(seg['index'], float(seg.get('duration', 5))) for seg in segment_info]
+        self.stub = self.settings.get_bool('development.use_stubs')
+
+        self.width = int(self.settings.get('pipeline.preview.width', 320))
+        self.height = int(self.settings.get('pipeline.preview.height', 180))
+        self.fps = int(self.settings.get('pipeline.preview.fps', 12))
+
+        self.preview_dir = Path(output_dir) / self.settings.get('pipeline.preview.directory', 'preview')
+        self.clips_dir = self.preview_dir / "clips"
+        self.clips_dir.mkdir(parents=True, exist_ok=True)
+        self.preview_path = self.preview_dir / "preview.mp4"
+        self.status_path = self.preview_dir / "status.json"
+        self.placeholder_dir = Path(tempfile.gettempdir()) / "prompt2production_preview_placeholders"
+        self.placeholder_dir.mkdir(parents=True, exist_ok=True)
+
+        self._clips: Dict[int, Path] = {}
+        self._pending: Dict[int, str] = {}
+        self._audio_source = audio_path
+        self._audio_clip: Optional[Path] = None
+        self._dirty = audio_path is not None
+        self._closed = False
+        self._ffmpeg_ok = True
+        self._version = 0
+        self._condition = threading.Condition()
+        self._thread = threading.Thread(target=contextvars.copy_context().run, args=(self._run,),
+                                        name="preview-composer", daemon=True)
+        self._thread.start()
+
+    def add_segment(self, index: int, path: str) -> None:
+        """Queue a finished segment for the next preview update."""
+        with self._condition:
+            self._pending[index] = str(path)
+            self._condition.notify()
+
+    def set_audio(self, path: str) -> None:
+        """Attach the voiceover (or mixed audio) to subsequent previews."""
+        with self._condition:
+            self._audio_source = str(path)
+            self._audio_clip = None
+            self._dirty = True
+            self._condition.notify()
+
+    def close(self) -> Path:
+        """Apply outstanding updates and stop the background thread.
+
+        Returns:
+            Path to the preview file
+        """
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+        self._thread.join()
+        return self.preview_path
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                while not self._pending and not self._dirty and not self._closed:
+                    self._condition.wait()
+                if self._closed and not self._pending and not self._dirty:
+                    return
+                pending, self._pending = self._pending, {}
+                self._dirty = False
+                audio_source = self._audio_source
+
+            try:
+                for index, path in pending.items():
+                    clip = self._transcode_segment(index, path)
+                    if clip is not None:
+                        self._clips[index] = clip
+                self._compose(audio_source)
+            except Exception as e:
+                self.logger.warning(f"Preview update failed: {type(e).__name__}: {str(e)}")
+
+    def _encode_args(self) -> List[str]:
+        """Encoding parameters shared by every clip so they concat without re-encoding."""
+        w, h = self.width, self.height
+        return [
+            "-vf", f"scale={w}:{h}:force_original_aspect_ratio=decrease,"
+                   f"pad={w}:{h}:(ow-iw)/2:(oh-ih)/2,fps={self.fps},format=yuv420p",
+            "-c:v", "libx264",
+            "-preset", "ultrafast",
+            "-crf", "32",
+            "-an",
+        ]
+
+    def _ffmpeg(self, cmd: List[str]) -> bool:
+        """Run ffmpeg, disabling further attempts if it is not installed."""
+        if not self._ffmpeg_ok:
+            return False
+        try:
+            run_ffmpeg(cmd, "preview", project_config=self.project_config)
+            return True
+        except FileNotFoundError:
+            self.logger.warning("ffmpeg not found; preview disabled")
+            self._ffmpeg_ok = False
+        except subprocess.CalledProcessError as e:
+            self.logger.warning(f"Preview ffmpeg error: {e.stderr.decode()[-500:] if e.stderr else 'Unknown error'}")
+        return False
+
+    def _transcode_segment(self, index: int, path: str) -> Optional[Path]:
+        clip = self.clips_dir / f"segment_{index:03d}.mp4"
+        if self.stub:
+            clip.write_text(f"Preview clip for segment {index}")
+            return clip
+        if not validate_video_file(path):
+            return None
+        if self._ffmpeg(["ffmpeg", "-y", "-i", str(path)] + self._encode_args() + [str(clip)]):
+            return clip
+        return None
+
+    def _placeholder(self, duration: float) -> Optional[Path]:
+        """Return a black clip of ``duration`` seconds, creating it on first use."""
+        clip = self.placeholder_dir / f"{self.width}x{self.height}_{self.fps}fps_{duration:g}s.mp4"
+        if clip.exists():
+            return clip
+        partial = clip.with_suffix(f".{os.getpid()}.tmp.mp4")
+        cmd = [
+            "ffmpeg", "-y",
+            "-f", "lavfi",
+            "-i", f"color=c=black:s={self.width}x{self.height}:d={duration}:r={self.fps}",
+        ] + self._encode_args() + ["-t", str(duration), str(partial)]
+        if self._ffmpeg(cmd):
+            os.replace(partial, clip)
+            return clip
+        return None
+
+    def _prepare_audio(self, audio_source: Optional[str]) -> Optional[Path]:
+        """Encode the audio track once so each remux can stream-copy it."""
+        if not audio_source or not Path(audio_source).exists():
+            return None
+        if self._audio_clip is None:
+            clip = self.preview_dir / "audio.m4a"
+            if self._ffmpeg(["ffmpeg", "-y", "-i", str(audio_source), "-vn",
+                             "-c:a", "aac", "-b:a", "64k", str(clip)]):
+                self._audio_clip = clip
+        return self._audio_clip
+
+    def _compose(self, audio_source: Optional[str]) -> None:
+        ready = sum(1 for index, _ in self.segments if index in self._clips)
+        total = len(self.segments)
+        partial = self.preview_dir / "preview.tmp.mp4"
+
+        if self.stub:
+            partial.write_text(f"Preview: {ready}/{total} segments ready")
+        else:
+            clips = []
+            for index, duration in self.segments:
+                clip = self._clips.get(index) or self._placeholder(duration)
+                if clip is not None:
+                    clips.append(clip)
+            if not clips:
+                return
+
+            list_file = self.preview_dir / "clips.txt"
+            with open(list_file, 'w') as f:
+                for clip in clips:
+                    f.write(f"file '{str(clip.absolute()).replace(chr(92), '/')}'\n")
+
+            cmd = ["ffmpeg", "-y", "-f", "concat", "-safe", "0", "-i", str(list_file)]
+            audio_clip = self._prepare_audio(audio_source)
+            if audio_clip is not None:
+                cmd += ["-i", str(audio_clip), "-map", "0:v:0", "-map", "1:a:0", "-shortest"]
+            cmd += ["-c", "copy", "-movflags", "+faststart", "-f", "mp4", str(partial)]
+            if not self._ffmpeg(cmd):
+                return
+
+        os.replace(partial, self.preview_path)
+        self._version += 1
+        status = {
+            'ready': ready,
+            'total': total,
+            'complete': ready == total,
+            'version': self._version,
+            'updated': time.time(),
+        }
+        status_tmp = self.status_path.with_suffix(".json.tmp")
+        status_tmp.write_text(json.dumps(status))
+        os.replace(status_tmp, self.status_path)
+        self.logger.debug(f"Preview updated: {ready}/{total} segments")
@@ -1,28 +1,33 @@
 """Video generation wrapper for segment-based rendering."""
 
+import contextvars
+import json
 import os
 from pathlib import Path
-from typing import List, Dict
-from core.utils.config import config as global_config
-from core.utils.logger import setup_logger, log_api_call
+import threading
+import time
+import uuid
+from typing import Any, Callable, List, Dict, Optional, Tuple
+from core.utils import clock
+from core.utils.config import Config, config_for
+from core.utils.latency_history import estimate_latency, latency_percentile, record_latency
+from core.utils.logger import setup_logger, log_api_call, set_log_context, get_log_context
+from core.utils import metrics
+from core.utils.rate_limiter import RateLimiter, get_rate_limiter
+from core.utils.retry import FatalError, RetryPolicy, RetryableError, call_with_retry
+from core.utils.work_queue import FINISHED_STATES, WorkQueue, default_worker_id, open_work_queue, serve
+from core.utils.lazy_imports import has_module
+from core.services.video_composer import reuse_clip
 
-try:  # pragma: no cover - optional dependency
-    import replicate
-    has_replicate = True
-except ModuleNotFoundError:  # pragma: no cover - optional dependency
-    replicate = None
-    has_replicate = False
-    
-try:
-    import requests
-except ImportError:
-    requests = None
+# SDKs are imported on first live call; see core.utils.lazy_imports
+has_replicate = has_module('replicate')
+has_requests = has_module('requests')
 
 
-def estimate_generation_time(model_name: str, duration: int) -> str:
-    """Estimate generation time based on model and duration.
+def _prior_generation_range(model_name: str, duration: float) -> Tuple[float, float]:
+    """Published generation times per model, used until latency history exists.
     
-    Returns a human-readable time estimate.
+    Returns (minimum, maximum) minutes per segment.
     """
     # Time estimates based on model performance
     if "google/veo" in model_name:
@@ -51,241 +56,712 @@ def estimate_generation_time(model_name: str, duration: int) -> str:
         time_min = 2  # Default estimate
         time_max = 4
     
+    return time_min, time_max
+
+
+def estimate_generation_range(model_name: str, duration: float, resolution: Optional[str] = None,
+                              project_config: Optional[Dict] = None) -> Tuple[float, float]:
+    """Estimate generation time for one segment from recorded latencies.
+    
+    Uses the p50 and p90 of this model's recorded end-to-end latencies
+    (see ``latency_history.estimate_latency``), falling back to published
+    figures until ``api.replicate.estimator.min_samples`` calls are recorded.
+    
+    Returns (typical, slow) minutes per segment.
+    """
+    settings = config_for(project_config)
+    estimate = estimate_latency(
+        'replicate', model_name, duration, resolution, (50, 90),
+        min_samples=settings.get('api.replicate.estimator.min_samples', 3),
+        limit=settings.get('api.replicate.estimator.history_limit', 200),
+        project_config=project_config
+    )
+    if estimate is None:
+        return _prior_generation_range(model_name, duration)
+    return estimate['p50'] / 60, estimate['p90'] / 60
+
+
+def expected_generation_seconds(model_name: str, duration: float,
+                                project_config: Optional[Dict] = None) -> float:
+    """Typical seconds to render one segment (median of history, or the prior midpoint)."""
+    settings = config_for(project_config)
+    estimate = estimate_latency(
+        'replicate', model_name, duration, None, (50,),
+        min_samples=settings.get('api.replicate.estimator.min_samples', 3),
+        limit=settings.get('api.replicate.estimator.history_limit', 200),
+        project_config=project_config
+    )
+    if estimate is not None:
+        return estimate['p50']
+    time_min, time_max = _prior_generation_range(model_name, duration)
+    return (time_min + time_max) / 2 * 60
+
+
+def estimate_render_seconds(visual_segments: List[Dict], config: dict) -> float:
+    """Expected wall-clock seconds to render ``visual_segments`` with the configured parallelism."""
+    settings = config_for(config)
+    model_name = config.get("video_model", settings.get("api.replicate.video_model", "anotherjesse/zeroscope-v2-xl"))
+    workers = [0.0] * max(1, settings.get_int('api.replicate.parallel_segments', 1))
+    expected: Dict[Tuple[str, float], float] = {}
+    for segment in visual_segments:
+        if segment.get('reuse_of') is not None:
+            continue
+        key = (segment.get('video_model', model_name), segment['duration'])
+        if key not in expected:
+            expected[key] = expected_generation_seconds(key[0], key[1], config)
+        slot = workers.index(min(workers))
+        workers[slot] += expected[key]
+    return max(workers)
+
+
+def estimate_generation_time(model_name: str, duration: int, resolution: Optional[str] = None,
+                             project_config: Optional[Dict] = None) -> str:
+    """Estimate generation time based on model and duration.
+    
+    Returns a human-readable time estimate.
+    """
+    time_min, time_max = estimate_generation_range(model_name, duration, resolution, project_config)
     if time_max < 1:
         return f"{int(time_min * 60)}-{int(time_max * 60)} seconds"
     else:
         return f"{time_min:.1f}-{time_max:.1f} minutes"
 
 
-def render_video_segments(visual_segments: List[Dict], config: dict) -> List[str]:
+def _download_output(output, segment_path: Path, index: int, logger) -> None:
+    """Save a Replicate prediction output (file object or URL) to ``segment_path``.
+    
+    Raises:
+        RetryableError: If the output format is not recognized
+    """
+    if hasattr(output, 'read'):
+        # It's a file-like object from Replicate
+        logger.info(f"Downloading segment {index} directly from file object")
+        segment_path.write_bytes(output.read())
+        logger.info(f"Successfully generated and saved segment {index} to {segment_path}")
+        return
+    
+    # Try to get URL from various formats
+    if isinstance(output, str):
+        output_url = output
+    elif isinstance(output, dict) and 'video' in output:
+        output_url = output['video']
+    elif isinstance(output, list) and len(output) > 0:
+        output_url = output[0]
+    else:
+        output_url = str(output)
+    
+    # Download the video file if we have a URL
+    if output_url and isinstance(output_url, str) and output_url.startswith('http'):
+        logger.info(f"Downloading segment {index} from {output_url}")
+        import requests
+        response = requests.get(output_url, timeout=300)  # 5 minute timeout
+        response.raise_for_status()
+        segment_path.write_bytes(response.content)
+        logger.info(f"Successfully generated and saved segment {index} to {segment_path}")
+        return
+    
+    raise RetryableError(f"Could not handle output from Replicate for segment {index}: {type(output)}")
+
+
+def _build_inputs(model_name: str, segment: Dict, config: dict) -> Dict:
+    """Return prediction inputs for ``segment`` in the format ``model_name`` expects."""
+    # Prepare inputs based on model
+    if "google/veo" in model_name:
+        # Google Veo 3 - State of the art
+        inputs = {
+            "prompt": segment['visual_prompt'],
+            "aspect_ratio": "16:9",
+            "duration": segment['duration'],
+            "quality": "high",  # Options: "standard", "high"
+            "enable_audio": True,  # Native audio generation!
+            "seed": config.get("seed", 42)
+        }
+    elif "tencent/hunyuan-video" in model_name:
+        # HunyuanVideo - 13B parameter open-source
+        inputs = {
+            "prompt": segment['visual_prompt'],
+            "resolution": "1280x720",  # Options: "1280x720", "960x960", "720x1280"
+            "video_length": segment['duration'],
+            "guidance_scale": 7.0,
+            "num_inference_steps": 50,  # More steps = better quality
+            "flow_shift": 0,  # Controls motion amount
+            "embedded_guidance_scale": 6.0,
+            "seed": config.get("seed", 42)
+        }
+    elif model_name == "minimax/video-01":
+        # MiniMax Hailuo - Exceptional realism
+        inputs = {
+            "prompt": segment['visual_prompt'],
+            "prompt_optimizer": True,  # Auto-enhance prompts
+            "model": "video-01",
+            "duration": min(segment['duration'], 6)  # Max 6 seconds
+        }
+    elif model_name == "minimax/video-01-director":
+        # MiniMax Director - Cinematic camera control
+        inputs = {
+            "prompt": segment['visual_prompt'],
+            "camera_mode": "auto",  # Options: "auto", "zoom_in", "zoom_out", "pan_left", "pan_right", "tilt_up", "tilt_down"
+            "duration": min(segment['duration'], 6),
+            "prompt_optimizer": True
+        }
+    elif "kling" in model_name:
+        # Kling models - Highest resolution
+        inputs = {
+            "prompt": segment['visual_prompt'],
+            "aspect_ratio": "16:9",
+            "duration": min(segment['duration'], 10),  # 5 or 10 seconds
+            "mode": "standard" if "standard" in model_name else "pro",
+            "camera_motion": "auto"  # Professional camera movements
+        }
+    elif "mochi" in model_name:
+        # Genmo Mochi - 10B params, fine-tunable
+        inputs = {
+            "prompt": segment['visual_prompt'],
+            "num_frames": int(segment['duration'] * 30),  # 30 fps
+            "num_inference_steps": 64,
+            "guidance_scale": 4.5,
+            "seed": config.get("seed", 42)
+        }
+    elif "ltx-video" in model_name:
+        # LTX-Video - Real-time generation
+        inputs = {
+            "prompt": segment['visual_prompt'],
+            "num_frames": int(segment['duration'] * 24),  # 24 fps
+            "width": 768,
+            "height": 512,
+            "guidance_scale": 7.5,
+            "num_inference_steps": 25,  # Fewer steps for speed
+            "seed": config.get("seed", 42)
+        }
+    elif "stable-video-diffusion" in model_name:
+        # Stability AI SVD
+        inputs = {
+            "prompt": segment['visual_prompt'],
+            "num_frames": 25,  # Fixed at 25 frames
+            "sizing_strategy": "maintain_aspect_ratio",
+            "motion_bucket_id": 127,  # Controls motion amount
+            "cond_aug": 0.02,
+            "decoding_t": 14,
+            "seed": config.get("seed", 42)
+        }
+    elif "zeroscope" in model_name:
+        # Zeroscope - Fast but lower quality
+        inputs = {
+            "prompt": segment['visual_prompt'],
+            "num_frames": int(segment['duration'] * 8),  # 8 fps
+            "height": 320,
+            "width": 576,
+            "num_inference_steps": 50,
+            "guidance_scale": 17.5,
+            "negative_prompt": "very blue, dust, noisy, washed out, ugly, distorted, broken",
+            "fps": 8,
+            "seed": config.get("seed", 42)
+        }
+    else:
+        # Generic inputs for unknown models
+        inputs = {
+            "prompt": segment['visual_prompt']
+        }
+        if hasattr(segment, 'duration'):
+            inputs["duration"] = segment['duration']
+    
+    return inputs
+
+
+def _resolution(inputs: Dict) -> Optional[str]:
+    """Describe the output size requested by ``inputs`` for the latency history."""
+    if inputs.get('resolution'):
+        return str(inputs['resolution'])
+    if inputs.get('width') and inputs.get('height'):
+        return f"{inputs['width']}x{inputs['height']}"
+    if inputs.get('aspect_ratio'):
+        return str(inputs['aspect_ratio'])
+    return None
+
+
+# Prediction states after which a prediction no longer changes
+TERMINAL_STATUSES = ('succeeded', 'failed', 'canceled')
+
+# Hedged predictions launched so far, per run id
+_hedges_used: Dict[Optional[str], int] = {}
+_hedges_lock = threading.Lock()
+
+
+class HedgePolicy:
+    """When to duplicate a slow segment prediction, and how many duplicates a run may pay for."""
+    
+    def __init__(self, percentile: float = 95.0, min_samples: int = 10, min_delay: float = 30.0,
+                 max_extra_predictions: int = 2, history_limit: int = 200):
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.min_delay = min_delay
+        self.max_extra_predictions = max_extra_predictions
+        self.history_limit = history_limit
+    
+    @classmethod
+    def from_config(cls, project_config: Optional[Dict] = None) -> Optional['HedgePolicy']:
+        """Build the policy from ``api.replicate.hedging``, or return None when it is disabled."""
+        settings = config_for(project_config)
+        hedging = settings.get('api.replicate.hedging', {}) or {}
+        if not hedging.get('enabled', False):
+            return None
+        return cls(
+            percentile=float(hedging.get('percentile', 95)),
+            min_samples=int(hedging.get('min_samples', 10)),
+            min_delay=float(hedging.get('min_delay_seconds', 30)),
+            max_extra_predictions=int(hedging.get('max_extra_predictions', 2)),
+            history_limit=int(hedging.get('history_limit', 200)),
+        )
+    
+    def threshold(self, model_name: str, project_config: Optional[Dict] = None) -> Optional[float]:
+        """Seconds after which a prediction is hedged, or None without enough latency history."""
+        latency = latency_percentile('replicate', model_name, self.percentile, self.min_samples,
+                                     self.history_limit, project_config)
+        if latency is None:
+            return None
+        return max(latency, self.min_delay)
+    
+    def try_spend(self) -> bool:
+        """Reserve one extra prediction from the current run's budget."""
+        run_id = get_log_context().get('run_id')
+        with _hedges_lock:
+            used = _hedges_used.get(run_id, 0)
+            if used >= self.max_extra_predictions:
+                return False
+            _hedges_used[run_id] = used + 1
+            return True
+
+    def refund(self) -> None:
+        """Return a prediction reserved with ``try_spend`` that was not launched."""
+        run_id = get_log_context().get('run_id')
+        with _hedges_lock:
+            _hedges_used[run_id] = max(0, _hedges_used.get(run_id, 0) - 1)
+
+
+def _create_prediction(client, model_name: str, inputs: Dict):
+    """Start a prediction without waiting for it.
+    
+    ``owner/name:version`` references run that version; bare model names
+    run through the model endpoint, as ``replicate.run`` does.
+    """
+    if ':' in model_name:
+        return client.predictions.create(version=model_name.split(':', 1)[1], input=inputs)
+    return client.models.predictions.create(model=model_name, input=inputs)
+
+
+def _run_prediction(client, model_name: str, inputs: Dict, segment: Dict, limiter: RateLimiter,
+                    hedge: Optional[HedgePolicy], timeout: float, poll_interval: float,
+                    config: dict, logger) -> Any:
+    """Run one segment prediction to completion, hedging it if it runs long.
+    
+    Once the prediction has run longer than the hedge threshold, a
+    duplicate is started (at most one per segment, within the run's
+    budget) if the limiter has an in-flight slot free for it. The first
+    to succeed wins, the other is canceled and the hedge's slot is
+    released.
+    
+    Args:
+        client: Replicate client
+        model_name: Model reference
+        inputs: Prediction inputs
+        segment: Segment being rendered
+        limiter: Rate limiter for the model
+        hedge: Hedging policy, or None to never hedge
+        timeout: Seconds to wait before giving up
+        poll_interval: Seconds between status checks
+        config: Project configuration
+        logger: Logger instance
+    
+    Returns:
+        Output of the first prediction to succeed, and its timings
+        (``seconds``, ``queue_seconds``, ``run_seconds``)
+    
+    Raises:
+        TimeoutError: If nothing succeeded within ``timeout``
+        RuntimeError: If every prediction failed or was canceled
+    """
+    threshold = hedge.threshold(model_name, config) if hedge else None
+    predictions = []
+    started = {}
+    running = {}
+    winner = None
+    release_hedge = None
+    
+    def launch():
+        prediction = _create_prediction(client, model_name, inputs)
+        started[prediction.id] = clock.now()
+        predictions.append(prediction)
+    
+    launch()
+    try:
+        while True:
+            for prediction in predictions:
+                if prediction.status not in TERMINAL_STATUSES:
+                    prediction.reload()
+                if prediction.status != 'starting' and prediction.id not in running:
+                    # Left the queue (observed at poll granularity)
+                    running[prediction.id] = clock.now()
+            
+            winner = next((p for p in predictions if p.status == 'succeeded'), None)
+            if winner is not None:
+                break
+            if all(p.status in TERMINAL_STATUSES for p in predictions):
+                errors = '; '.join(f"{p.id} {p.status}: {p.error}" for p in predictions)
+                raise RuntimeError(f"Prediction for segment {segment['index']} did not succeed ({errors})")
+            
+            elapsed = clock.now() - started[predictions[0].id]
+            if elapsed > timeout:
+                raise TimeoutError(f"Segment {segment['index']} did not finish within {timeout:.0f}s")
+            
+            if threshold is not None and len(predictions) == 1 and elapsed > threshold:
+                # The hedge needs its own in-flight slot; without a free one, try again next poll
+                if hedge.try_spend():
+                    release_hedge = limiter.try_reserve()
+                    if release_hedge is None:
+                        hedge.refund()
+                if release_hedge is not None:
+                    logger.warning(f"Segment {segment['index']} has run {elapsed:.1f}s, past the "
+                                   f"p{hedge.percentile:g} of {threshold:.1f}s; launching a hedged prediction")
+                    launch()
+                    metrics.increment('hedged_predictions', provider='replicate', model=model_name,
+                                      outcome='launched')
+            
+            clock.sleep(poll_interval)
+    finally:
+        for prediction in predictions:
+            if prediction is not winner and prediction.status not in TERMINAL_STATUSES:
+                try:
+                    prediction.cancel()
+                except Exception as e:
+                    logger.warning(f"Could not cancel prediction {prediction.id}: {type(e).__name__}: {str(e)}")
+        if release_hedge is not None:
+            release_hedge()
+    
+    finished = clock.now()
+    timings = {
+        'seconds': finished - started[winner.id],
+        'queue_seconds': running[winner.id] - started[winner.id],
+        'run_seconds': finished - running[winner.id],
+    }
+    if len(predictions) > 1:
+        outcome = 'primary_won' if winner is predictions[0] else 'hedge_won'
+        metrics.increment('hedged_predictions', provider='replicate', model=model_name, outcome=outcome)
+        logger.info(f"Segment {segment['index']}: {outcome.replace('_', ' ')}, other prediction canceled")
+    return winner.output, timings
+
+
+def _render_segment(client, segment: Dict, model_name: str, segment_path: Path,
+                    hedge: Optional[HedgePolicy], config: dict, logger) -> None:
+    """Render one segment to ``segment_path``, leaving an empty file if every attempt fails."""
+    settings = config_for(config)
+    set_log_context(segment=segment['index'])
+    limiter = get_rate_limiter('replicate', model_name, config)
+    policy = RetryPolicy.from_config('replicate', config)
+    timeout = settings.get_float('retry.timeout_minutes') * 60
+    poll_interval = settings.get_float('api.replicate.poll_interval', 2.0)
+    inputs = _build_inputs(model_name, segment, config)
+    resolution = _resolution(inputs)
+    attempts = 0
+    
+    # Log expected generation time
+    expected_time = estimate_generation_time(model_name, segment['duration'], resolution, config)
+    logger.info(f"Expected generation time: {expected_time}")
+    
+    def _generate():
+        nonlocal attempts
+        attempts += 1
+        
+        # Log API call
+        log_api_call(logger, "Replicate", "video generation", 
+                    {"model": model_name, "segment": segment['index'], "duration": segment['duration'], "attempt": attempts}, 
+                    stub_mode=False)
+        
+        if attempts > 1:
+            logger.info(f"Retry {attempts}/{policy.max_attempts}: Generating video segment {segment['index']} with {model_name}")
+        else:
+            logger.info(f"Generating video segment {segment['index']} with {model_name}")
+        
+        with limiter.acquire():
+            output, timings = _run_prediction(client, model_name, inputs, segment, limiter, hedge,
+                                              timeout, poll_interval, config, logger)
+        download_start = clock.now()
+        _download_output(output, segment_path, segment['index'], logger)
+        record_latency('replicate', model_name, duration=segment['duration'], resolution=resolution,
+                       download_seconds=clock.now() - download_start, project_config=config, **timings)
+    
+    try:
+        call_with_retry(_generate, policy, 'replicate', 'video generation', logger)
+    except Exception as e:
+        # Create empty file as placeholder
+        logger.error(f"All attempts failed for segment {segment['index']}: {type(e).__name__}: {str(e)}")
+        segment_path.write_bytes(b'')
+    finally:
+        set_log_context(segment=None)
+
+
+def _use_stubs(settings) -> bool:
+    return settings.get_bool('development.use_stubs') or not has_replicate or not has_requests
+
+
+def _client(config: dict):
+    """Create a Replicate client from the configured token variable, or log and return None."""
+    settings = config_for(config)
+    api_token_env = settings.get('api.replicate.api_token_env', 'REPLICATE_API_TOKEN')
+    api_token = os.environ.get(api_token_env)
+    if not api_token:
+        setup_logger(__name__).error(f"Replicate API token not found in environment variable {api_token_env}")
+        return None
+    import replicate
+    return replicate.Client(api_token=api_token)
+
+
+def _render_stub_segment(segment: Dict, model_name: str, segment_path: Path, config: dict, logger) -> None:
+    """Write a placeholder for ``segment``.
+    
+    On a virtual clock (``development.virtual_clock``) the model's typical
+    render time is spent first, under its rate limiter, so simulated runs
+    see realistic provider latency.
+    """
+    if clock.get_clock().virtual:
+        with get_rate_limiter('replicate', model_name, config).acquire():
+            clock.sleep(expected_generation_seconds(model_name, segment['duration'], config))
+    placeholder_text = f"Segment {segment['index']}: {segment['visual_prompt'][:50]}..."
+    segment_path.write_text(placeholder_text)
+    log_api_call(logger, "Replicate", "video generation (stub)", 
+                {"segment": segment['index']}, stub_mode=True)
+
+
+# Settings rebuilt for queued jobs, keyed by the job's serialized config
+_job_settings: Dict[str, Any] = {}
+_job_settings_lock = threading.Lock()
+
+
+def render_segment_job(payload: Dict) -> Dict:
+    """Render one queued segment; the ``render_segment`` job handler run by workers.
+    
+    The payload carries the segment, its model and output path, and the
+    driving run's config (profile, layers and project settings), which
+    is rebuilt here on top of this host's config files.
+    
+    Returns:
+        ``path`` and ``bytes`` of the written clip (0 bytes if every
+        attempt failed)
+    """
+    key = json.dumps(payload['config'], sort_keys=True, default=str)
+    with _job_settings_lock:
+        config = _job_settings.get(key)
+        if config is None:
+            settings = Config.from_spec(payload['config']['settings'])
+            config = settings.merge_project_config(payload['config']['project'])
+            _job_settings[key] = config
+    settings = config_for(config)
+    logger = setup_logger(__name__)
+    segment = payload['segment']
+    segment_path = Path(payload['path'])
+    segment_path.parent.mkdir(parents=True, exist_ok=True)
+    
+    if _use_stubs(settings):
+        _render_stub_segment(segment, payload['model'], segment_path, config, logger)
+    else:
+        client = _client(config)
+        if client is None:
+            raise FatalError("Replicate API token is not set on this worker")
+        _render_segment(client, segment, payload['model'], segment_path, HedgePolicy.from_config(config),
+                        config, logger)
+    return {'path': str(segment_path), 'bytes': segment_path.stat().st_size if segment_path.exists() else 0}
+
+
+def _render_via_queue(queue: WorkQueue, segments: List[Dict], segment_path: Callable[[int], Path],
+                      config: dict, logger, on_segment: Optional[Callable[[Dict, str], Any]] = None) -> None:
+    """Enqueue ``segments`` as ``render_segment`` jobs and wait for workers to render them.
+    
+    ``pipeline.work_queue.local_workers`` threads in this process take
+    jobs of this run too; ``cli.render_worker`` processes on any host
+    sharing the queue and output directory take the rest. Clips are
+    reported to ``on_segment`` as they finish. Segments whose job failed
+    or did not finish within ``wait_timeout_minutes`` are left empty, so
+    the composer substitutes a placeholder.
+    """
+    settings = config_for(config)
+    model_name = config.get("video_model", settings.get("api.replicate.video_model", "anotherjesse/zeroscope-v2-xl"))
+    run_id = get_log_context().get('run_id') or uuid.uuid4().hex
+    job_config = {
+        'settings': settings.spec(),
+        'project': {key: value for key, value in config.items() if not key.startswith('_')},
+    }
+    by_id = {}
+    jobs = []
+    for segment in segments:
+        job_id = f"{run_id}-segment-{segment['index']:03d}"
+        by_id[job_id] = segment
+        jobs.append((job_id, {
+            'segment': segment,
+            'model': segment.get('video_model', model_name),
+            'path': str(segment_path(segment['index']).resolve()),
+            'config': job_config,
+        }))
+    queue.put(run_id, 'render_segment', jobs)
+    
+    poll_interval = float(settings.get('pipeline.work_queue.poll_interval', 1.0))
+    heartbeat = float(settings.get('pipeline.work_queue.heartbeat_seconds', 30))
+    stop = threading.Event()
+    local = [
+        threading.Thread(target=clock.get_clock().track(contextvars.copy_context().run), name=f"render-{i}",
+                         args=(serve, queue, {'render_segment': render_segment_job}, f"{default_worker_id()}:{i}",
+                               stop, run_id, poll_interval, heartbeat, None, logger), daemon=True)
+        for i in range(int(settings.get('pipeline.work_queue.local_workers', 1)))
+    ]
+    for thread in local:
+        thread.start()
+    logger.info(f"Queued {len(jobs)} segment renders ({run_id}); {len(local)} local workers")
+    
+    deadline = clock.now() + float(settings.get('pipeline.work_queue.wait_timeout_minutes', 120)) * 60
+    waiting = set(by_id)
+    try:
+        while waiting:
+            for job in queue.jobs(run_id):
+                if job['id'] not in waiting or job['state'] not in FINISHED_STATES:
+                    continue
+                waiting.discard(job['id'])
+                segment = by_id[job['id']]
+                path = segment_path(segment['index'])
+                if job['state'] == 'done' and (job['result'] or {}).get('bytes'):
+                    logger.info(f"Segment {segment['index']} rendered by {job['worker']} "
+                                f"({len(by_id) - len(waiting)}/{len(by_id)})")
+                    if on_segment is not None:
+                        on_segment(segment, str(path))
+                else:
+                    logger.error(f"Segment {segment['index']} failed on the work queue: "
+                                 f"{job['error'] or 'every render attempt failed'}")
+                    if not path.exists():
+                        path.write_bytes(b'')
+            if waiting and clock.now() > deadline:
+                logger.error(f"{len(waiting)} segment renders did not finish in time; using placeholders")
+                for job_id in waiting:
+                    segment_path(by_id[job_id]['index']).write_bytes(b'')
+                break
+            if waiting:
+                clock.sleep(poll_interval)
+    finally:
+        stop.set()
+        # Idle workers exit within a poll; one still rendering after a timeout is left behind
+        # (its job is purged below, so its result is dropped)
+        join_deadline = time.monotonic() + poll_interval + 1
+        for thread in local:
+            thread.join(max(0.0, join_deadline - time.monotonic()))
+        busy = sum(thread.is_alive() for thread in local)
+        if busy:
+            logger.warning(f"Abandoning {busy} local render workers still busy with a segment")
+        queue.purge(run_id)
+
+
+def render_video_segments(visual_segments: List[Dict], config: dict,
+                          on_segment: Optional[Callable[[Dict, str], Any]] = None) -> List[str]:
     """Render individual video files for each segment.
     
+    Segments are rendered ``api.replicate.parallel_segments`` at a time.
+    A segment carrying a ``video_model`` (see ``model_router``) is
+    rendered with that model instead of the configured one. A segment
+    carrying ``reuse_of`` (see ``visual_dedup``) is not rendered; its clip
+    is derived from the source segment's clip once that exists.
+    
+    Args:
+        visual_segments: Segments with visual prompts
+        config: Project configuration
+        on_segment: Optional callback invoked with each segment and its
+            file path as soon as the file is written (e.g. to upload it or
+            update the preview)
+    
     Returns list of paths to video files.
     """
+    settings = config_for(config)
     logger = setup_logger(__name__)
     
-    out_dir = Path(config.get("output_dir", global_config.get("pipeline.output.directory", "output")))
+    out_dir = Path(config.get("output_dir", settings.get("pipeline.output.directory", "output")))
     segments_dir = out_dir / "segments"
     segments_dir.mkdir(parents=True, exist_ok=True)
     
-    video_paths = []
+    # Near-duplicate segments reuse another segment's clip (see visual_dedup)
+    rendered = [s for s in visual_segments if s.get('reuse_of') is None]
+    reused = [s for s in visual_segments if s.get('reuse_of') is not None]
+    
+    def _segment_path(index: int) -> Path:
+        return segments_dir / f"segment_{index:02d}.mp4"
     
-    # Check if we're in development mode with stubs
-    if global_config.get('development.use_stubs', True) or not has_replicate or requests is None:
+    queue = open_work_queue(config)
+    if queue is not None and rendered:
+        _render_via_queue(queue, rendered, _segment_path, config, logger, on_segment)
+    elif _use_stubs(settings):
         # Create placeholder videos
-        for segment in visual_segments:
-            segment_path = segments_dir / f"segment_{segment['index']:02d}.mp4"
-            placeholder_text = f"Segment {segment['index']}: {segment['visual_prompt'][:50]}..."
-            segment_path.write_text(placeholder_text)
-            video_paths.append(str(segment_path))
-            log_api_call(logger, "Replicate", "video generation (stub)", 
-                        {"segment": segment['index']}, stub_mode=True)
-        return video_paths
-    
-    # Get API token from environment
-    api_token_env = global_config.get('api.replicate.api_token_env', 'REPLICATE_API_TOKEN')
-    api_token = os.environ.get(api_token_env)
+        model_name = config.get("video_model", settings.get("api.replicate.video_model", "anotherjesse/zeroscope-v2-xl"))
+        
+        def _stub_render(segment: Dict) -> None:
+            path = _segment_path(segment['index'])
+            _render_stub_segment(segment, segment.get('video_model', model_name), path, config, logger)
+            if on_segment is not None:
+                on_segment(segment, str(path))
+        
+        # Renders only take (simulated) time on a virtual clock; see _render_stub_segment
+        workers = max(1, settings.get_int('api.replicate.parallel_segments', 1)) if clock.get_clock().virtual else 1
+        if workers > 1 and rendered:
+            clock.map_tracked(_stub_render, rendered, workers, thread_name_prefix="render")
+        else:
+            for segment in rendered:
+                _stub_render(segment)
+    else:
+        client = _client(config)
+        if client is None:
+            return []
+        _render_segments(rendered, client, _segment_path, config, logger, on_segment)
     
-    if not api_token:
-        logger.error(f"Replicate API token not found in environment variable {api_token_env}")
-        return []
+    for segment in reused:
+        source_path = _segment_path(segment['reuse_of'])
+        segment_path = _segment_path(segment['index'])
+        if source_path.exists() and source_path.stat().st_size > 0 and reuse_clip(
+                str(source_path), str(segment_path), segment['reuse_source_duration'],
+                segment['duration'], config):
+            logger.info(f"Segment {segment['index']}: {segment['reuse_action']} of segment "
+                        f"{segment['reuse_of']} instead of rendering")
+            if on_segment is not None:
+                on_segment(segment, str(segment_path))
+        else:
+            # The composer substitutes a placeholder for empty files
+            logger.warning(f"Could not reuse segment {segment['reuse_of']} for segment {segment['index']}")
+            segment_path.write_bytes(b'')
     
-    # Real video generation
-    model_name = config.get("video_model", global_config.get("api.replicate.video_model", "anotherjesse/zeroscope-v2-xl"))
+    return [str(_segment_path(segment['index'])) for segment in visual_segments]
+
+
+def _render_segments(segments: List[Dict], client, segment_path: Callable[[int], Path], config: dict,
+                     logger, on_segment: Optional[Callable[[Dict, str], Any]] = None) -> None:
+    """Render ``segments`` through Replicate, ``api.replicate.parallel_segments`` at a time."""
+    settings = config_for(config)
+    model_name = config.get("video_model", settings.get("api.replicate.video_model", "anotherjesse/zeroscope-v2-xl"))
+    hedge = HedgePolicy.from_config(config)
+    workers = max(1, settings.get_int('api.replicate.parallel_segments', 1))
+    remaining = list(segments)
+    progress_lock = threading.Lock()
     
-    for segment in visual_segments:
-        segment_path = segments_dir / f"segment_{segment['index']:02d}.mp4"
-        
-        # Prepare inputs based on model
-        if "google/veo" in model_name:
-            # Google Veo 3 - State of the art
-            inputs = {
-                "prompt": segment['visual_prompt'],
-                "aspect_ratio": "16:9",
-                "duration": segment['duration'],
-                "quality": "high",  # Options: "standard", "high"
-                "enable_audio": True,  # Native audio generation!
-                "seed": config.get("seed", 42)
-            }
-        elif "tencent/hunyuan-video" in model_name:
-            # HunyuanVideo - 13B parameter open-source
-            inputs = {
-                "prompt": segment['visual_prompt'],
-                "resolution": "1280x720",  # Options: "1280x720", "960x960", "720x1280"
-                "video_length": segment['duration'],
-                "guidance_scale": 7.0,
-                "num_inference_steps": 50,  # More steps = better quality
-                "flow_shift": 0,  # Controls motion amount
-                "embedded_guidance_scale": 6.0,
-                "seed": config.get("seed", 42)
-            }
-        elif model_name == "minimax/video-01":
-            # MiniMax Hailuo - Exceptional realism
-            inputs = {
-                "prompt": segment['visual_prompt'],
-                "prompt_optimizer": True,  # Auto-enhance prompts
-                "model": "video-01",
-                "duration": min(segment['duration'], 6)  # Max 6 seconds
-            }
-        elif model_name == "minimax/video-01-director":
-            # MiniMax Director - Cinematic camera control
-            inputs = {
-                "prompt": segment['visual_prompt'],
-                "camera_mode": "auto",  # Options: "auto", "zoom_in", "zoom_out", "pan_left", "pan_right", "tilt_up", "tilt_down"
-                "duration": min(segment['duration'], 6),
-                "prompt_optimizer": True
-            }
-        elif "kling" in model_name:
-            # Kling models - Highest resolution
-            inputs = {
-                "prompt": segment['visual_prompt'],
-                "aspect_ratio": "16:9",
-                "duration": min(segment['duration'], 10),  # 5 or 10 seconds
-                "mode": "standard" if "standard" in model_name else "pro",
-                "camera_motion": "auto"  # Professional camera movements
-            }
-        elif "mochi" in model_name:
-            # Genmo Mochi - 10B params, fine-tunable
-            inputs = {
-                "prompt": segment['visual_prompt'],
-                "num_frames": int(segment['duration'] * 30),  # 30 fps
-                "num_inference_steps": 64,
-                "guidance_scale": 4.5,
-                "seed": config.get("seed", 42)
-            }
-        elif "ltx-video" in model_name:
-            # LTX-Video - Real-time generation
-            inputs = {
-                "prompt": segment['visual_prompt'],
-                "num_frames": int(segment['duration'] * 24),  # 24 fps
-                "width": 768,
-                "height": 512,
-                "guidance_scale": 7.5,
-                "num_inference_steps": 25,  # Fewer steps for speed
-                "seed": config.get("seed", 42)
-            }
-        elif "stable-video-diffusion" in model_name:
-            # Stability AI SVD
-            inputs = {
-                "prompt": segment['visual_prompt'],
-                "num_frames": 25,  # Fixed at 25 frames
-                "sizing_strategy": "maintain_aspect_ratio",
-                "motion_bucket_id": 127,  # Controls motion amount
-                "cond_aug": 0.02,
-                "decoding_t": 14,
-                "seed": config.get("seed", 42)
-            }
-        elif "zeroscope" in model_name:
-            # Zeroscope - Fast but lower quality
-            inputs = {
-                "prompt": segment['visual_prompt'],
-                "num_frames": int(segment['duration'] * 8),  # 8 fps
-                "height": 320,
-                "width": 576,
-                "num_inference_steps": 50,
-                "guidance_scale": 17.5,
-                "negative_prompt": "very blue, dust, noisy, washed out, ugly, distorted, broken",
-                "fps": 8,
-                "seed": config.get("seed", 42)
-            }
-        else:
-            # Generic inputs for unknown models
-            inputs = {
-                "prompt": segment['visual_prompt']
-            }
-            if hasattr(segment, 'duration'):
-                inputs["duration"] = segment['duration']
-        
-        # Get retry configuration
-        max_retries = global_config.get('retry.max_attempts', 3) if "google/veo" in model_name or "hunyuan" in model_name else 1
-        retry_delay = global_config.get('retry.delay_seconds', 30)
-        
-        for attempt in range(max_retries):
-            try:
-                # Configure Replicate client
-                if has_replicate:
-                    replicate.Client(api_token=api_token)
-                
-                # Log expected generation time
-                expected_time = estimate_generation_time(model_name, segment['duration'])
-                logger.info(f"Expected generation time: {expected_time}")
-                
-                # Log API call
-                log_api_call(logger, "Replicate", "video generation", 
-                            {"model": model_name, "segment": segment['index'], "duration": segment['duration'], "attempt": attempt + 1}, 
-                            stub_mode=False)
-                
-                # Run the model
-                if attempt > 0:
-                    logger.info(f"Retry {attempt + 1}/{max_retries}: Generating video segment {segment['index']} with {model_name}")
-                else:
-                    logger.info(f"Generating video segment {segment['index']} with {model_name}")
-                
-                # Set timeout based on model
-                import replicate.client
-                if "google/veo" in model_name or "hunyuan" in model_name:
-                    # Longer timeout for premium models
-                    timeout_seconds = global_config.get('retry.timeout_minutes', 10) * 60
-                    client = replicate.Client(api_token=api_token)
-                    client.timeout = timeout_seconds
-                    output = client.run(model_name, input=inputs)
-                else:
-                    output = replicate.run(model_name, input=inputs)
-                
-                # Handle different output formats
-                handled = False
-                
-                if hasattr(output, 'read'):
-                    # It's a file-like object from Replicate
-                    logger.info(f"Downloading segment {segment['index']} directly from file object")
-                    segment_path.write_bytes(output.read())
-                    logger.info(f"Successfully generated and saved segment {segment['index']} to {segment_path}")
-                    handled = True
-                else:
-                    # Try to get URL from various formats
-                    output_url = None
-                    if isinstance(output, str):
-                        output_url = output
-                    elif isinstance(output, dict) and 'video' in output:
-                        output_url = output['video']
-                    elif isinstance(output, list) and len(output) > 0:
-                        output_url = output[0]
-                    else:
-                        output_url = str(output)
-                    
-                    # Download the video file if we have a URL
-                    if output_url and isinstance(output_url, str) and output_url.startswith('http'):
-                        logger.info(f"Downloading segment {segment['index']} from {output_url}")
-                        response = requests.get(output_url, timeout=300)  # 5 minute timeout
-                        response.raise_for_status()
-                        segment_path.write_bytes(response.content)
-                        logger.info(f"Successfully generated and saved segment {segment['index']} to {segment_path}")
-                        handled = True
-                
-                if not handled:
-                    logger.error(f"Could not handle output from Replicate for segment {segment['index']}: {type(output)}")
-                    # Create empty file as placeholder
-                    segment_path.write_bytes(b'')
-                else:
-                    # Success! Break out of retry loop
-                    break
-                    
-            except Exception as e:
-                logger.error(f"Failed to generate segment {segment['index']} (attempt {attempt + 1}/{max_retries}): {type(e).__name__}: {str(e)}")
-                
-                # If not the last attempt, wait before retrying
-                if attempt < max_retries - 1:
-                    logger.info(f"Waiting {retry_delay} seconds before retry...")
-                    import time
-                    time.sleep(retry_delay)
-                else:
-                    # Final attempt failed, create empty file as placeholder
-                    logger.error(f"All attempts failed for segment {segment['index']}")
-                    segment_path.write_bytes(b'')
-        
-        video_paths.append(str(segment_path))
+    def _render(segment: Dict) -> None:
+        path = segment_path(segment['index'])
+        _render_segment(client, segment, segment.get('video_model', model_name), path,
+                        hedge, config, logger)
+        with progress_lock:
+            remaining.remove(segment)
+            left = list(remaining)
+        eta = estimate_render_seconds(left, config) if left else 0
+        logger.info(f"Rendered {len(segments) - len(left)}/{len(segments)} segments; "
+                    f"about {eta / 60:.1f} min remaining")
+        if on_segment is not None and path.stat().st_size > 0:
+            on_segment(segment, str(path))
     
-    return video_paths
+    if workers == 1:
+        for segment in segments:
+            _render(segment)
+    else:
+        # Segments are independent; the rate limiter bounds in-flight predictions
+        clock.map_tracked(_render, segments, workers, thread_name_prefix="render")
+    set_log_context(segment=None)
 
 
 def render_video(prompts: List[str], voice_path: str, config: dict) -> str:
@@ -1,108 +1,544 @@
 """Deployment helper for uploading assets to S3."""
 
-import os
+import contextvars
+import fnmatch
+import hashlib
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
 from pathlib import Path
-from typing import Optional
-from core.utils.config import config as global_config
+from typing import Dict, List, Optional, Any
+from core.utils.config import config_for
 from core.utils.logger import setup_logger, log_api_call
 
-try:
-    import boto3
-    from botocore.exceptions import BotoCore3Error, NoCredentialsError
-    has_boto3 = True
-except ImportError:
-    has_boto3 = False
-    BotoCore3Error = Exception
-    NoCredentialsError = Exception
+from core.utils.lazy_imports import has_module
+
+has_boto3 = has_module('boto3')
+
+# Bound by _load_boto3() when the first client is created
+boto3 = None
+TransferConfig = None
+BotoCoreError = ClientError = NoCredentialsError = Exception
+
+
+def _load_boto3() -> None:
+    """Import boto3 and the botocore exception types on first live use."""
+    global boto3, TransferConfig, BotoCoreError, ClientError, NoCredentialsError
+    if boto3 is not None:
+        return
+    import boto3 as sdk
+    from boto3.s3.transfer import TransferConfig
+    from botocore.exceptions import BotoCoreError, ClientError, NoCredentialsError
+    boto3 = sdk
+
+
+# One client per (profile, region, endpoint); boto3 clients are thread-safe
+_clients: Dict[tuple, Any] = {}
+_clients_lock = threading.Lock()
+
+CONTENT_TYPES = {
+    ".mp4": "video/mp4",
+    ".mp3": "audio/mpeg",
+    ".wav": "audio/wav",
+    ".html": "text/html",
+    ".json": "application/json",
+    ".txt": "text/plain",
+    ".md": "text/plain",
+    ".m3u8": "application/vnd.apple.mpegurl",
+    ".m4s": "video/iso.segment",
+}
+
+# Manifests are published after the media they reference
+PLAYLIST_SUFFIXES = (".m3u8",)
+
+MB = 1024 * 1024
+
+
+def _get_s3_client(settings, region: str):
+    """Return a cached S3 client for the configured profile and endpoint.
+
+    ``api.s3.endpoint_url`` points the client at an S3-compatible stand-in
+    (MinIO, LocalStack, moto server) for local testing.
+    """
+    profile = settings.get("api.s3.profile", settings.get("api.bedrock.profile", "personal"))  # Use same AWS profile
+    endpoint_url = settings.get("api.s3.endpoint_url")
+    key = (profile, region, endpoint_url)
+
+    _load_boto3()
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            session = boto3.Session(profile_name=profile) if profile else boto3.Session()
+            client = session.client('s3', region_name=region, endpoint_url=endpoint_url)
+            _clients[key] = client
+    return client
+
+
+def _transfer_config(settings) -> "TransferConfig":
+    """Build the multipart transfer settings from ``api.s3.transfer``."""
+    _load_boto3()
+    return TransferConfig(
+        multipart_threshold=int(settings.get("api.s3.transfer.multipart_threshold_mb", 16)) * MB,
+        multipart_chunksize=int(settings.get("api.s3.transfer.multipart_chunksize_mb", 16)) * MB,
+        max_concurrency=int(settings.get("api.s3.transfer.max_concurrency", 8)),
+        use_threads=True,
+    )
+
+
+def _content_type(file_path: Path) -> str:
+    """Determine the content type for an artifact."""
+    return CONTENT_TYPES.get(file_path.suffix, "application/octet-stream")
+
+
+def _local_etag(file_path: Path, threshold: int, chunk_size: int) -> str:
+    """Compute the ETag S3 assigns to ``file_path`` for the given transfer settings.
+
+    Single-part uploads get the MD5 of the content; multipart uploads get the
+    MD5 of the concatenated part digests followed by ``-<parts>``.
+    """
+    size = file_path.stat().st_size
+    with open(file_path, 'rb') as f:
+        if size < threshold:
+            return hashlib.md5(f.read()).hexdigest()
+
+        part_digests = []
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            part_digests.append(hashlib.md5(chunk).digest())
+    return f"{hashlib.md5(b''.join(part_digests)).hexdigest()}-{len(part_digests)}"
+
+
+def _is_unchanged(s3_client, bucket: str, key: str, file_path: Path, local_etag: str) -> bool:
+    """Check whether the object in S3 already matches the local file."""
+    try:
+        head = s3_client.head_object(Bucket=bucket, Key=key)
+    except ClientError:
+        return False
+
+    if head.get('ContentLength') != file_path.stat().st_size:
+        return False
+    return head.get('ETag', '').strip('"') == local_etag
+
+
+def _deploy_target(config: dict, settings) -> tuple:
+    """Resolve the bucket and region for a project."""
+    deployment = config.get("deployment", {})
+    bucket = deployment.get("s3_bucket", settings.get("api.s3.default_bucket"))
+    region = deployment.get("s3_region", settings.get("api.s3.region", "us-east-1"))
+    return bucket, region
+
+
+def _upload_one(s3_client, transfer_config, bucket: str, region: str, key: str,
+                file_path: Path, logger, skip_unchanged: bool = True) -> Dict[str, Any]:
+    """Upload a single file unless an identical object is already in S3.
+
+    Returns:
+        Dict with url, bytes uploaded and whether the upload was skipped
+    """
+    s3_url = f"https://{bucket}.s3.{region}.amazonaws.com/{key}"
+    size = file_path.stat().st_size
+
+    if skip_unchanged:
+        local_etag = _local_etag(file_path, transfer_config.multipart_threshold,
+                                 transfer_config.multipart_chunksize)
+        if _is_unchanged(s3_client, bucket, key, file_path, local_etag):
+            logger.info(f"Skipping unchanged s3://{bucket}/{key}")
+            return {'url': s3_url, 'bytes': 0, 'skipped': True}
+
+    # Log API call
+    log_api_call(logger, "S3", "upload",
+                {"bucket": bucket, "key": key, "size": size},
+                stub_mode=False)
+    logger.info(f"Uploading {file_path.name} to s3://{bucket}/{key}")
+
+    s3_client.upload_file(
+        str(file_path),
+        bucket,
+        key,
+        ExtraArgs={
+            'ContentType': _content_type(file_path),
+            'ACL': 'public-read'  # Make publicly accessible
+        },
+        Config=transfer_config
+    )
+
+    logger.info(f"Successfully uploaded to: {s3_url}")
+    return {'url': s3_url, 'bytes': size, 'skipped': False}
+
+
+def _s3_key(project_name: str, file_path: Path, base_dir: Optional[Path]) -> str:
+    """Build the S3 key, keeping the layout relative to ``base_dir`` when possible."""
+    if base_dir is not None:
+        try:
+            relative = file_path.resolve().relative_to(Path(base_dir).resolve()).as_posix()
+            return f"{project_name}/{relative}"
+        except ValueError:
+            pass
+    return f"{project_name}/{file_path.name}"
+
+
+class _StreamCounter:
+    """Read-only wrapper that counts the bytes pulled from a stream."""
+
+    def __init__(self, fileobj):
+        self._fileobj = fileobj
+        self.bytes_read = 0
+
+    def read(self, size: int = -1) -> bytes:
+        data = self._fileobj.read(size)
+        self.bytes_read += len(data)
+        return data
+
+    def readable(self) -> bool:
+        return True
+
+
+class BackgroundUploader:
+    """Upload artifacts to S3 while the pipeline is still producing them.
+
+    Files can be queued explicitly with ``submit`` (e.g. as each video
+    segment finishes) or picked up by ``watch``, which polls the output
+    directory and uploads files once their size and mtime have settled.
+    A file is uploaded again only if it changed since it was queued.
+    ``wait`` stops the watcher, queues anything not yet seen and blocks
+    until every upload is done.
+    """
+
+    def __init__(self, config: dict, base_dir: Optional[Path] = None):
+        self.config = config
+        self.settings = config_for(config)
+        self.logger = setup_logger(__name__)
+        self.base_dir = Path(base_dir) if base_dir is not None else None
+        self.project_name = config.get('project_name', 'default')
+        self.bucket, self.region = _deploy_target(config, self.settings)
+        self.skip_unchanged = self.settings.get_bool('api.s3.skip_unchanged', True)
+        self.exclude = list(self.settings.get('api.s3.background.exclude', []) or [])
+        self.stub = self.settings.get_bool('development.use_stubs') or not has_boto3
+
+        self.s3_client = None
+        self.transfer_config = None
+        if not self.stub:
+            if not self.bucket:
+                self.logger.error("S3 bucket not configured")
+            else:
+                try:
+                    self.s3_client = _get_s3_client(self.settings, self.region)
+                    self.transfer_config = _transfer_config(self.settings)
+                except (NoCredentialsError, BotoCoreError) as e:
+                    self.logger.error(f"Could not create S3 client: {type(e).__name__}: {str(e)}")
+
+        self._lock = threading.Lock()
+        self._signatures: Dict[str, tuple] = {}
+        self._claimed: set = set()
+        self._streamed: Dict[str, int] = {}
+        self._futures: List[Future] = []
+        self._urls: Dict[str, Optional[str]] = {}
+        self._results: List[Dict[str, Any]] = []
+        self._stop = threading.Event()
+        self._watcher: Optional[threading.Thread] = None
+        self._started = time.time()
+
+        max_workers = max(1, int(self.settings.get("api.s3.max_workers", 4)))
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="s3-deploy")
+
+    def _excluded(self, file_path: Path) -> bool:
+        """Match exclude patterns against the file name and its path under ``base_dir``."""
+        names = [file_path.name]
+        if self.base_dir is not None:
+            try:
+                names.append(file_path.relative_to(self.base_dir).as_posix())
+            except ValueError:
+                pass
+        return any(fnmatch.fnmatch(name, pattern) for name in names for pattern in self.exclude)
+
+    def submit(self, path) -> Optional[Future]:
+        """Queue ``path`` for upload unless it is unchanged since it was last queued.
+
+        Args:
+            path: Local file path to upload
+
+        Returns:
+            The upload future, or None if nothing was queued
+        """
+        if not path:
+            return None
+        path = str(path)
+        file_path = Path(path)
+
+        if not file_path.exists():
+            self.logger.error(f"File not found: {path}")
+            with self._lock:
+                self._urls.setdefault(path, None)
+            return None
+
+        if self.stub:
+            bucket = self.bucket or "demo"
+            print(f"Uploading {path} to s3://{bucket}/")
+            log_api_call(self.logger, "S3", "upload (stub)",
+                        {"path": path, "bucket": bucket}, stub_mode=True)
+            with self._lock:
+                self._urls[path] = f"s3://{bucket}/{file_path.name}"
+            return None
+
+        if self.s3_client is None:
+            with self._lock:
+                self._urls[path] = None
+            return None
+
+        stat = file_path.stat()
+        signature = (stat.st_size, stat.st_mtime_ns)
+        with self._lock:
+            if path in self._claimed:
+                # Streamed copies stand unless the local file was replaced afterwards
+                if self._streamed.get(path, signature[0]) == signature[0]:
+                    return None
+                self._claimed.discard(path)
+            if self._signatures.get(path) == signature:
+                return None
+            self._signatures[path] = signature
+            # Each task runs in a copy of the caller's context to keep log fields
+            future = self._pool.submit(contextvars.copy_context().run, self._upload, path, file_path)
+            self._futures.append(future)
+        return future
+
+    def _upload(self, path: str, file_path: Path) -> Optional[Dict[str, Any]]:
+        s3_key = _s3_key(self.project_name, file_path, self.base_dir)
+        result = None
+        try:
+            result = _upload_one(self.s3_client, self.transfer_config, self.bucket, self.region,
+                                 s3_key, file_path, self.logger, self.skip_unchanged)
+        except NoCredentialsError:
+            self.logger.error("AWS credentials not found. Please configure AWS credentials.")
+        except (BotoCoreError, ClientError) as e:
+            self.logger.error(f"S3 upload error: {type(e).__name__}: {str(e)}")
+        except Exception as e:
+            self.logger.error(f"Unexpected error during S3 upload: {type(e).__name__}: {str(e)}")
+
+        with self._lock:
+            self._urls[path] = result['url'] if result else None
+            if result:
+                self._results.append(result)
+        return result
+
+    def upload_stream(self, fileobj, path) -> Optional[str]:
+        """Upload a stream as it is produced, e.g. a muxer writing to stdout.
+
+        The stream is sent as a multipart upload under the key ``path``
+        would get. While the upload runs, ``path`` is left alone by the
+        watcher; if it fails, the finished local file is uploaded by
+        ``wait`` instead.
+
+        Args:
+            fileobj: Readable, non-seekable stream
+            path: Local file the stream is also written to
+
+        Returns:
+            S3 URL if successful, None otherwise
+        """
+        path = str(path)
+        if self.stub or self.s3_client is None:
+            return None
+
+        with self._lock:
+            self._claimed.add(path)
+
+        s3_key = _s3_key(self.project_name, Path(path), self.base_dir)
+        s3_url = f"https://{self.bucket}.s3.{self.region}.amazonaws.com/{s3_key}"
+        counter = _StreamCounter(fileobj)
+        log_api_call(self.logger, "S3", "upload (stream)",
+                    {"bucket": self.bucket, "key": s3_key}, stub_mode=False)
+        self.logger.info(f"Streaming {Path(path).name} to s3://{self.bucket}/{s3_key}")
+
+        try:
+            self.s3_client.upload_fileobj(
+                counter,
+                self.bucket,
+                s3_key,
+                ExtraArgs={
+                    'ContentType': _content_type(Path(path)),
+                    'ACL': 'public-read'
+                },
+                Config=self.transfer_config
+            )
+        except Exception as e:
+            self.logger.error(f"S3 stream upload error: {type(e).__name__}: {str(e)}")
+            with self._lock:
+                self._claimed.discard(path)
+            return None
+
+        self.logger.info(f"Successfully streamed to: {s3_url}")
+        with self._lock:
+            self._urls[path] = s3_url
+            self._streamed[path] = counter.bytes_read
+            self._results.append({'url': s3_url, 'bytes': counter.bytes_read, 'skipped': False})
+        return s3_url
+
+    def upload_set(self, paths: List[str]) -> Dict[str, Optional[str]]:
+        """Upload a group of related files and wait for them.
+
+        Media files go up concurrently; playlists are uploaded only once
+        everything else in the set is in S3, so a published playlist never
+        references a missing segment.
+
+        Args:
+            paths: Files in the set
+
+        Returns:
+            Mapping of path to S3 URL (None on failure)
+        """
+        paths = [str(p) for p in paths if p]
+        media = [p for p in paths if not p.endswith(PLAYLIST_SUFFIXES)]
+        playlists = [p for p in paths if p.endswith(PLAYLIST_SUFFIXES)]
+
+        for group in (media, playlists):
+            futures = [self.submit(path) for path in group]
+            for future in futures:
+                if future is not None:
+                    future.result()
+
+        with self._lock:
+            return {path: self._urls.get(path) for path in paths}
+
+    def _scan(self, directory: Path) -> Dict[str, tuple]:
+        """Return size/mtime signatures for the uploadable files under ``directory``."""
+        signatures = {}
+        for file_path in directory.rglob('*'):
+            if self._excluded(file_path):
+                continue
+            try:
+                stat = file_path.stat()
+            except OSError:
+                continue
+            # Empty files are failed renders that get replaced by placeholders
+            if file_path.is_file() and stat.st_size > 0:
+                signatures[str(file_path)] = (stat.st_size, stat.st_mtime_ns)
+        return signatures
+
+    def watch(self, directory: Optional[Path] = None, interval: Optional[float] = None) -> None:
+        """Start polling ``directory`` (default ``base_dir``) for finished files.
+
+        A file is considered finished once its size and mtime are the same
+        on two consecutive polls.
+        """
+        directory = Path(directory) if directory is not None else self.base_dir
+        if directory is None or self._watcher is not None:
+            return
+        if interval is None:
+            interval = float(self.settings.get('api.s3.background.poll_interval', 1.0))
+
+        def _loop():
+            previous: Dict[str, tuple] = {}
+            while not self._stop.wait(interval):
+                current = self._scan(directory)
+                for path, signature in current.items():
+                    if previous.get(path) == signature:
+                        self.submit(path)
+                previous = current
+
+        self._watcher = threading.Thread(target=contextvars.copy_context().run, args=(_loop,),
+                                         name="s3-watch", daemon=True)
+        self._watcher.start()
+
+    def wait(self, paths: Optional[List[str]] = None) -> Dict[str, Any]:
+        """Stop watching, upload anything outstanding and wait for completion.
+
+        Args:
+            paths: Extra files to make sure are uploaded (None entries are ignored)
+
+        Returns:
+            Summary with ``urls`` (path -> S3 URL or None), ``uploaded``,
+            ``skipped``, ``bytes``, ``seconds`` and ``throughput_mbps``
+        """
+        self._stop.set()
+        if self._watcher is not None:
+            self._watcher.join()
+            if self.base_dir is not None:
+                for path in self._scan(self.base_dir):
+                    self.submit(path)
+
+        for path in paths or []:
+            self.submit(path)
+
+        while True:
+            with self._lock:
+                pending = [future for future in self._futures if not future.done()]
+            if not pending:
+                break
+            for future in pending:
+                future.result()
+        self._pool.shutdown(wait=True)
+
+        elapsed = time.time() - self._started
+        with self._lock:
+            results = list(self._results)
+            urls = dict(self._urls)
+        uploaded = [result for result in results if not result['skipped']]
+        total_bytes = sum(result['bytes'] for result in uploaded)
+        summary = {
+            'urls': urls,
+            'uploaded': len(uploaded),
+            'skipped': len(results) - len(uploaded),
+            'bytes': total_bytes,
+            'seconds': elapsed,
+            'throughput_mbps': (total_bytes / MB) / elapsed if elapsed > 0 else 0.0,
+        }
+        if not self.stub:
+            self.logger.info(
+                f"S3 deploy: {summary['uploaded']} uploaded, {summary['skipped']} unchanged, "
+                f"{total_bytes / MB:.1f} MB in {elapsed:.2f}s ({summary['throughput_mbps']:.1f} MB/s)"
+            )
+        return summary
 
 
 def deploy(path: str, config: dict) -> Optional[str]:
     """Deploy an artifact to S3.
-    
+
     Args:
         path: Local file path to upload
         config: Project configuration
-        
+
     Returns:
         S3 URL if successful, None otherwise
     """
-    logger = setup_logger(__name__)
-    
-    # Check if we're in development mode or boto3 not available
-    if global_config.get('development.use_stubs', True) or not has_boto3:
-        bucket = config.get("deployment", {}).get("s3_bucket", global_config.get("api.s3.default_bucket", "demo"))
-        print(f"Uploading {path} to s3://{bucket}/")
-        log_api_call(logger, "S3", "upload (stub)", 
-                    {"path": path, "bucket": bucket}, stub_mode=True)
-        return f"s3://{bucket}/{Path(path).name}"
-    
-    # Get S3 configuration
-    bucket = config.get("deployment", {}).get("s3_bucket", global_config.get("api.s3.default_bucket"))
-    region = config.get("deployment", {}).get("s3_region", global_config.get("api.s3.region", "us-east-1"))
-    profile = global_config.get("api.bedrock.profile", "personal")  # Use same AWS profile
-    
-    if not bucket:
-        logger.error("S3 bucket not configured")
-        return None
-    
-    file_path = Path(path)
-    if not file_path.exists():
-        logger.error(f"File not found: {path}")
-        return None
-    
-    try:
-        # Create S3 client with profile
-        session = boto3.Session(profile_name=profile)
-        s3_client = session.client('s3', region_name=region)
-        
-        # Generate S3 key
-        project_name = config.get('project_name', 'default')
-        s3_key = f"{project_name}/{file_path.name}"
-        
-        # Log API call
-        log_api_call(logger, "S3", "upload", 
-                    {"bucket": bucket, "key": s3_key, "size": file_path.stat().st_size}, 
-                    stub_mode=False)
-        
-        # Upload file
-        logger.info(f"Uploading {file_path.name} to s3://{bucket}/{s3_key}")
-        
-        # Determine content type
-        content_type = "application/octet-stream"
-        if file_path.suffix == ".mp4":
-            content_type = "video/mp4"
-        elif file_path.suffix == ".mp3":
-            content_type = "audio/mpeg"
-        elif file_path.suffix == ".html":
-            content_type = "text/html"
-        elif file_path.suffix == ".json":
-            content_type = "application/json"
-        elif file_path.suffix in [".txt", ".md"]:
-            content_type = "text/plain"
-        
-        s3_client.upload_file(
-            str(file_path),
-            bucket,
-            s3_key,
-            ExtraArgs={
-                'ContentType': content_type,
-                'ACL': 'public-read'  # Make publicly accessible
-            }
-        )
-        
-        # Generate public URL
-        s3_url = f"https://{bucket}.s3.{region}.amazonaws.com/{s3_key}"
-        logger.info(f"Successfully uploaded to: {s3_url}")
-        
-        return s3_url
-        
-    except NoCredentialsError:
-        logger.error("AWS credentials not found. Please configure AWS credentials.")
-        return None
-    except BotoCore3Error as e:
-        logger.error(f"S3 upload error: {type(e).__name__}: {str(e)}")
-        return None
-    except Exception as e:
-        logger.error(f"Unexpected error during S3 upload: {type(e).__name__}: {str(e)}")
-        return None
+    return deploy_many([path], config)['urls'].get(str(path))
+
+
+def deploy_many(paths: List[str], config: dict, base_dir: Optional[Path] = None) -> Dict[str, Any]:
+    """Deploy several artifacts to S3 concurrently.
+
+    Uploads share one client and a multipart ``TransferConfig``; objects
+    whose size and ETag already match the local file are skipped.
+
+    Args:
+        paths: Local file paths to upload (None entries are ignored)
+        config: Project configuration
+        base_dir: Optional directory whose relative layout is kept in the
+            S3 keys; otherwise files are stored by name under the project
+
+    Returns:
+        Summary with ``urls`` (path -> S3 URL or None), ``uploaded``,
+        ``skipped``, ``bytes``, ``seconds`` and ``throughput_mbps``
+    """
+    uploader = BackgroundUploader(config, base_dir=base_dir)
+    return uploader.wait([str(p) for p in paths if p])
+
+
+def deploy_package(package: Dict[str, Any], config: dict, base_dir: Optional[Path] = None,
+                   uploader: Optional[BackgroundUploader] = None) -> Dict[str, Optional[str]]:
+    """Deploy a packaged video (fragmented MP4 and HLS) as a set.
+
+    Args:
+        package: Result of ``video_packager.package_video``
+        config: Project configuration
+        base_dir: Directory whose relative layout is kept in the S3 keys
+        uploader: Running uploader to reuse; a new one is used otherwise
+
+    Returns:
+        Mapping of package file path to S3 URL (None on failure)
+    """
+    if uploader is not None:
+        return uploader.upload_set(package.get('files', []))
 
+    uploader = BackgroundUploader(config, base_dir=base_dir)
+    urls = uploader.upload_set(package.get('files', []))
+    uploader.wait()
+    return urls
@@ -1,43 +1,249 @@
 """Video composition for assembling segments with synchronized audio."""
 
+import contextvars
+import os
 from pathlib import Path
+import shutil
 import subprocess
-from typing import List, Dict
-from core.utils.config import config as global_config
+import threading
+from typing import Callable, List, Dict, Optional, Tuple
+from core.utils.config import config as global_config, config_for
 from core.utils.logger import setup_logger
+from core.utils.ffmpeg_runner import FFmpegError, FFmpegProcess, run_ffmpeg
+from core.services.music_library import probe_duration
 
+# Clips may fall this far short of their narration before they are padded
+PAD_TOLERANCE_SECONDS = 0.05
 
-def create_placeholder_video(output_path: str, duration: float, text: str = "") -> bool:
-    """Create a simple placeholder video with text overlay.
+
+def _escape_filter_arg(value: str) -> str:
+    """Escape ``value`` for use as a filter option inside a filtergraph.
+
+    Two levels apply: the option value (``\\``, ``'`` and ``:``) and then
+    the filtergraph description (``\\``, ``'``, ``[``, ``]``, ``,`` and ``;``).
+    """
+    for char in "\\':":
+        value = value.replace(char, "\\" + char)
+    for char in "\\'[],;":
+        value = value.replace(char, "\\" + char)
+    return value
+
+
+def _placeholder_settings(project_config: Optional[Dict] = None) -> Dict:
+    settings = config_for(project_config)
+    return {
+        'width': int(settings.get('pipeline.placeholders.width', 576)),
+        'height': int(settings.get('pipeline.placeholders.height', 320)),
+        'fps': int(settings.get('pipeline.placeholders.fps', 8)),
+        'profile': settings.get('pipeline.placeholders.profile', 'main'),
+        'cache_dir': Path(settings.get('pipeline.placeholders.cache_dir', 'cache/placeholders')).expanduser(),
+        'text_overlay': bool(settings.get('pipeline.placeholders.text_overlay', False)),
+        'hard_link': bool(settings.get('pipeline.placeholders.hard_link', False)),
+    }
+
+
+def _encode_args(params: Dict) -> List[str]:
+    return ["-c:v", "libx264", "-preset", "ultrafast", "-tune", "stillimage",
+            "-profile:v", params['profile'], "-pix_fmt", "yuv420p", "-r", str(params['fps'])]
+
+
+def placeholder_clip(duration: float, project_config: Optional[Dict] = None) -> Optional[Path]:
+    """Return a cached black clip of ``duration`` seconds, encoding it on first use.
+
+    Clips are keyed by duration, resolution, frame rate and H.264 profile
+    under ``pipeline.placeholders.cache_dir``.
+
+    Returns:
+        Path to the cached clip, or None if it could not be encoded
+    """
+    params = _placeholder_settings(project_config)
+    clip = params['cache_dir'] / (f"{params['width']}x{params['height']}_{params['fps']}fps_"
+                                  f"{params['profile']}_{duration:g}s.mp4")
+    if clip.exists():
+        return clip
+    clip.parent.mkdir(parents=True, exist_ok=True)
+    partial = clip.with_suffix(f".{os.getpid()}.tmp.mp4")
+    cmd = [
+        "ffmpeg", "-y",
+        "-f", "lavfi",
+        "-i", f"color=c=black:s={params['width']}x{params['height']}:d={duration}:r={params['fps']}",
+    ] + _encode_args(params) + ["-t", str(duration), str(partial)]
+    try:
+        run_ffmpeg(cmd, "placeholder", project_config=project_config)
+    except (OSError, subprocess.CalledProcessError):
+        partial.unlink(missing_ok=True)
+        return None
+    os.replace(partial, clip)
+    return clip
+
+
+def _place_clip(clip: Path, output_path: str, hard_link: bool) -> bool:
+    """Put a cached clip at ``output_path`` by hard link or copy."""
+    out_file = Path(output_path)
+    try:
+        out_file.unlink(missing_ok=True)
+        if hard_link:
+            try:
+                os.link(clip, out_file)
+                return True
+            except OSError:
+                pass
+        shutil.copyfile(clip, out_file)
+        return True
+    except OSError:
+        return False
+
+
+def create_placeholder_videos(jobs: List[Tuple[str, float, str]],
+                              project_config: Optional[Dict] = None) -> Dict[str, bool]:
+    """Create placeholder clips for several outputs at once.
+
+    Each output gets the cached black clip for its duration. With
+    ``pipeline.placeholders.text_overlay`` the labels are drawn onto those
+    clips in a single ffmpeg call with one output per job; if that fails
+    the plain clips are used.
+
+    Args:
+        jobs: (output path, duration in seconds, overlay text) per placeholder
+        project_config: Optional project configuration
+
+    Returns:
+        Whether each output path was created
+    """
+    params = _placeholder_settings(project_config)
+    clips = {}
+    for _, duration, _ in jobs:
+        if duration not in clips:
+            clips[duration] = placeholder_clip(duration, project_config)
+
+    results = {}
+    overlays = []
+    for path, duration, text in jobs:
+        if clips[duration] is None:
+            results[path] = False
+        elif params['text_overlay'] and text:
+            overlays.append((path, duration, text))
+        else:
+            results[path] = _place_clip(clips[duration], path, params['hard_link'])
+
+    if overlays:
+        durations = list(dict.fromkeys(duration for _, duration, _ in overlays))
+        cmd = ["ffmpeg", "-y"]
+        for duration in durations:
+            cmd += ["-i", str(clips[duration])]
+        # Inputs used by several overlays are split between them
+        graph = []
+        labels = {}
+        for index, duration in enumerate(durations):
+            users = [n for n, job in enumerate(overlays) if job[1] == duration]
+            if len(users) == 1:
+                labels[users[0]] = f"{index}:v"
+            else:
+                graph.append(f"[{index}:v]split={len(users)}" + "".join(f"[s{n}]" for n in users))
+                labels.update((n, f"s{n}") for n in users)
+        outputs = []
+        for n, (path, duration, text) in enumerate(overlays):
+            graph.append(
+                f"[{labels[n]}]drawtext=expansion=none:text={_escape_filter_arg(text)}:"
+                f"fontcolor=white:fontsize=24:x=(w-text_w)/2:y=(h-text_h)/2[v{n}]"
+            )
+            outputs += ["-map", f"[v{n}]"] + _encode_args(params) + [str(path)]
+        try:
+            run_ffmpeg(cmd + ["-filter_complex", ";".join(graph)] + outputs, "placeholder_overlay",
+                       project_config=project_config)
+            results.update((path, True) for path, _, _ in overlays)
+        except (OSError, subprocess.CalledProcessError):
+            for path, duration, _ in overlays:
+                results[path] = _place_clip(clips[duration], path, params['hard_link'])
+    return results
+
+
+def create_placeholder_video(output_path: str, duration: float, text: str = "",
+                             project_config: Optional[Dict] = None) -> bool:
+    """Create a placeholder video, optionally with a text overlay.
     
     Args:
         output_path: Path for the output video
         duration: Duration in seconds
-        text: Optional text to display
+        text: Optional text to display (with ``pipeline.placeholders.text_overlay``)
+        project_config: Optional project configuration
         
     Returns:
         True if successful, False otherwise
     """
-    try:
-        # Create a black video with optional text
-        filter_complex = f"color=c=black:s=576x320:d={duration}:r=8"
-        
-        if text:
-            # Add text overlay
-            filter_complex += f",drawtext=text='{text}':fontcolor=white:fontsize=24:x=(w-text_w)/2:y=(h-text_h)/2"
+    return create_placeholder_videos([(output_path, duration, text)], project_config)[output_path]
+
+
+def reuse_clip(source_path: str, output_path: str, source_duration: float,
+               target_duration: float, project_config: Optional[Dict] = None) -> bool:
+    """Derive a segment's clip from another segment's rendered clip.
+    
+    Equal durations copy the file. A shorter target is trimmed with stream
+    copy. A longer target is re-timed by slowing the clip down to fill
+    ``target_duration`` (re-encoded).
+    
+    Args:
+        source_path: Rendered clip to reuse
+        output_path: Path for the derived clip
+        source_duration: Duration the source was rendered for
+        target_duration: Duration the derived clip must cover
+        project_config: Optional project configuration
         
+    Returns:
+        True if successful, False otherwise
+    """
+    settings = config_for(project_config)
+    if settings.get_bool('development.use_stubs') or target_duration == source_duration:
+        shutil.copyfile(source_path, output_path)
+        return True
+    
+    if target_duration < source_duration:
+        cmd = ["ffmpeg", "-y", "-i", source_path, "-t", str(target_duration), "-c", "copy", output_path]
+    else:
+        factor = target_duration / source_duration
         cmd = [
-            "ffmpeg",
-            "-y",
-            "-f", "lavfi",
-            "-i", filter_complex,
+            "ffmpeg", "-y", "-i", source_path,
+            "-filter:v", f"setpts={factor:.4f}*PTS",
+            "-an",
             "-c:v", "libx264",
             "-pix_fmt", "yuv420p",
-            "-t", str(duration),
+            "-t", str(target_duration),
             output_path
         ]
-        
-        subprocess.run(cmd, check=True, capture_output=True)
+    try:
+        run_ffmpeg(cmd, "reuse_clip", project_config=project_config)
+        return True
+    except Exception:
+        return False
+
+
+def pad_clip(source_path: str, output_path: str, target_duration: float,
+             project_config: Optional[Dict] = None) -> bool:
+    """Hold a clip's last frame until it lasts ``target_duration`` seconds.
+
+    Models cap how long a clip can be (MiniMax at 6 s, Kling at 10 s, SVD
+    at 25 frames), so a segment's clip can end before its narration does.
+
+    Args:
+        source_path: Rendered clip
+        output_path: Path for the padded clip (re-encoded)
+        target_duration: Duration the padded clip must cover
+        project_config: Optional project configuration
+
+    Returns:
+        True if successful, False otherwise
+    """
+    cmd = [
+        "ffmpeg", "-y", "-i", source_path,
+        "-filter:v", "tpad=stop_mode=clone:stop_duration=3600",
+        "-an",
+        "-c:v", "libx264",
+        "-pix_fmt", "yuv420p",
+        "-t", f"{target_duration:.3f}",
+        output_path
+    ]
+    try:
+        run_ffmpeg(cmd, "pad_clip", project_config=project_config)
         return True
     except Exception:
         return False
@@ -68,59 +274,151 @@ def validate_video_file(video_path: str) -> bool:
         return False
 
 
+class _TeeReader:
+    """Stream reader that copies everything it reads into a local file."""
+
+    def __init__(self, source, sink):
+        self._source = source
+        self._sink = sink
+
+    def read(self, size: int = -1) -> bytes:
+        data = self._source.read(size)
+        if data:
+            self._sink.write(data)
+        return data
+
+    def readable(self) -> bool:
+        return True
+
+    def drain(self, chunk_size: int = 1024 * 1024) -> None:
+        """Copy whatever the consumer did not read into the local file."""
+        while self.read(chunk_size):
+            pass
+
+
+def _mux_to_stream(cmd: List[str], out_file: Path, stream_sink: Callable, logger,
+                   project_config: Optional[Dict] = None) -> None:
+    """Run a muxing command whose output is written to stdout.
+
+    The output is fragmented MP4 so it can be produced without seeking.
+    ``stream_sink(fileobj, path)`` consumes it as ffmpeg writes it while
+    every byte is also saved to ``out_file``.
+
+    ``pipeline.ffmpeg.timeout_seconds`` covers the whole stream: a stalled
+    mux is killed by the process watchdog, and a sink still running at the
+    deadline is abandoned.
+
+    Raises:
+        FFmpegTimeout: The mux or the sink did not finish in time
+    """
+    with open(out_file, 'wb') as local, \
+            FFmpegProcess(cmd, "mux_stream", stdout=subprocess.PIPE, project_config=project_config) as process:
+        tee = _TeeReader(process.stdout, local)
+        errors = []
+
+        def _consume() -> None:
+            try:
+                stream_sink(tee, str(out_file))
+            except Exception as e:
+                errors.append(e)
+
+        sink = threading.Thread(target=contextvars.copy_context().run, args=(_consume,),
+                                name="mux-stream-sink", daemon=True)
+        sink.start()
+        sink.join(process.remaining())
+        if sink.is_alive():
+            logger.warning(f"Streaming output stalled; abandoning it after {process.timeout}s")
+            raise process.timeout_error()
+        if errors:
+            logger.warning(f"Streaming output failed, finishing local file only: {str(errors[0])}")
+        tee.drain()
+        process.stdout.close()
+        process.wait()
+
+
 def compose_video_segments(
     video_paths: List[str], 
     audio_path: str, 
     segment_info: List[Dict],
-    output_path: str
+    output_path: str,
+    project_config: Optional[Dict] = None,
+    stream_sink: Optional[Callable] = None
 ) -> str:
     """Assemble video segments with synchronized audio.
     
     This function:
     1. Validates all video segments
     2. Creates placeholders for invalid segments
-    3. Concatenates all video segments
-    4. Overlays the full narration audio
-    5. Ensures perfect synchronization
+    3. Pads clips shorter than their measured narration
+    4. Concatenates all video segments
+    5. Overlays the full narration audio
+    6. Ensures perfect synchronization
+    
+    If ``stream_sink`` is given, the final mux is written as fragmented
+    MP4 through a pipe and handed to ``stream_sink(fileobj, path)`` while
+    it is produced (e.g. to upload it), in addition to ``output_path``.
     """
+    settings = config_for(project_config)
     logger = setup_logger(__name__)
     out_file = Path(output_path)
     out_file.parent.mkdir(parents=True, exist_ok=True)
     
     # Check if we're in stub mode
-    if global_config.get('development.use_stubs', True):
+    if settings.get_bool('development.use_stubs'):
         # Create placeholder
         out_file.write_text(
             f"Composed video: {len(video_paths)} segments with audio from {audio_path}"
         )
         return str(out_file)
     
-    # Validate and fix video segments
-    valid_paths = []
-    for i, (path, info) in enumerate(zip(video_paths, segment_info)):
+    # Validate video segments; invalid ones get placeholders in one batch
+    segments = list(zip(video_paths, segment_info))
+    outpoints = {}
+    invalid = []
+    for i, (path, info) in enumerate(segments):
+        # Clips rendered longer than their measured narration are cut to it
+        if info.get('narration_seconds') and info['narration_seconds'] < info.get('duration', 0):
+            outpoints[path] = info['narration_seconds']
         if validate_video_file(path):
-            valid_paths.append(path)
             logger.info(f"Segment {i+1} is valid: {path}")
         else:
-            # Create placeholder video
             logger.warning(f"Segment {i+1} is invalid, creating placeholder: {path}")
-            duration = info.get('duration', 5)
-            text = f"Segment {i+1}"
-            
-            # Try to create placeholder
-            if create_placeholder_video(path, duration, text):
-                valid_paths.append(path)
-                logger.info(f"Created placeholder for segment {i+1}")
-            else:
-                # Create a very simple placeholder as last resort
-                logger.error(f"Failed to create placeholder for segment {i+1}")
-                # Skip this segment
-                continue
+            invalid.append((path, info.get('duration', 5), f"Segment {i+1}"))
+    
+    created = create_placeholder_videos(invalid, project_config) if invalid else {}
+    valid_paths = []
+    for i, (path, info) in enumerate(segments):
+        if created.get(path, True):
+            valid_paths.append(path)
+        else:
+            # Skip this segment
+            logger.error(f"Failed to create placeholder for segment {i+1}")
+    if invalid:
+        logger.info(f"Created {sum(created.values())} placeholder(s) for invalid segments")
+
+    # Clips the model rendered shorter than their narration hold their last
+    # frame, so later segments stay in sync with the audio
+    pad_dir = out_file.parent / "padded"
+    for i, (path, info) in enumerate(segments):
+        narration = info.get('narration_seconds')
+        if not narration or path not in valid_paths:
+            continue
+        length = probe_duration(path)
+        if length is None or length >= narration - PAD_TOLERANCE_SECONDS:
+            continue
+        pad_dir.mkdir(exist_ok=True)
+        padded = str(pad_dir / f"segment_{i+1:02d}.mp4")
+        if pad_clip(path, padded, narration, project_config):
+            logger.info(f"Segment {i+1} clip is {length:.2f}s for {narration:.2f}s of narration; padded")
+            valid_paths[valid_paths.index(path)] = padded
+            outpoints.pop(path, None)
+        else:
+            logger.warning(f"Could not pad segment {i+1} clip to {narration:.2f}s: {path}")
     
     if not valid_paths:
         logger.error("No valid video segments found")
         # Create a simple error video
-        create_placeholder_video(str(out_file), 5, "No valid segments")
+        create_placeholder_video(str(out_file), 5, "No valid segments", project_config)
         return str(out_file)
     
     # Create a temporary file list for ffmpeg concat
@@ -131,6 +429,8 @@ def compose_video_segments(
             abs_path = Path(path).absolute()
             # Use forward slashes even on Windows for FFmpeg compatibility
             f.write(f"file '{str(abs_path).replace(chr(92), '/')}'\n")
+            if path in outpoints:
+                f.write(f"outpoint {outpoints[path]:.3f}\n")
     
     try:
         # Step 1: Concatenate video segments
@@ -146,10 +446,10 @@ def compose_video_segments(
         ]
         
         logger.info(f"Concatenating {len(valid_paths)} video segments")
-        result = subprocess.run(concat_cmd, capture_output=True, text=True)
-        
-        if result.returncode != 0:
-            logger.error(f"Concatenation failed: {result.stderr}")
+        try:
+            run_ffmpeg(concat_cmd, "concat", project_config=project_config)
+        except FFmpegError as e:
+            logger.error(f"Concatenation failed: {e.stderr.decode(errors='replace')}")
             # Try alternative concatenation method
             concat_cmd = [
                 "ffmpeg",
@@ -169,7 +469,7 @@ def compose_video_segments(
                 str(concat_output)
             ])
             
-            subprocess.run(concat_cmd, check=True, capture_output=True)
+            run_ffmpeg(concat_cmd, "concat_filter", project_config=project_config)
         
         # Step 2: Add audio track if concatenation succeeded
         if concat_output.exists():
@@ -187,11 +487,20 @@ def compose_video_segments(
             ]
             
             logger.info("Adding audio track to video")
-            subprocess.run(final_cmd, check=True, capture_output=True)
+            if stream_sink is not None:
+                stream_cmd = final_cmd[:-1] + [
+                    "-movflags", "frag_keyframe+empty_moov+default_base_moof",
+                    "-f", "mp4",
+                    "pipe:1"
+                ]
+                _mux_to_stream(stream_cmd, out_file, stream_sink, logger, project_config)
+            else:
+                run_ffmpeg(final_cmd, "mux", project_config=project_config)
             
             # Cleanup temporary files
             list_file.unlink(missing_ok=True)
             concat_output.unlink(missing_ok=True)
+            shutil.rmtree(pad_dir, ignore_errors=True)
             
             logger.info(f"Successfully composed video: {out_file}")
         else:
@@ -200,15 +509,73 @@ def compose_video_segments(
     except subprocess.CalledProcessError as e:
         logger.error(f"FFmpeg error: {e.stderr.decode() if e.stderr else 'Unknown error'}")
         # Create fallback video
-        create_placeholder_video(str(out_file), 10, "Video composition error")
+        create_placeholder_video(str(out_file), 10, "Video composition error", project_config)
     except Exception as e:
         logger.error(f"Composition error: {str(e)}")
         # Create fallback video
-        create_placeholder_video(str(out_file), 10, "Video composition error")
+        create_placeholder_video(str(out_file), 10, "Video composition error", project_config)
     
     return str(out_file)
 
 
+def concat_audio_tracks(audio_paths: List[str], output_path: str,
+                        project_config: Optional[Dict] = None) -> Optional[str]:
+    """Join audio files end to end without re-encoding.
+
+    Used by long-form runs, which synthesize narration one chapter at a
+    time. The concat list is written to disk so memory does not grow with
+    the number of chapters.
+
+    Args:
+        audio_paths: Audio files in playback order
+        output_path: Path for the joined audio file
+        project_config: Optional merged project configuration
+
+    Returns:
+        Path to the joined audio file, or None if joining failed (no
+        partial file is left behind)
+    """
+    settings = config_for(project_config)
+    logger = setup_logger(__name__)
+    out_file = Path(output_path)
+    out_file.parent.mkdir(parents=True, exist_ok=True)
+
+    if settings.get_bool('development.use_stubs'):
+        out_file.write_text(f"Concatenated audio: {len(audio_paths)} tracks")
+        return str(out_file)
+
+    list_file = out_file.parent / "audio_tracks.txt"
+    with open(list_file, 'w') as f:
+        for path in audio_paths:
+            abs_path = Path(path).absolute()
+            f.write(f"file '{str(abs_path).replace(chr(92), '/')}'\n")
+
+    try:
+        cmd = [
+            "ffmpeg",
+            "-y",
+            "-f", "concat",
+            "-safe", "0",
+            "-i", str(list_file),
+            "-c", "copy",
+            str(out_file)
+        ]
+        logger.info(f"Concatenating {len(audio_paths)} audio tracks")
+        run_ffmpeg(cmd, "concat_audio", project_config=project_config)
+    except subprocess.CalledProcessError as e:
+        logger.error(f"Audio concatenation failed: {e.stderr.decode() if e.stderr else 'Unknown error'}")
+        out_file.unlink(missing_ok=True)
+        return None
+    except Exception as e:
+        logger.error(f"Audio concatenation error: {str(e)}")
+        out_file.unlink(missing_ok=True)
+        return None
+    finally:
+        list_file.unlink(missing_ok=True)
+
+    return str(out_file)
+
+
 def compose_video(video_path: str, audio_path: str, output_path: str) -> str:
     """Legacy single-video composition for backward compatibility."""
     out_file = Path(output_path)
@@ -234,7 +601,7 @@ def compose_video(video_path: str, audio_path: str, output_path: str) -> str:
         out_file.as_posix(),
     ]
     try:  # pragma: no cover - ffmpeg may not be installed
-        subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        run_ffmpeg(cmd, "compose")
     except Exception:
         placeholder_text = global_config.get('placeholders.composed_video', 'synthetic composed video')
         out_file.write_text(placeholder_text)
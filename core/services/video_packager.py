@@ -0,0 +1,147 @@
+"""Web packaging of the final video as fragmented MP4 and HLS."""
+
+from pathlib import Path
+import subprocess
+from typing import Dict, List, Optional
+from core.utils.config import config_for
+from core.utils.logger import setup_logger
+from core.utils.ffmpeg_runner import run_ffmpeg
+
+
+def _fragmented_mp4_cmd(video_path: Path, output_path: Path) -> List[str]:
+    """Remux to fragmented MP4 with the ``moov`` box at the front."""
+    return [
+        "ffmpeg",
+        "-y",
+        "-i", str(video_path),
+        "-c", "copy",
+        "-movflags", "frag_keyframe+empty_moov+default_base_moof",
+        str(output_path)
+    ]
+
+
+def _hls_cmd(video_path: Path, hls_dir: Path, segment_duration: float) -> List[str]:
+    """Remux to an HLS VOD playlist with fMP4 media segments.
+
+    Pipeline segments are concatenated without re-encoding, so each one
+    starts on a keyframe and ``-hls_time`` equal to the segment duration
+    cuts on the same boundaries.
+    """
+    return [
+        "ffmpeg",
+        "-y",
+        "-i", str(video_path),
+        "-c", "copy",
+        "-f", "hls",
+        "-hls_time", str(segment_duration),
+        "-hls_playlist_type", "vod",
+        "-hls_segment_type", "fmp4",
+        "-hls_fmp4_init_filename", "init.mp4",
+        "-hls_segment_filename", str(hls_dir / "segment_%03d.m4s"),
+        str(hls_dir / "playlist.m3u8")
+    ]
+
+
+def _write_stub_package(package: Dict, segment_duration: float, segment_count: int) -> None:
+    """Write a placeholder HLS playlist and segments for stub mode."""
+    hls_dir = Path(package['playlist']).parent
+    (hls_dir / "init.mp4").write_text("HLS init segment (stub)")
+
+    lines = [
+        "#EXTM3U",
+        "#EXT-X-VERSION:7",
+        f"#EXT-X-TARGETDURATION:{int(segment_duration)}",
+        "#EXT-X-PLAYLIST-TYPE:VOD",
+        '#EXT-X-MAP:URI="init.mp4"',
+    ]
+    for i in range(segment_count):
+        segment_file = hls_dir / f"segment_{i:03d}.m4s"
+        segment_file.write_text(f"HLS segment {i} (stub)")
+        lines.extend([f"#EXTINF:{segment_duration:.3f},", segment_file.name])
+    lines.append("#EXT-X-ENDLIST")
+    Path(package['playlist']).write_text("\n".join(lines) + "\n")
+
+
+def package_video(
+    video_path: str,
+    output_dir: str,
+    segment_duration: float,
+    segment_count: Optional[int] = None,
+    project_config: Optional[Dict] = None
+) -> Dict:
+    """Package the final video for progressive web playback.
+
+    Produces a fragmented MP4 (``moov`` first, so playback starts before
+    the whole file has downloaded) and an HLS playlist whose fMP4 segments
+    line up with the pipeline's video segments. Both are stream copies of
+    ``video_path``; nothing is re-encoded.
+
+    Args:
+        video_path: Composed video to package
+        output_dir: Project output directory
+        segment_duration: Duration of each pipeline segment in seconds
+        segment_count: Number of pipeline segments (used in stub mode)
+        project_config: Optional merged project configuration
+
+    Returns:
+        Dict with ``directory``, ``fragmented_mp4``, ``playlist`` and
+        ``files`` (every file in the package, playlist last)
+    """
+    settings = config_for(project_config)
+    logger = setup_logger(__name__)
+
+    package_dir = Path(output_dir) / settings.get("pipeline.packaging.directory", "web")
+    hls_dir = package_dir / "hls"
+    hls_dir.mkdir(parents=True, exist_ok=True)
+
+    package = {
+        'directory': str(package_dir),
+        'fragmented_mp4': None,
+        'playlist': None,
+        'files': [],
+    }
+    if settings.get("pipeline.packaging.fragmented_mp4", True):
+        package['fragmented_mp4'] = str(package_dir / Path(video_path).name)
+    if settings.get("pipeline.packaging.hls", True):
+        package['playlist'] = str(hls_dir / "playlist.m3u8")
+
+    if settings.get_bool('development.use_stubs'):
+        if package['fragmented_mp4']:
+            Path(package['fragmented_mp4']).write_text("Fragmented MP4 (stub)")
+        if package['playlist']:
+            _write_stub_package(package, segment_duration, segment_count or 1)
+    else:
+        if package['fragmented_mp4']:
+            try:
+                logger.info("Writing fragmented MP4 with moov first")
+                run_ffmpeg(_fragmented_mp4_cmd(Path(video_path), Path(package['fragmented_mp4'])),
+                           "fragmented_mp4", project_config=project_config)
+            except subprocess.CalledProcessError as e:
+                logger.error(f"Fragmented MP4 failed: {e.stderr.decode() if e.stderr else 'Unknown error'}")
+                package['fragmented_mp4'] = None
+            except Exception as e:
+                logger.error(f"Fragmented MP4 error: {str(e)}")
+                package['fragmented_mp4'] = None
+
+        if package['playlist']:
+            try:
+                logger.info(f"Writing HLS playlist with {segment_duration}s segments")
+                run_ffmpeg(_hls_cmd(Path(video_path), hls_dir, segment_duration), "hls",
+                           project_config=project_config)
+            except subprocess.CalledProcessError as e:
+                logger.error(f"HLS packaging failed: {e.stderr.decode() if e.stderr else 'Unknown error'}")
+                package['playlist'] = None
+            except Exception as e:
+                logger.error(f"HLS packaging error: {str(e)}")
+                package['playlist'] = None
+
+    # Media first and playlist last, so a published playlist never
+    # references segments that are not there yet
+    if package['fragmented_mp4']:
+        package['files'].append(package['fragmented_mp4'])
+    if package['playlist']:
+        package['files'].extend(str(p) for p in sorted(hls_dir.iterdir()) if p.suffix != ".m3u8")
+        package['files'].append(package['playlist'])
+
+    logger.info(f"Packaged {len(package['files'])} files in {package_dir}")
+    return package
@@ -0,0 +1,226 @@
+"""Injectable clock for provider delays, retries and backoff.
+
+Code that waits on a provider (stub delays, retry backoff, rate-limit
+waits, prediction polling) calls ``clock.sleep`` and reads
+``clock.time`` instead of the ``time`` module. Normally that is the
+system clock. With ``development.virtual_clock`` enabled a
+``VirtualClock`` is installed instead: sleeps return as soon as every
+tracked task is waiting, with time jumping straight to the next
+deadline, so hours of simulated provider latency run in milliseconds
+and concurrent schedules come out the same on every run.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+import contextvars
+import itertools
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+from core.utils.config import config_for
+
+
+class SystemClock:
+    """Wall-clock time and real sleeps."""
+
+    virtual = False
+    # Jitter and other randomness comes from the clock so simulated runs can seed it
+    random = random.Random()
+
+    def time(self) -> float:
+        return time.time()
+
+    def sleep(self, seconds: float) -> None:
+        if seconds > 0:
+            time.sleep(seconds)
+
+    def track(self, fn: Callable[..., Any]) -> Callable[..., Any]:
+        """Return ``fn`` unchanged; see ``VirtualClock.track``."""
+        return fn
+
+
+class VirtualClock:
+    """Discrete-event clock: time only moves when sleeping threads need it to.
+
+    Worker threads are wrapped with ``track`` before they start (see
+    ``map_tracked``). Time advances to the earliest pending deadline once
+    every tracked task is asleep, so tasks run in deadline order
+    regardless of how the OS schedules threads. Threads that are not
+    tracked (e.g. the main thread) can also sleep; they never hold time
+    back.
+
+    A tracked task blocked on something other than the clock (a lock,
+    a subprocess) would stop time for everyone, so after
+    ``stall_seconds`` of real time without any clock activity time
+    advances anyway.
+
+    Args:
+        start: Initial time in seconds since the epoch (defaults to now)
+        stall_seconds: Real seconds without clock activity before time is
+            advanced regardless of running tasks
+        seed: Seed of ``random``, which supplies retry jitter, so repeated
+            simulations back off identically
+    """
+
+    virtual = True
+
+    def __init__(self, start: Optional[float] = None, stall_seconds: float = 0.02, seed: int = 0):
+        self.start = time.time() if start is None else float(start)
+        self.stall_seconds = stall_seconds
+        self.random = random.Random(seed)
+        self._now = self.start
+        self._cond = threading.Condition()
+        self._deadlines: List[Tuple[float, int]] = []
+        self._seq = itertools.count()
+        self._tasks = 0
+        self._sleeping = 0
+        self._local = threading.local()
+
+    def time(self) -> float:
+        return self._now
+
+    @property
+    def elapsed(self) -> float:
+        """Simulated seconds since the clock was created."""
+        return self._now - self.start
+
+    def advance(self, seconds: float) -> None:
+        """Move time forward by ``seconds``, waking any sleepers now due."""
+        with self._cond:
+            self._now += max(0.0, seconds)
+            self._cond.notify_all()
+
+    def sleep(self, seconds: float) -> None:
+        if seconds <= 0:
+            return
+        tracked = getattr(self._local, 'tracked', False)
+        with self._cond:
+            entry = (self._now + seconds, next(self._seq))
+            self._deadlines.append(entry)
+            if tracked:
+                self._sleeping += 1
+            try:
+                while self._now < entry[0]:
+                    earliest = min(self._deadlines)[0]
+                    # A sleeper that is due but has not left yet must run first
+                    due = earliest <= self._now
+                    if not due and self._sleeping >= self._tasks:
+                        self._jump(earliest)
+                    elif not self._cond.wait(self.stall_seconds) and not due:
+                        self._jump(min(self._deadlines)[0])
+            finally:
+                self._deadlines.remove(entry)
+                if tracked:
+                    self._sleeping -= 1
+                self._cond.notify_all()
+
+    def _jump(self, when: float) -> None:
+        self._now = max(self._now, when)
+        self._cond.notify_all()
+
+    def track(self, fn: Callable[..., Any]) -> Callable[..., Any]:
+        """Count ``fn`` as a running task from now until it returns.
+
+        Wrap every worker before starting any of them, so they all start
+        at the same simulated instant (``map_tracked`` does this).
+        """
+        with self._cond:
+            self._tasks += 1
+
+        def run(*args, **kwargs):
+            self._local.tracked = True
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self._local.tracked = False
+                with self._cond:
+                    self._tasks -= 1
+                    self._cond.notify_all()
+        return run
+
+
+# The clock of the run executing in this context. Each run installs its own
+# (see ``use_clock``), so a simulated run never moves a concurrent real one
+# onto virtual time; worker threads inherit it through ``contextvars``.
+_clock: contextvars.ContextVar = contextvars.ContextVar('clock', default=SystemClock())
+
+
+def get_clock():
+    """Return the clock installed in the current context."""
+    return _clock.get()
+
+
+def set_clock(clock) -> Any:
+    """Install ``clock`` in the current context and return the previous one."""
+    previous = _clock.get()
+    _clock.set(clock)
+    return previous
+
+
+@contextmanager
+def use_clock(clock) -> Iterator[Any]:
+    """Install ``clock`` in the current context for the duration of a ``with`` block."""
+    token = _clock.set(clock)
+    try:
+        yield clock
+    finally:
+        _clock.reset(token)
+
+
+def clock_for(project_config: Optional[Dict] = None):
+    """Return the clock a run should use: virtual if ``development.virtual_clock`` is set."""
+    settings = config_for(project_config)
+    if settings.get_bool('development.virtual_clock', False):
+        return VirtualClock(stall_seconds=settings.get_float('development.clock_stall_ms', 20) / 1000)
+    return SystemClock()
+
+
+def now() -> float:
+    """Current time on the installed clock."""
+    return _clock.get().time()
+
+
+def sleep(seconds: float) -> None:
+    """Sleep on the installed clock."""
+    _clock.get().sleep(seconds)
+
+
+def map_tracked(fn: Callable[[Any], Any], items: List[Any], workers: int,
+                thread_name_prefix: str = "worker") -> List[Any]:
+    """Apply ``fn`` to ``items`` on ``workers`` threads and return the results in order.
+
+    Each worker takes the next item as soon as it finishes one and is
+    tracked by the installed clock for its whole life, so a
+    ``VirtualClock`` never advances between one item and the next.
+    Workers run in a copy of the caller's context.
+
+    Raises:
+        The first exception raised by ``fn``, in item order, once every
+        item has been processed
+    """
+    results: List[Any] = [None] * len(items)
+    errors: List[Optional[BaseException]] = [None] * len(items)
+    indexes = iter(range(len(items)))
+    lock = threading.Lock()
+
+    def _worker() -> None:
+        while True:
+            with lock:
+                index = next(indexes, None)
+            if index is None:
+                return
+            try:
+                results[index] = fn(items[index])
+            except Exception as e:
+                errors[index] = e
+
+    clock = get_clock()
+    loops = [clock.track(contextvars.copy_context().run) for _ in range(max(1, min(workers, len(items))))]
+    with ThreadPoolExecutor(max_workers=len(loops), thread_name_prefix=thread_name_prefix) as pool:
+        for loop in loops:
+            pool.submit(loop, _worker)
+    for error in errors:
+        if error is not None:
+            raise error
+    return results
@@ -1,49 +1,276 @@
 """Configuration management for Prompt2Production pipeline."""
 
+import copy
 import os
+import threading
 from pathlib import Path
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, Callable, List, Tuple
+from core.utils.lazy_imports import has_module
 
-try:
-    import yaml
-except ImportError:
-    yaml = None
+# PyYAML is imported when the first config file is read
+has_yaml = has_module('yaml')
+
+
+# Settings read on hot paths, validated and defaulted once per load.
+# Maps dotted key -> (type, default).
+SETTINGS_SCHEMA: Dict[str, tuple] = {
+    'development.use_stubs': (bool, True),
+    'development.stub_delay': (float, 0.5),
+    'development.save_prompts': (bool, True),
+    'pipeline.video.total_duration': (int, 45),
+    'pipeline.video.segment_duration': (int, 5),
+    'pipeline.timing.words_per_minute': (int, 150),
+    'pipeline.timing.buffer_percentage': (float, 0.9),
+    'pipeline.timing.minimum_seconds_per_line': (float, 1.0),
+    'pipeline.output.directory': (str, 'output'),
+    'api.music.enabled': (bool, False),
+    'retry.max_attempts': (int, 3),
+    'retry.delay_seconds': (float, 30),
+    'retry.timeout_minutes': (float, 10),
+    'logging.level': (str, 'INFO'),
+    'config.reload_interval': (float, 2.0),
+}
+
+
+def _coerce(key: str, value: Any, expected: type) -> Any:
+    """Coerce a raw config value to the schema type or raise ValueError."""
+    if expected is bool:
+        if isinstance(value, bool):
+            return value
+        if isinstance(value, str) and value.lower() in ('true', 'yes', '1', 'false', 'no', '0'):
+            return value.lower() in ('true', 'yes', '1')
+        if isinstance(value, int):
+            return bool(value)
+    elif expected in (int, float):
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            return expected(value)
+        if isinstance(value, str):
+            try:
+                return expected(value)
+            except ValueError:
+                pass
+    elif expected is str:
+        if isinstance(value, (str, int, float)):
+            return str(value)
+    raise ValueError(f"Invalid value for '{key}': expected {expected.__name__}, got {value!r}")
+
+
+def _flatten(data: Dict[str, Any], prefix: str = '', out: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Index every dotted key path, including intermediate sections."""
+    if out is None:
+        out = {}
+    for key, value in data.items():
+        path = f"{prefix}{key}"
+        out[path] = value
+        if isinstance(value, dict):
+            _flatten(value, f"{path}.", out)
+    return out
+
+
+def _deep_merge(base: Dict[str, Any], layer: Dict[str, Any]) -> Dict[str, Any]:
+    """Recursively merge ``layer`` into ``base`` (layer wins) and return base."""
+    for key, value in layer.items():
+        if isinstance(value, dict) and isinstance(base.get(key), dict):
+            _deep_merge(base[key], value)
+        else:
+            base[key] = copy.deepcopy(value)
+    return base
+
+
+def dotted_to_nested(overrides: Dict[str, Any]) -> Dict[str, Any]:
+    """Convert ``{'api.music.enabled': True}`` style overrides to a nested layer."""
+    nested: Dict[str, Any] = {}
+    for key_path, value in overrides.items():
+        node = nested
+        *parents, leaf = key_path.split('.')
+        for key in parents:
+            node = node.setdefault(key, {})
+        node[leaf] = value
+    return nested
+
+
+ROOT_DIR = Path(__file__).parent.parent.parent
 
 
 class Config:
-    """Centralized configuration management."""
+    """Centralized configuration management.
+    
+    A Config is built from layers merged in memory, lowest precedence first:
+    ``config.yaml``, an optional named profile (``config.<profile>.yaml``),
+    then any in-memory layers such as project settings and CLI overrides.
+    Several Configs can coexist in one process; the module-level ``config``
+    is the base layer only, and is read from disk on its first lookup
+    rather than at import time (``lazy=True``).
+    """
     
-    _instance = None
     _config = None
+    _flat: Dict[str, Any] = {}
+    _typed: Dict[str, Any] = {}
+    _watcher: Optional[threading.Thread] = None
     
-    def __new__(cls):
-        if cls._instance is None:
-            cls._instance = super(Config, cls).__new__(cls)
-        return cls._instance
+    def __init__(self, config_path: Optional[str] = None, profile: Optional[str] = None,
+                 layers: Optional[List[Dict[str, Any]]] = None, lazy: bool = False):
+        self._reload_callbacks: List[Callable[['Config'], None]] = []
+        self._load_lock = threading.Lock()
+        self._sources: List[Tuple[Path, int]] = []
+        self._layers: List[Dict[str, Any]] = [layer for layer in layers or [] if layer]
+        self.profile_name = profile or 'base'
+        
+        paths = [Path(config_path) if config_path else ROOT_DIR / "config.yaml"]
+        if profile:
+            profile_path = paths[0].parent / f"config.{profile}.yaml"
+            if not profile_path.exists():
+                raise FileNotFoundError(f"Configuration profile not found: {profile_path}")
+            paths.append(profile_path)
+        self._pending: Optional[List[Path]] = paths
+        if not lazy:
+            self._ensure_loaded()
     
-    def __init__(self):
-        if self._config is None:
-            self.load_config()
+    def _ensure_loaded(self) -> None:
+        """Read the config files if this Config was created with ``lazy=True``."""
+        if self._pending is None:
+            return
+        with self._load_lock:
+            if self._pending is not None:
+                self._load(self._pending)
     
     def load_config(self, config_path: Optional[str] = None) -> None:
         """Load configuration from YAML file."""
         if config_path is None:
             # Look for config.yaml in project root
-            root_dir = Path(__file__).parent.parent.parent
-            config_path = root_dir / "config.yaml"
+            config_path = ROOT_DIR / "config.yaml"
+        self._load([Path(config_path)])
+    
+    def _load(self, paths: List[Path]) -> None:
+        """Read ``paths`` and merge them with the in-memory layers."""
+        sources = []
+        data: Dict[str, Any] = {}
+        for path in paths:
+            if not path.exists():
+                raise FileNotFoundError(f"Configuration file not found: {path}")
+            sources.append((path, path.stat().st_mtime_ns))
+            _deep_merge(data, self._read_file(path))
+        for layer in self._layers:
+            _deep_merge(data, layer)
+        
+        self._sources = sources
+        self._install(data)
+    
+    def _read_file(self, path: Path) -> Dict[str, Any]:
+        """Parse a single YAML config file."""
+        with open(path, 'r') as f:
+            if has_yaml:
+                import yaml
+                return yaml.safe_load(f) or {}
+            # Fallback to simple parser if PyYAML not available
+            return self._simple_yaml_parser(f.read())
+    
+    def _install(self, data: Dict[str, Any]) -> None:
+        """Validate ``data`` and swap it in as the active configuration.
+        
+        The flat key index and typed settings are built before anything is
+        replaced, so readers on other threads never see a half-built config
+        and an invalid file leaves the previous config in place.
+        """
+        self._process_env_vars(data)
+        flat = _flatten(data)
+        
+        typed = {}
+        for key, (expected, default) in SETTINGS_SCHEMA.items():
+            value = flat.get(key)
+            typed[key] = default if value is None else _coerce(key, value, expected)
+        
+        self._config, self._flat, self._typed = data, flat, typed
+        self._pending = None
+        
+        for callback in list(self._reload_callbacks):
+            callback(self)
+    
+    def with_layers(self, *layers: Dict[str, Any]) -> 'Config':
+        """Return a new Config with extra in-memory layers on top of this one."""
+        self._ensure_loaded()
+        derived = Config.__new__(Config)
+        derived._reload_callbacks = []
+        derived._load_lock = threading.Lock()
+        derived._pending = None
+        derived._layers = self._layers + [layer for layer in layers if layer]
+        derived.profile_name = self.profile_name
+        derived._load([path for path, _ in self._sources])
+        return derived
+    
+    def spec(self) -> Dict[str, Any]:
+        """Profile and in-memory layers, enough for ``from_spec`` to rebuild this Config elsewhere."""
+        return {
+            'profile': None if self.profile_name == 'base' else self.profile_name,
+            'layers': copy.deepcopy(self._layers),
+        }
+
+    @classmethod
+    def from_spec(cls, spec: Dict[str, Any]) -> 'Config':
+        """Rebuild a Config from ``spec()`` output, reading this host's config files."""
+        return cls(profile=spec.get('profile'), layers=spec.get('layers'))
+
+    def reload_if_changed(self) -> bool:
+        """Reload the config files if any of them changed on disk.
+        
+        Returns:
+            True if a new configuration was loaded
+        """
+        if self._pending is not None:
+            return False
+        changed = False
+        for path, mtime in self._sources:
+            try:
+                changed = changed or path.stat().st_mtime_ns != mtime
+            except FileNotFoundError:
+                return False
+        if not changed:
+            return False
         
-        if not Path(config_path).exists():
-            raise FileNotFoundError(f"Configuration file not found: {config_path}")
+        paths = [path for path, _ in self._sources]
+        try:
+            self._load(paths)
+        except Exception as e:
+            # Keep serving the last good config; try again on the next change
+            self._sources = [(path, path.stat().st_mtime_ns) for path in paths]
+            # core.utils.logger imports this module, so import it here
+            from core.utils.logger import setup_logger
+            setup_logger(__name__).warning(
+                f"Config reload failed, keeping previous config: {type(e).__name__}: {e}"
+            )
+            return False
+        return True
+    
+    def watch(self, interval: Optional[float] = None) -> None:
+        """Start a background thread that hot-reloads the config file.
+        
+        Long-running workers call this once; lookups stay plain dict reads
+        and pick up the new values as soon as the file is re-read.
+        """
+        if self._watcher is not None and self._watcher.is_alive():
+            return
+        self._ensure_loaded()
+        if interval is None:
+            interval = self.get_float('config.reload_interval')
         
-        with open(config_path, 'r') as f:
-            if yaml:
-                self._config = yaml.safe_load(f)
-            else:
-                # Fallback to simple parser if PyYAML not available
-                self._config = self._simple_yaml_parser(f.read())
+        def _poll():
+            stop = self._watch_stop
+            while not stop.wait(interval):
+                self.reload_if_changed()
         
-        # Process environment variables
-        self._process_env_vars()
+        self._watch_stop = threading.Event()
+        self._watcher = threading.Thread(target=_poll, name="config-watcher", daemon=True)
+        self._watcher.start()
+    
+    def stop_watching(self) -> None:
+        """Stop the hot-reload thread started by ``watch``."""
+        if self._watcher is not None:
+            self._watch_stop.set()
+            self._watcher = None
+    
+    def on_reload(self, callback: Callable[['Config'], None]) -> None:
+        """Register a callback invoked after every (re)load."""
+        self._reload_callbacks.append(callback)
     
     def _simple_yaml_parser(self, text: str) -> dict:
         """Simple YAML parser for when PyYAML is not available."""
@@ -96,19 +323,19 @@ class Config:
         
         return result
     
-    def _process_env_vars(self) -> None:
+    def _process_env_vars(self, data: Dict[str, Any]) -> None:
         """Process environment variable references in config."""
         # Load API keys from environment
-        if 'api' in self._config:
-            if 'elevenlabs' in self._config['api']:
-                env_var = self._config['api']['elevenlabs'].get('api_key_env')
+        if 'api' in data:
+            if 'elevenlabs' in data['api']:
+                env_var = data['api']['elevenlabs'].get('api_key_env')
                 if env_var:
-                    self._config['api']['elevenlabs']['api_key'] = os.getenv(env_var, '')
+                    data['api']['elevenlabs']['api_key'] = os.getenv(env_var, '')
             
-            if 'replicate' in self._config['api']:
-                env_var = self._config['api']['replicate'].get('api_token_env')
+            if 'replicate' in data['api']:
+                env_var = data['api']['replicate'].get('api_token_env')
                 if env_var:
-                    self._config['api']['replicate']['api_token'] = os.getenv(env_var, '')
+                    data['api']['replicate']['api_token'] = os.getenv(env_var, '')
     
     def get(self, key_path: str, default: Any = None) -> Any:
         """Get a configuration value using dot notation.
@@ -117,16 +344,38 @@ class Config:
             config.get('api.bedrock.model')
             config.get('pipeline.timing.words_per_minute', 120)
         """
-        keys = key_path.split('.')
-        value = self._config
-        
-        for key in keys:
-            if isinstance(value, dict) and key in value:
-                value = value[key]
-            else:
-                return default
+        if self._pending is not None:
+            self._ensure_loaded()
+        return self._flat.get(key_path, default)
+    
+    def get_typed(self, key_path: str, expected: type, default: Any = None) -> Any:
+        """Get a value coerced to ``expected``.
         
-        return value
+        Keys listed in ``SETTINGS_SCHEMA`` are validated once at load time
+        and served from a precomputed table; ``default`` is ignored for them.
+        """
+        if self._pending is not None:
+            self._ensure_loaded()
+        if key_path in self._typed:
+            return self._typed[key_path]
+        value = self._flat.get(key_path)
+        return default if value is None else _coerce(key_path, value, expected)
+    
+    def get_int(self, key_path: str, default: Optional[int] = None) -> int:
+        """Get an integer setting."""
+        return self.get_typed(key_path, int, default)
+    
+    def get_float(self, key_path: str, default: Optional[float] = None) -> float:
+        """Get a float setting."""
+        return self.get_typed(key_path, float, default)
+    
+    def get_bool(self, key_path: str, default: Optional[bool] = None) -> bool:
+        """Get a boolean setting."""
+        return self.get_typed(key_path, bool, default)
+    
+    def get_str(self, key_path: str, default: Optional[str] = None) -> str:
+        """Get a string setting."""
+        return self.get_typed(key_path, str, default)
     
     def get_output_path(self, filename_key: str) -> Path:
         """Get full output path for a given filename key."""
@@ -153,10 +402,49 @@ class Config:
             merged['output_dir'] = self.get('pipeline.output.directory', 'output')
         
         # Add API configuration
+        self._ensure_loaded()
         merged['_api_config'] = self._config.get('api', {})
         
+        # Carry this config through the pipeline so concurrent runs with
+        # different profiles never read each other's settings
+        merged['_settings'] = self
+        
         return merged
 
 
-# Global config instance
-config = Config()
\ No newline at end of file
+def load_profile(profile: Optional[str] = None, project: Optional[Dict[str, Any]] = None,
+                 overrides: Optional[Dict[str, Any]] = None) -> Config:
+    """Build a layered config: base, named profile, project, CLI overrides.
+    
+    Args:
+        profile: Profile name, e.g. "test" loads ``config.test.yaml``
+        project: Nested config overrides from the project file
+        overrides: Nested or dotted-key overrides from the command line
+    """
+    if overrides and any('.' in key for key in overrides):
+        overrides = dotted_to_nested(overrides)
+    return Config(profile=profile, layers=[project or {}, overrides or {}])
+
+
+def config_for(project_config: Optional[Dict[str, Any]] = None) -> Config:
+    """Return the config a pipeline run was started with.
+    
+    Falls back to the global base config when the project dict was not
+    produced by ``Config.merge_project_config``.
+    """
+    if project_config:
+        settings = project_config.get('_settings')
+        if settings is not None:
+            return settings
+    return config
+
+
+def _start_hot_reload(settings: Config) -> None:
+    """Start the file watcher once the global config has been read."""
+    if settings.get_bool('config.hot_reload', False):
+        settings.watch()
+
+
+# Global config instance; config.yaml is read on the first lookup
+config = Config(lazy=True)
+config.on_reload(_start_hot_reload)
@@ -0,0 +1,224 @@
+"""Run ffmpeg with a concurrency cap, live progress, timeouts and a bounded stderr tail."""
+
+import collections
+import os
+import re
+import subprocess
+import threading
+import time
+from typing import Dict, List, Optional
+from core.utils.config import config_for
+from core.utils.logger import setup_logger
+from core.utils import metrics
+
+# Keys ffmpeg writes with -progress; anything else on stderr is log output
+_PROGRESS_LINE = re.compile(
+    r'^(frame|fps|stream_\d+_\d+_q|bitrate|total_size|out_time_us|out_time_ms|out_time|'
+    r'dup_frames|drop_frames|speed|progress)=(.*)$'
+)
+
+# One semaphore per configured cap, shared by every caller in the process
+_semaphores: Dict[int, threading.BoundedSemaphore] = {}
+_semaphores_lock = threading.Lock()
+
+
+class FFmpegError(subprocess.CalledProcessError):
+    """ffmpeg exited with an error; ``stderr`` holds the tail of its log."""
+
+    def __str__(self) -> str:
+        tail = self.stderr.decode(errors='replace').strip().splitlines()[-1:] if self.stderr else []
+        return f"ffmpeg exited with status {self.returncode}" + (f": {tail[0]}" if tail else "")
+
+
+class FFmpegTimeout(FFmpegError):
+    """ffmpeg was killed after running longer than its timeout."""
+
+    def __str__(self) -> str:
+        return f"ffmpeg timed out after {self.output}s"
+
+
+def _semaphore(project_config: Optional[Dict] = None) -> threading.BoundedSemaphore:
+    """Return the process-wide semaphore limiting concurrent ffmpeg processes."""
+    settings = config_for(project_config)
+    limit = int(settings.get('pipeline.ffmpeg.max_concurrent', 0) or 0) or os.cpu_count() or 1
+    with _semaphores_lock:
+        semaphore = _semaphores.get(limit)
+        if semaphore is None:
+            semaphore = threading.BoundedSemaphore(limit)
+            _semaphores[limit] = semaphore
+    return semaphore
+
+
+def _with_progress(cmd: List[str]) -> List[str]:
+    """Add ``-progress pipe:2 -nostats`` right after the program name."""
+    if not cmd or os.path.basename(cmd[0]) != 'ffmpeg' or '-progress' in cmd:
+        return list(cmd)
+    return [cmd[0], '-hide_banner', '-nostats', '-progress', 'pipe:2'] + list(cmd[1:])
+
+
+class FFmpegProcess:
+    """A running ffmpeg command holding one of the concurrency slots.
+
+    Use as a context manager. The slot is taken on entry (waiting if
+    ``pipeline.ffmpeg.max_concurrent`` processes are already running, by
+    default one per CPU core) and released on exit. Progress reported by
+    ffmpeg is parsed as it arrives into ``progress``. Other stderr lines
+    are kept only as a tail of ``pipeline.ffmpeg.stderr_tail_lines``.
+
+    A watchdog kills the process once ``timeout`` has passed, so a caller
+    blocked reading its stdout gets end-of-file instead of hanging.
+    """
+
+    def __init__(self, cmd: List[str], label: str = "ffmpeg", timeout: Optional[float] = None,
+                 stdout=subprocess.DEVNULL, project_config: Optional[Dict] = None):
+        settings = config_for(project_config)
+        self.cmd = _with_progress(cmd)
+        self.label = label
+        if timeout is None:
+            timeout = float(settings.get('pipeline.ffmpeg.timeout_seconds', 1800) or 0) or None
+        self.timeout = timeout
+        self.progress: Dict[str, str] = {}
+        self._stdout = stdout
+        self._tail = collections.deque(maxlen=int(settings.get('pipeline.ffmpeg.stderr_tail_lines', 40)))
+        self._semaphore = _semaphore(project_config)
+        self._logger = setup_logger(__name__)
+        self._proc: Optional[subprocess.Popen] = None
+        self._reader: Optional[threading.Thread] = None
+        self._watchdog: Optional[threading.Timer] = None
+        self._expired = False
+        self._started = 0.0
+
+    def __enter__(self) -> "FFmpegProcess":
+        self._semaphore.acquire()
+        try:
+            self._started = time.time()
+            self._proc = subprocess.Popen(self.cmd, stdin=subprocess.DEVNULL, stdout=self._stdout,
+                                          stderr=subprocess.PIPE)
+        except BaseException:
+            self._semaphore.release()
+            raise
+        self._reader = threading.Thread(target=self._read_stderr, name=f"{self.label}-stderr", daemon=True)
+        self._reader.start()
+        if self.timeout is not None:
+            self._watchdog = threading.Timer(self.timeout, self._expire)
+            self._watchdog.daemon = True
+            self._watchdog.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        try:
+            if self._watchdog is not None:
+                self._watchdog.cancel()
+            if self._proc.poll() is None:
+                self._proc.kill()
+                self._proc.wait()
+            self._reader.join()
+        finally:
+            self._semaphore.release()
+
+    @property
+    def stdout(self):
+        return self._proc.stdout
+
+    def _read_stderr(self) -> None:
+        for raw in self._proc.stderr:
+            line = raw.decode(errors='replace').rstrip()
+            match = _PROGRESS_LINE.match(line)
+            if match:
+                self.progress[match.group(1)] = match.group(2).strip()
+            elif line:
+                self._tail.append(line)
+        self._proc.stderr.close()
+
+    def stderr_tail(self) -> bytes:
+        """The last lines ffmpeg logged (progress lines excluded)."""
+        return "\n".join(self._tail).encode()
+
+    def remaining(self) -> Optional[float]:
+        """Seconds left before the timeout, or None without one."""
+        if self.timeout is None:
+            return None
+        return max(0.0, self.timeout - (time.time() - self._started))
+
+    def _expire(self) -> None:
+        if self._proc.poll() is None:
+            self._expired = True
+            self._proc.kill()
+
+    def timeout_error(self) -> FFmpegTimeout:
+        """Kill the process (if still running) and return the error to raise for its timeout."""
+        if self._proc.poll() is None:
+            self._proc.kill()
+        self._proc.wait()
+        self._reader.join()
+        metrics.increment('ffmpeg_runs', label=self.label, outcome='timeout')
+        self._logger.error(f"{self.label}: ffmpeg killed after {self.timeout}s")
+        return FFmpegTimeout(self._proc.returncode, self.cmd, output=self.timeout, stderr=self.stderr_tail())
+
+    def wait(self) -> Dict[str, float]:
+        """Wait for ffmpeg to finish and record its throughput.
+
+        Returns:
+            ``seconds`` (wall time), ``fps``, ``speed`` and ``frames`` as
+            last reported by ffmpeg
+
+        Raises:
+            FFmpegTimeout: The process ran longer than ``timeout`` and was killed
+            FFmpegError: ffmpeg exited with a non-zero status
+        """
+        try:
+            returncode = self._proc.wait(timeout=self.remaining())
+        except subprocess.TimeoutExpired:
+            raise self.timeout_error()
+        if self._expired:
+            raise self.timeout_error()
+        self._reader.join()
+
+        stats = {
+            'seconds': round(time.time() - self._started, 3),
+            'fps': _number(self.progress.get('fps')),
+            'speed': _number(self.progress.get('speed', '').rstrip('x')),
+            'frames': _number(self.progress.get('frame')),
+        }
+        if returncode != 0:
+            metrics.increment('ffmpeg_runs', label=self.label, outcome='error')
+            raise FFmpegError(returncode, self.cmd, stderr=self.stderr_tail())
+
+        metrics.increment('ffmpeg_runs', label=self.label, outcome='ok')
+        metrics.observe('ffmpeg_seconds', stats['seconds'], label=self.label)
+        if stats['fps']:
+            metrics.observe('ffmpeg_fps', stats['fps'], label=self.label)
+        if stats['speed']:
+            metrics.observe('ffmpeg_speed', stats['speed'], label=self.label)
+        self._logger.debug(f"{self.label}: {stats['seconds']}s, {stats['fps']} fps, {stats['speed']}x")
+        return stats
+
+
+def _number(value: Optional[str]) -> Optional[float]:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def run_ffmpeg(cmd: List[str], label: str = "ffmpeg", timeout: Optional[float] = None,
+               project_config: Optional[Dict] = None) -> Dict[str, float]:
+    """Run an ffmpeg command to completion under the concurrency cap.
+
+    Args:
+        cmd: Full command line, starting with ``ffmpeg``
+        label: Name used in metrics and logs (e.g. ``concat``)
+        timeout: Seconds before the process is killed; defaults to
+            ``pipeline.ffmpeg.timeout_seconds``
+        project_config: Optional project configuration
+
+    Returns:
+        Throughput stats (see ``FFmpegProcess.wait``)
+
+    Raises:
+        FFmpegError: ffmpeg failed or timed out (a ``CalledProcessError``,
+            with the stderr tail in ``stderr``)
+        OSError: ffmpeg could not be started
+    """
+    with FFmpegProcess(cmd, label, timeout, project_config=project_config) as process:
+        return process.wait()
@@ -0,0 +1,174 @@
+"""Persistent history of provider call latencies, and estimates built from it."""
+
+import math
+from pathlib import Path
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, List, Optional
+from core.utils.config import config_for
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS latencies (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    provider TEXT NOT NULL,
+    model TEXT NOT NULL,
+    duration REAL,
+    resolution TEXT,
+    seconds REAL NOT NULL,
+    queue_seconds REAL,
+    run_seconds REAL,
+    download_seconds REAL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_latencies_model ON latencies (provider, model);
+"""
+
+# One connection per database file, shared by all threads behind a lock
+_connections: Dict[Path, sqlite3.Connection] = {}
+_lock = threading.Lock()
+
+
+def _store_path(project_config: Optional[Dict] = None) -> Path:
+    settings = config_for(project_config)
+    return Path(settings.get('development.latency_store', 'debug/latency_history.sqlite3'))
+
+
+def _connect(path: Path) -> sqlite3.Connection:
+    """Return the shared connection for ``path``; call with ``_lock`` held."""
+    resolved = path.resolve()
+    conn = _connections.get(resolved)
+    if conn is None:
+        resolved.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(str(resolved), check_same_thread=False, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(_SCHEMA)
+        _connections[resolved] = conn
+    return conn
+
+
+def record_latency(provider: str, model: str, seconds: float, duration: Optional[float] = None,
+                   resolution: Optional[str] = None, queue_seconds: Optional[float] = None,
+                   run_seconds: Optional[float] = None, download_seconds: Optional[float] = None,
+                   project_config: Optional[Dict] = None) -> None:
+    """Record how long a successful provider call took.
+
+    Args:
+        provider: Provider name (e.g. ``replicate``)
+        model: Model identifier
+        seconds: Wall-clock latency of the call, excluding the download
+        duration: Requested output duration in seconds, if applicable
+        resolution: Requested output resolution, if applicable
+        queue_seconds: Time spent waiting before the provider started work
+        run_seconds: Time the provider spent working
+        download_seconds: Time spent fetching the output
+        project_config: Optional merged project configuration
+    """
+    with _lock:
+        conn = _connect(_store_path(project_config))
+        with conn:
+            conn.execute(
+                "INSERT INTO latencies (provider, model, duration, resolution, seconds, queue_seconds, "
+                "run_seconds, download_seconds, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (provider, model, duration, resolution, seconds, queue_seconds, run_seconds,
+                 download_seconds, time.time())
+            )
+
+
+def get_latencies(provider: str, model: str, limit: int = 200,
+                  project_config: Optional[Dict] = None) -> List[float]:
+    """Return the most recent latencies for a model, newest first."""
+    path = _store_path(project_config)
+    if not path.exists():
+        return []
+    with _lock:
+        conn = _connect(path)
+        rows = conn.execute(
+            "SELECT seconds FROM latencies WHERE provider = ? AND model = ? ORDER BY id DESC LIMIT ?",
+            (provider, model, limit)
+        ).fetchall()
+    return [row[0] for row in rows]
+
+
+def latency_percentile(provider: str, model: str, percentile: float, min_samples: int = 5,
+                       limit: int = 200, project_config: Optional[Dict] = None) -> Optional[float]:
+    """Return a percentile of recent latencies for a model.
+
+    Args:
+        provider: Provider name
+        model: Model identifier
+        percentile: Percentile between 0 and 100
+        min_samples: Return None if fewer samples are recorded
+        limit: Number of most recent samples to consider
+        project_config: Optional merged project configuration
+
+    Returns:
+        Latency in seconds, or None without enough history
+    """
+    samples = sorted(get_latencies(provider, model, limit, project_config))
+    if len(samples) < max(1, min_samples):
+        return None
+    return _percentile(samples, percentile)
+
+
+def _percentile(sorted_samples: List[float], percentile: float) -> float:
+    """Nearest-rank percentile of a non-empty sorted list."""
+    rank = max(1, math.ceil(percentile / 100 * len(sorted_samples)))
+    return sorted_samples[min(rank, len(sorted_samples)) - 1]
+
+
+def estimate_latency(provider: str, model: str, duration: Optional[float] = None,
+                     resolution: Optional[str] = None, percentiles: Iterable[float] = (50, 90),
+                     min_samples: int = 3, limit: int = 200,
+                     project_config: Optional[Dict] = None) -> Optional[Dict[str, float]]:
+    """Estimate end-to-end latency (queue, run and download) from recorded calls.
+
+    Samples at the requested resolution are used when there are at least
+    ``min_samples`` of them, otherwise all samples for the model. Each
+    sample is scaled by the ratio of the requested to the recorded output
+    duration.
+
+    Args:
+        provider: Provider name
+        model: Model identifier
+        duration: Requested output duration in seconds
+        resolution: Requested output resolution
+        percentiles: Percentiles to report
+        min_samples: Return None if fewer samples are recorded
+        limit: Number of most recent samples to consider
+        project_config: Optional merged project configuration
+
+    Returns:
+        ``{'p50': seconds, 'p90': seconds, ..., 'samples': count}``, or
+        None without enough history
+    """
+    path = _store_path(project_config)
+    if not path.exists():
+        return None
+    with _lock:
+        conn = _connect(path)
+        rows = conn.execute(
+            "SELECT seconds, download_seconds, duration, resolution FROM latencies "
+            "WHERE provider = ? AND model = ? ORDER BY id DESC LIMIT ?",
+            (provider, model, limit)
+        ).fetchall()
+
+    if resolution is not None:
+        matching = [row for row in rows if row[3] == resolution]
+        if len(matching) >= min_samples:
+            rows = matching
+    if len(rows) < max(1, min_samples):
+        return None
+
+    samples = []
+    for seconds, download_seconds, recorded_duration, _ in rows:
+        total = seconds + (download_seconds or 0)
+        if duration and recorded_duration:
+            total *= duration / recorded_duration
+        samples.append(total)
+    samples.sort()
+
+    estimate = {f"p{p:g}": _percentile(samples, p) for p in percentiles}
+    estimate['samples'] = len(samples)
+    return estimate
@@ -0,0 +1,16 @@
+"""Check for optional dependencies without importing them."""
+
+import importlib.util
+
+
+def has_module(name: str) -> bool:
+    """Return True if ``name`` is importable, without importing it.
+
+    Provider SDKs (replicate, boto3, requests) take a large share of CLI
+    startup, so services record their availability with this at import time
+    and import them inside the functions that make live calls.
+    """
+    try:
+        return importlib.util.find_spec(name) is not None
+    except (ImportError, ValueError):
+        return False
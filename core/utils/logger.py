@@ -1,69 +1,210 @@
 """Centralized logging configuration for prompt2production."""
 
+import atexit
+import contextvars
+import json
 import logging
+import logging.handlers
+import queue
 import sys
+import threading
+import uuid
+from contextlib import contextmanager
 from pathlib import Path
 from datetime import datetime
-from typing import Optional
+from typing import Dict, List, Optional, Any
 
 from core.utils.config import config as global_config
 
 
+# Structured fields attached to every record emitted in the current context
+CONTEXT_FIELDS = ('run_id', 'project', 'stage', 'segment')
+_log_context: contextvars.ContextVar[Dict[str, Any]] = contextvars.ContextVar('log_context', default={})
+
+_log_queue: "queue.Queue[logging.LogRecord]" = queue.Queue(-1)
+_queue_handler: Optional[logging.Handler] = None
+_console_handler: Optional[logging.Handler] = None
+_listener: Optional[logging.handlers.QueueListener] = None
+_listener_lock = threading.Lock()
+
+
+class _ContextFilter(logging.Filter):
+    """Copy the current log context onto each record in the emitting thread."""
+    
+    def filter(self, record: logging.LogRecord) -> bool:
+        context = _log_context.get()
+        for field in CONTEXT_FIELDS:
+            if not hasattr(record, field):
+                setattr(record, field, context.get(field))
+        return True
+
+
+class _JsonLinesFormatter(logging.Formatter):
+    """Format records as one JSON object per line."""
+    
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'ts': datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for field in CONTEXT_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = value
+        return json.dumps(entry, default=str)
+
+
+class _ProjectFileHandler(logging.Handler):
+    """Route records to ``logs/projects/<project>/pipeline.log`` by their project field."""
+    
+    def __init__(self, log_dir: Path, formatter: logging.Formatter):
+        super().__init__(logging.DEBUG)
+        self._log_dir = log_dir
+        self._formatter = formatter
+        self._handlers: Dict[str, logging.FileHandler] = {}
+    
+    def emit(self, record: logging.LogRecord) -> None:
+        project = getattr(record, 'project', None)
+        if not project:
+            return
+        handler = self._handlers.get(project)
+        if handler is None:
+            project_log_dir = self._log_dir / "projects" / project
+            project_log_dir.mkdir(parents=True, exist_ok=True)
+            handler = logging.FileHandler(project_log_dir / "pipeline.log")
+            handler.setFormatter(self._formatter)
+            self._handlers[project] = handler
+        handler.handle(record)
+    
+    def close(self) -> None:
+        for handler in self._handlers.values():
+            handler.close()
+        self._handlers.clear()
+        super().close()
+
+
+def _start_listener() -> List[logging.Handler]:
+    """Create the shared handlers and the background writer thread for files.
+    
+    Console records are written synchronously, in the emitting thread, so
+    they stay in order with the CLI's ``print`` progress lines. File
+    records are only enqueued; their I/O happens on the listener thread,
+    so log calls never block on disk.
+    
+    Returns:
+        The console handler and the queue handler, to attach to a logger
+    """
+    global _queue_handler, _console_handler, _listener
+    with _listener_lock:
+        if _queue_handler is not None:
+            return [_console_handler, _queue_handler]
+        
+        # Create formatters
+        detailed_formatter = logging.Formatter(
+            '%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+            datefmt='%Y-%m-%d %H:%M:%S'
+        )
+        simple_formatter = logging.Formatter('%(levelname)s - %(message)s')
+        
+        # Console handler (simple format)
+        _console_handler = logging.StreamHandler(sys.stdout)
+        _console_handler.setLevel(logging.INFO)
+        _console_handler.setFormatter(simple_formatter)
+        handlers = []
+        
+        # Central log directory
+        log_dir = Path("logs")
+        log_dir.mkdir(exist_ok=True)
+        
+        # Main application log, opened once per process
+        app_log_path = log_dir / f"app_{datetime.now().strftime('%Y%m%d')}.log"
+        app_file_handler = logging.FileHandler(app_log_path)
+        app_file_handler.setLevel(logging.DEBUG)
+        app_file_handler.setFormatter(detailed_formatter)
+        handlers.append(app_file_handler)
+        
+        # Optional JSON lines log for separating concurrent runs
+        if global_config.get_bool('logging.json', False):
+            json_log_path = log_dir / f"app_{datetime.now().strftime('%Y%m%d')}.jsonl"
+            json_handler = logging.FileHandler(json_log_path)
+            json_handler.setLevel(logging.DEBUG)
+            json_handler.setFormatter(_JsonLinesFormatter())
+            handlers.append(json_handler)
+        
+        # Project-specific logs
+        handlers.append(_ProjectFileHandler(log_dir, detailed_formatter))
+        
+        _listener = logging.handlers.QueueListener(_log_queue, *handlers, respect_handler_level=True)
+        _listener.start()
+        atexit.register(shutdown_logging)
+        
+        _queue_handler = logging.handlers.QueueHandler(_log_queue)
+        _queue_handler.addFilter(_ContextFilter())
+        return [_console_handler, _queue_handler]
+
+
+def shutdown_logging() -> None:
+    """Flush queued records and stop the background writer thread."""
+    global _listener
+    with _listener_lock:
+        if _listener is not None:
+            _listener.stop()
+            for handler in _listener.handlers:
+                handler.close()
+            _listener = None
+
+
+def set_log_context(**fields: Any) -> None:
+    """Update structured log fields (run_id, project, stage, segment) for the current context."""
+    _log_context.set({**_log_context.get(), **fields})
+
+
+def get_log_context() -> Dict[str, Any]:
+    """Return the structured log fields for the current context."""
+    return dict(_log_context.get())
+
+
+@contextmanager
+def log_context(**fields: Any):
+    """Temporarily add structured log fields for the enclosed block."""
+    token = _log_context.set({**_log_context.get(), **fields})
+    try:
+        yield
+    finally:
+        _log_context.reset(token)
+
+
 def setup_logger(name: str, project_name: Optional[str] = None) -> logging.Logger:
     """Set up a logger with consistent formatting and output locations.
     
     Args:
         name: Logger name (usually __name__)
-        project_name: Optional project name for project-specific logging
+        project_name: Optional project name for project-specific logging;
+            binds the project field and a fresh run_id (project name plus
+            start time) for the current context
         
     Returns:
         Configured logger instance
     """
     logger = logging.getLogger(name)
     
+    if project_name:
+        run_id = f"{project_name}-{datetime.now().strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex[:6]}"
+        set_log_context(project=project_name, run_id=run_id)
+    
     # Don't add handlers if they already exist
     if logger.handlers:
         return logger
     
     # Set level from config
-    level = global_config.get('logging.level', 'INFO')
+    level = global_config.get_str('logging.level')
     logger.setLevel(getattr(logging, level))
     
-    # Create formatters
-    detailed_formatter = logging.Formatter(
-        '%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-        datefmt='%Y-%m-%d %H:%M:%S'
-    )
-    simple_formatter = logging.Formatter('%(levelname)s - %(message)s')
-    
-    # Console handler (simple format)
-    console_handler = logging.StreamHandler(sys.stdout)
-    console_handler.setLevel(logging.INFO)
-    console_handler.setFormatter(simple_formatter)
-    logger.addHandler(console_handler)
-    
-    # File handlers (detailed format)
-    # Central log directory
-    log_dir = Path("logs")
-    log_dir.mkdir(exist_ok=True)
-    
-    # Main application log
-    app_log_path = log_dir / f"app_{datetime.now().strftime('%Y%m%d')}.log"
-    app_file_handler = logging.FileHandler(app_log_path)
-    app_file_handler.setLevel(logging.DEBUG)
-    app_file_handler.setFormatter(detailed_formatter)
-    logger.addHandler(app_file_handler)
-    
-    # Project-specific log if project name provided
-    if project_name:
-        project_log_dir = log_dir / "projects" / project_name
-        project_log_dir.mkdir(parents=True, exist_ok=True)
-        
-        project_log_path = project_log_dir / "pipeline.log"
-        project_file_handler = logging.FileHandler(project_log_path)
-        project_file_handler.setLevel(logging.DEBUG)
-        project_file_handler.setFormatter(detailed_formatter)
-        logger.addHandler(project_file_handler)
+    # Every logger shares the console handler and one non-blocking queue handler
+    for handler in _start_listener():
+        logger.addHandler(handler)
     
     return logger
 
@@ -87,6 +228,8 @@ def log_step(logger: logging.Logger, step_num: int, step_name: str, details: Opt
     if details:
         message += f" - {details}"
     
+    # Later records in this context are tagged with the current stage
+    set_log_context(stage=step_name)
     logger.info(message)
 
 
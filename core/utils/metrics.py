@@ -0,0 +1,70 @@
+"""In-process counters and timings for pipeline runs."""
+
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+from core.utils.logger import get_log_context
+
+_Key = Tuple[str, Tuple[Tuple[str, Any], ...]]
+
+_counters: Dict[_Key, float] = {}
+_timings: Dict[_Key, Dict[str, float]] = {}
+_lock = threading.Lock()
+
+
+def _key(name: str, labels: Dict[str, Any]) -> _Key:
+    """Build a registry key, tagging it with the current run id."""
+    labels = {'run_id': get_log_context().get('run_id'), **labels}
+    return name, tuple(sorted(labels.items()))
+
+
+def increment(name: str, value: float = 1, **labels: Any) -> None:
+    """Add ``value`` to the counter ``name`` with the given labels."""
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def observe(name: str, value: float, **labels: Any) -> None:
+    """Record one measurement (e.g. a latency in seconds) for ``name``."""
+    key = _key(name, labels)
+    with _lock:
+        entry = _timings.get(key)
+        if entry is None:
+            _timings[key] = {'count': 1, 'sum': value, 'max': value}
+        else:
+            entry['count'] += 1
+            entry['sum'] += value
+            entry['max'] = max(entry['max'], value)
+
+
+def snapshot(run_id: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Return all counters and timings, optionally only those of one run.
+
+    Args:
+        run_id: Only include metrics recorded under this run id
+
+    Returns:
+        List of ``{'name', 'labels', 'value'}`` counters followed by
+        ``{'name', 'labels', 'count', 'sum', 'max'}`` timings
+    """
+    with _lock:
+        counters = list(_counters.items())
+        timings = [(key, dict(entry)) for key, entry in _timings.items()]
+
+    result = []
+    for (name, labels), value in counters:
+        labels = dict(labels)
+        if run_id is None or labels.get('run_id') == run_id:
+            result.append({'name': name, 'labels': labels, 'value': value})
+    for (name, labels), entry in timings:
+        labels = dict(labels)
+        if run_id is None or labels.get('run_id') == run_id:
+            result.append({'name': name, 'labels': labels, **entry})
+    return result
+
+
+def reset() -> None:
+    """Clear all recorded metrics."""
+    with _lock:
+        _counters.clear()
+        _timings.clear()
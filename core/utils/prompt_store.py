@@ -0,0 +1,134 @@
+"""Append-only store of LLM prompts and responses, indexed by run and stage."""
+
+from pathlib import Path
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional
+from core.utils.config import config_for
+from core.utils.logger import get_log_context
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS prompts (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    run_id TEXT,
+    stage TEXT,
+    segment INTEGER,
+    model TEXT,
+    prompt TEXT NOT NULL,
+    response TEXT,
+    latency_ms REAL,
+    input_tokens INTEGER,
+    output_tokens INTEGER,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_prompts_run ON prompts (run_id);
+CREATE INDEX IF NOT EXISTS idx_prompts_run_stage ON prompts (run_id, stage);
+"""
+
+# One connection per database file, shared by all threads behind a lock
+_connections: Dict[Path, sqlite3.Connection] = {}
+_lock = threading.Lock()
+
+
+def _store_path(project_config: Optional[Dict] = None) -> Path:
+    settings = config_for(project_config)
+    return Path(settings.get('development.prompt_store', 'debug/prompts.sqlite3'))
+
+
+def _connect(path: Path) -> sqlite3.Connection:
+    """Return the shared connection for ``path``; call with ``_lock`` held."""
+    resolved = path.resolve()
+    conn = _connections.get(resolved)
+    if conn is None:
+        resolved.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(str(resolved), check_same_thread=False, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(_SCHEMA)
+        _connections[resolved] = conn
+    return conn
+
+
+def record_prompt(
+    prompt: str,
+    response: Optional[str],
+    model: str,
+    latency: float,
+    input_tokens: Optional[int] = None,
+    output_tokens: Optional[int] = None,
+    project_config: Optional[Dict] = None
+) -> None:
+    """Append a prompt/response pair to the store.
+
+    The run id, stage and segment are taken from the current log context
+    (see ``set_log_context``), so callers only pass what they measured.
+
+    Args:
+        prompt: Prompt text sent to the model
+        response: Response text (None if the call failed)
+        model: Model identifier
+        latency: Wall-clock time of the call in seconds
+        input_tokens: Prompt token count, if reported
+        output_tokens: Completion token count, if reported
+        project_config: Optional merged project configuration
+    """
+    context = get_log_context()
+    row = (
+        context.get('run_id'),
+        context.get('stage'),
+        context.get('segment'),
+        model,
+        prompt,
+        response,
+        latency * 1000,
+        input_tokens,
+        output_tokens,
+        time.time(),
+    )
+    with _lock:
+        conn = _connect(_store_path(project_config))
+        with conn:
+            conn.execute(
+                "INSERT INTO prompts (run_id, stage, segment, model, prompt, response, latency_ms, "
+                "input_tokens, output_tokens, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                row
+            )
+
+
+def get_run_prompts(
+    run_id: str,
+    stage: Optional[str] = None,
+    limit: Optional[int] = None,
+    project_config: Optional[Dict] = None
+) -> List[Dict[str, Any]]:
+    """Return the prompts recorded for a run, oldest first.
+
+    Args:
+        run_id: Run identifier bound by ``setup_logger``
+        stage: Optional stage to filter on
+        limit: Maximum number of prompts to return
+        project_config: Optional merged project configuration
+
+    Returns:
+        List of prompt records as dictionaries
+    """
+    path = _store_path(project_config)
+    if not path.exists():
+        return []
+
+    query = "SELECT * FROM prompts WHERE run_id = ?"
+    params: List[Any] = [run_id]
+    if stage is not None:
+        query += " AND stage = ?"
+        params.append(stage)
+    query += " ORDER BY id"
+    if limit is not None:
+        query += " LIMIT ?"
+        params.append(limit)
+
+    with _lock:
+        conn = _connect(path)
+        cursor = conn.execute(query, params)
+        columns = [col[0] for col in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor.fetchall()]
@@ -0,0 +1,307 @@
+"""Token-bucket rate limiting for provider APIs, shared across threads and processes."""
+
+from contextlib import contextmanager
+from datetime import datetime, timezone
+import json
+import os
+from pathlib import Path
+import re
+import tempfile
+import threading
+from typing import Any, Callable, Dict, Iterator, Optional
+from core.utils.config import config_for
+from core.utils import clock
+
+try:  # pragma: no cover - not available on Windows
+    import fcntl
+    has_fcntl = True
+except ImportError:  # pragma: no cover - not available on Windows
+    fcntl = None
+    has_fcntl = False
+
+
+# Seconds between checks while waiting for an in-flight slot
+SLOT_POLL_INTERVAL = 0.05
+
+
+def parse_retry_after(value: Any) -> Optional[float]:
+    """Convert a ``Retry-After`` header (seconds or HTTP date) to seconds."""
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        pass
+    # Imported here: email.utils is slow to load and HTTP dates are rare
+    from email.utils import parsedate_to_datetime
+    try:
+        when = parsedate_to_datetime(str(value))
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+
+def retry_after_from_error(error: BaseException) -> Optional[float]:
+    """Find a ``Retry-After`` delay on a provider exception, if it carries one.
+
+    Understands ``requests`` HTTP errors, botocore ``ClientError`` and
+    exceptions exposing a ``response``/``headers`` attribute.
+    """
+    headers = None
+    response = getattr(error, 'response', None)
+    if isinstance(response, dict):
+        # botocore ClientError
+        headers = response.get('ResponseMetadata', {}).get('HTTPHeaders')
+    elif response is not None:
+        headers = getattr(response, 'headers', None)
+    if headers is None:
+        headers = getattr(error, 'headers', None)
+    if not headers:
+        return None
+    for key, value in headers.items():
+        if key.lower() == 'retry-after':
+            return parse_retry_after(value)
+    return None
+
+
+def _take(state: Dict[str, Any], bucket: str, cost: float, rate: float,
+          capacity: float, now: float) -> float:
+    """Try to take ``cost`` tokens from a bucket stored in ``state``.
+
+    Requests larger than the bucket may proceed once it is full and leave
+    it in debt, so they are delayed rather than rejected.
+
+    Returns:
+        0 if the tokens were taken, otherwise seconds to wait before retrying
+    """
+    blocked_until = state.get('blocked_until', 0.0)
+    if blocked_until > now:
+        return blocked_until - now
+
+    entry = state.setdefault(bucket, {'tokens': capacity, 'updated': now})
+    tokens = min(capacity, entry['tokens'] + (now - entry['updated']) * rate)
+    entry['updated'] = now
+    needed = min(cost, capacity)
+    if tokens >= needed:
+        entry['tokens'] = tokens - cost
+        return 0.0
+    entry['tokens'] = tokens
+    return (needed - tokens) / rate
+
+
+class RateLimiter:
+    """Limit request rate, characters per minute and in-flight calls for one provider.
+
+    With the ``thread`` backend state lives in this process. With the
+    ``file`` backend the bucket state is kept in a JSON file guarded by
+    ``flock`` and in-flight slots are lock files, so every process on the
+    machine shares the same budget and a crashed worker releases its
+    slots automatically.
+    """
+
+    def __init__(self, key: str, limits: Dict[str, Any], backend: str = "thread",
+                 lock_dir: Optional[Path] = None):
+        self.key = key
+        self.requests_per_second = float(limits.get('requests_per_second') or 0)
+        self.burst = float(limits.get('burst') or max(1.0, self.requests_per_second))
+        self.characters_per_minute = float(limits.get('characters_per_minute') or 0)
+        self.max_in_flight = int(limits.get('max_in_flight') or 0)
+        self.backend = backend if backend == "file" and has_fcntl else "thread"
+
+        self._lock = threading.Lock()
+        self._state: Dict[str, Any] = {}
+        self._slots = threading.BoundedSemaphore(self.max_in_flight) if self.max_in_flight else None
+
+        if self.backend == "file":
+            self._dir = Path(lock_dir or Path(tempfile.gettempdir()) / "prompt2production_ratelimits")
+            self._dir.mkdir(parents=True, exist_ok=True)
+            safe_key = re.sub(r'[^A-Za-z0-9_.-]', '_', key)
+            self._state_path = self._dir / f"{safe_key}.json"
+            self._lock_path = self._dir / f"{safe_key}.lock"
+            self._slot_prefix = f"{safe_key}.slot"
+
+    @contextmanager
+    def _locked_state(self) -> Iterator[Dict[str, Any]]:
+        """Yield the bucket state, writing it back on exit."""
+        with self._lock:
+            if self.backend == "thread":
+                yield self._state
+                return
+
+            with open(self._lock_path, 'a') as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    try:
+                        state = json.loads(self._state_path.read_text())
+                    except (OSError, ValueError):
+                        state = {}
+                    yield state
+                    tmp_path = self._state_path.with_suffix(f".{os.getpid()}.tmp")
+                    tmp_path.write_text(json.dumps(state))
+                    os.replace(tmp_path, self._state_path)
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _wait_for_tokens(self, characters: int) -> None:
+        while True:
+            with self._locked_state() as state:
+                now = clock.now()
+                wait = 0.0
+                if self.requests_per_second:
+                    wait = _take(state, 'requests', 1, self.requests_per_second, self.burst, now)
+                elif state.get('blocked_until', 0.0) > now:
+                    wait = state['blocked_until'] - now
+                if not wait and characters and self.characters_per_minute:
+                    wait = _take(state, 'characters', characters, self.characters_per_minute / 60,
+                                 self.characters_per_minute, now)
+                    if wait and self.requests_per_second:
+                        # Give back the request token taken above
+                        state['requests']['tokens'] += 1
+            if not wait:
+                return
+            clock.sleep(wait)
+
+    def _try_slot(self):
+        """Take a free in-flight slot without waiting; return its handle, or None if all are busy."""
+        if self.backend == "thread":
+            return self._slots if self._slots.acquire(blocking=False) else None
+        for i in range(self.max_in_flight):
+            slot_file = open(self._dir / f"{self._slot_prefix}{i}", 'a')
+            try:
+                fcntl.flock(slot_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return slot_file
+            except OSError:
+                slot_file.close()
+        return None
+
+    def _acquire_slot(self):
+        """Block until an in-flight slot is free and return a handle for it."""
+        if not self.max_in_flight:
+            return None
+        if self.backend == "thread":
+            if clock.get_clock().virtual:
+                # Poll on the clock so a blocked task does not stall simulated time
+                while not self._slots.acquire(blocking=False):
+                    clock.sleep(SLOT_POLL_INTERVAL)
+            else:
+                self._slots.acquire()
+            return self._slots
+
+        while True:
+            slot = self._try_slot()
+            if slot is not None:
+                return slot
+            clock.sleep(SLOT_POLL_INTERVAL)
+
+    def _release_slot(self, slot) -> None:
+        if slot is None:
+            return
+        if self.backend == "thread":
+            slot.release()
+        else:
+            fcntl.flock(slot, fcntl.LOCK_UN)
+            slot.close()
+
+    def wait(self, characters: int = 0) -> None:
+        """Wait for rate budget only, without taking an in-flight slot."""
+        self._wait_for_tokens(characters)
+
+    def try_reserve(self, characters: int = 0) -> Optional[Callable[[], None]]:
+        """Take an in-flight slot if one is free right now, then wait for rate budget.
+
+        Used for optional extra calls (e.g. a hedged duplicate of a running
+        prediction) that should be skipped rather than exceed
+        ``max_in_flight``.
+
+        Returns:
+            A callable that releases the slot, or None if every slot is busy
+        """
+        slot = None
+        if self.max_in_flight:
+            slot = self._try_slot()
+            if slot is None:
+                return None
+        try:
+            self._wait_for_tokens(characters)
+        except BaseException:
+            self._release_slot(slot)
+            raise
+        return lambda: self._release_slot(slot)
+
+    def block_for(self, seconds: float) -> None:
+        """Pause every caller of this limiter for ``seconds`` (e.g. from ``Retry-After``)."""
+        with self._locked_state() as state:
+            state['blocked_until'] = max(state.get('blocked_until', 0.0), clock.now() + seconds)
+
+    @contextmanager
+    def acquire(self, characters: int = 0) -> Iterator[None]:
+        """Wait for rate budget and an in-flight slot, then run the enclosed call.
+
+        If the call raises an error carrying a ``Retry-After`` header, all
+        callers sharing this limiter are held back for that long.
+
+        Args:
+            characters: Characters sent (counted against ``characters_per_minute``)
+        """
+        slot = self._acquire_slot()
+        try:
+            self._wait_for_tokens(characters)
+            yield
+        except Exception as e:
+            delay = retry_after_from_error(e)
+            if delay:
+                self.block_for(delay)
+            raise
+        finally:
+            self._release_slot(slot)
+
+
+# One limiter per provider/model key and backend, shared by all threads
+_limiters: Dict[tuple, RateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(provider: str, model: Optional[str] = None,
+                     project_config: Optional[Dict] = None) -> RateLimiter:
+    """Return the shared limiter for a provider, or for a model with its own limits.
+
+    Limits come from ``rate_limits.providers.<provider>``; an entry under
+    its ``models`` mapping overrides them for that model and gets a
+    separate budget.
+
+    Args:
+        provider: Provider name (``replicate``, ``elevenlabs``, ``bedrock``)
+        model: Optional model identifier
+        project_config: Optional merged project configuration
+
+    Returns:
+        RateLimiter instance
+    """
+    settings = config_for(project_config)
+    provider_limits = dict(settings.get(f'rate_limits.providers.{provider}', {}) or {})
+    model_limits = (provider_limits.pop('models', None) or {}).get(model) if model else None
+
+    key = provider
+    limits = provider_limits
+    if model_limits:
+        key = f"{provider}:{model}"
+        limits = {**provider_limits, **model_limits}
+
+    backend = settings.get('rate_limits.backend', 'thread')
+    lock_dir = settings.get('rate_limits.lock_dir')
+    run_clock = clock.get_clock()
+    if run_clock.virtual:
+        # Simulated time is private to one run: keep the budget in memory,
+        # and give each clock its own limiter
+        backend = 'thread'
+    cache_key = (key, backend, lock_dir, tuple(sorted(limits.items())),
+                 run_clock if run_clock.virtual else None)
+
+    with _limiters_lock:
+        limiter = _limiters.get(cache_key)
+        if limiter is None:
+            limiter = RateLimiter(key, limits, backend, Path(lock_dir) if lock_dir else None)
+            _limiters[cache_key] = limiter
+    return limiter
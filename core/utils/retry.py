@@ -0,0 +1,196 @@
+"""Retry policy with exponential backoff, jitter and error classification."""
+
+import random
+from typing import Any, Callable, Dict, Optional
+from core.utils.config import config_for
+from core.utils import clock
+from core.utils import metrics
+from core.utils.rate_limiter import retry_after_from_error
+
+# HTTP statuses worth retrying: timeouts, throttling and server errors
+RETRYABLE_STATUS = {408, 425, 429}
+
+# AWS error codes that indicate a transient condition
+RETRYABLE_AWS_CODES = {
+    'ThrottlingException', 'TooManyRequestsException', 'ServiceUnavailableException',
+    'InternalServerException', 'ModelTimeoutException', 'ModelNotReadyException',
+    'RequestTimeout', 'SlowDown',
+}
+
+# Errors that will fail the same way on every attempt
+FATAL_ERRORS = (ValueError, TypeError, KeyError, AttributeError, NotImplementedError, FileNotFoundError)
+
+
+class FatalError(Exception):
+    """Raised by callers to mark an error as not worth retrying."""
+
+
+class RetryableError(Exception):
+    """Raised by callers to mark an error as transient."""
+
+
+def _status_code(error: BaseException) -> Optional[int]:
+    """Return the HTTP status attached to a provider exception, if any."""
+    response = getattr(error, 'response', None)
+    if isinstance(response, dict):
+        status = response.get('ResponseMetadata', {}).get('HTTPStatusCode')
+    elif response is not None:
+        status = getattr(response, 'status_code', None)
+    else:
+        status = getattr(error, 'status', None) or getattr(error, 'status_code', None)
+    try:
+        return int(status) if status is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def is_retryable(error: BaseException) -> bool:
+    """Classify an exception as transient (retry) or fatal (give up).
+
+    Explicit ``RetryableError``/``FatalError`` markers win. After that, a
+    ``Retry-After`` header, AWS throttling codes, timeouts/connection
+    errors and HTTP 408/425/429/5xx are retryable. Other 4xx responses,
+    missing credentials and programming errors are fatal. Anything else
+    (e.g. a failed model prediction) is treated as transient.
+    """
+    if isinstance(error, RetryableError):
+        return True
+    if isinstance(error, FatalError):
+        return False
+    if retry_after_from_error(error) is not None:
+        return True
+
+    response = getattr(error, 'response', None)
+    if isinstance(response, dict):
+        code = response.get('Error', {}).get('Code')
+        if code in RETRYABLE_AWS_CODES:
+            return True
+
+    status = _status_code(error)
+    if status is not None:
+        return status in RETRYABLE_STATUS or status >= 500
+
+    name = type(error).__name__
+    if name in ('NoCredentialsError', 'PartialCredentialsError', 'ProfileNotFound'):
+        return False
+    if isinstance(error, (TimeoutError, ConnectionError)) or 'Timeout' in name or 'Connection' in name:
+        return True
+    if isinstance(error, FATAL_ERRORS):
+        return False
+    return True
+
+
+class RetryPolicy:
+    """How often and how long to retry a provider call.
+
+    ``max_elapsed`` caps the total time spent backing off between
+    attempts. Time inside an attempt is not counted; each call is bounded
+    by its own timeout (a Replicate prediction may run for
+    ``retry.timeout_minutes``).
+
+    Jitter is drawn from ``rng`` if given, otherwise from the installed
+    clock's generator, which a ``VirtualClock`` seeds so simulated runs
+    back off the same way every time.
+    """
+
+    def __init__(self, max_attempts: int = 3, base_delay: float = 1.0, max_delay: float = 60.0,
+                 multiplier: float = 2.0, jitter: bool = True, max_elapsed: float = 600.0,
+                 rng: Optional[random.Random] = None):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.multiplier = multiplier
+        self.jitter = jitter
+        self.max_elapsed = max_elapsed
+        self.rng = rng
+
+    @classmethod
+    def from_config(cls, provider: str, project_config: Optional[Dict] = None) -> 'RetryPolicy':
+        """Build a policy from ``retry`` with ``retry.providers.<provider>`` overrides."""
+        settings = config_for(project_config)
+        overrides = settings.get(f'retry.providers.{provider}', {}) or {}
+
+        def setting(key: str, default: Any) -> Any:
+            return overrides.get(key, settings.get(f'retry.{key}', default))
+
+        return cls(
+            max_attempts=int(setting('max_attempts', settings.get_int('retry.max_attempts'))),
+            base_delay=float(setting('delay_seconds', settings.get_float('retry.delay_seconds'))),
+            max_delay=float(setting('max_delay_seconds', 120)),
+            multiplier=float(setting('multiplier', 2.0)),
+            jitter=bool(setting('jitter', True)),
+            max_elapsed=float(setting('max_elapsed_seconds', 600)),
+        )
+
+    def delay(self, attempt: int) -> float:
+        """Backoff before retry number ``attempt`` (1-based), with full jitter."""
+        delay = min(self.max_delay, self.base_delay * self.multiplier ** (attempt - 1))
+        if not self.jitter:
+            return delay
+        return (self.rng or clock.get_clock().random).uniform(0, delay)
+
+
+def call_with_retry(fn: Callable[[], Any], policy: RetryPolicy, provider: str,
+                    operation: str, logger=None) -> Any:
+    """Call ``fn`` until it succeeds, a fatal error occurs or the policy is exhausted.
+
+    Every attempt is counted in ``metrics`` as ``provider_attempts`` with
+    an ``outcome`` label (success, retry, fatal, exhausted), and its
+    duration is observed as ``provider_latency_seconds``.
+
+    Args:
+        fn: Zero-argument callable performing one attempt
+        policy: Retry policy to apply
+        provider: Provider name for metrics and logs
+        operation: Operation name for metrics and logs
+        logger: Optional logger for retry messages
+
+    Returns:
+        The result of ``fn``
+
+    Raises:
+        The last exception raised by ``fn`` once retrying stops
+    """
+    start = clock.now()
+    attempt = 0
+    backed_off = 0.0
+    while True:
+        attempt += 1
+        attempt_start = clock.now()
+        try:
+            result = fn()
+        except Exception as e:
+            metrics.observe('provider_latency_seconds', clock.now() - attempt_start,
+                            provider=provider, operation=operation)
+            if not is_retryable(e):
+                metrics.increment('provider_attempts', provider=provider, operation=operation, outcome='fatal')
+                if logger:
+                    logger.error(f"{provider} {operation} failed with a non-retryable error: "
+                                 f"{type(e).__name__}: {str(e)}")
+                raise
+
+            delay = policy.delay(attempt)
+            retry_after = retry_after_from_error(e)
+            if retry_after is not None:
+                delay = max(delay, retry_after)
+
+            elapsed = clock.now() - start
+            if attempt >= policy.max_attempts or backed_off + delay > policy.max_elapsed:
+                metrics.increment('provider_attempts', provider=provider, operation=operation, outcome='exhausted')
+                if logger:
+                    logger.error(f"{provider} {operation} failed after {attempt} attempts "
+                                 f"in {elapsed:.1f}s: {type(e).__name__}: {str(e)}")
+                raise
+
+            metrics.increment('provider_attempts', provider=provider, operation=operation, outcome='retry')
+            if logger:
+                logger.warning(f"{provider} {operation} attempt {attempt}/{policy.max_attempts} failed "
+                               f"({type(e).__name__}: {str(e)}); retrying in {delay:.1f}s")
+            clock.sleep(delay)
+            backed_off += delay
+            continue
+
+        metrics.observe('provider_latency_seconds', clock.now() - attempt_start,
+                        provider=provider, operation=operation)
+        metrics.increment('provider_attempts', provider=provider, operation=operation, outcome='success')
+        return result
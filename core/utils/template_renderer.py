@@ -2,11 +2,89 @@
 
 from pathlib import Path
 import re
+import tempfile
+import threading
+from typing import Any, Dict, Tuple
+from core.utils.lazy_imports import has_module
 
-try:  # pragma: no cover - optional dependency
-    from jinja2 import Template
-except ModuleNotFoundError:  # pragma: no cover - optional dependency
-    Template = None
+# Jinja2 is imported when the first template is compiled
+has_jinja2 = has_module('jinja2')
+
+
+# Fallback ``{{ var }}`` pattern, compiled once
+_VAR_PATTERN = re.compile(r"{{\s*(\w+)\s*}}")
+
+# Process-wide cache of compiled templates: resolved path -> (mtime_ns, template)
+_template_cache: Dict[Path, Tuple[int, Any]] = {}
+_cache_lock = threading.Lock()
+_environment = None
+
+
+def _get_environment():
+    """Return the shared Jinja2 environment, creating it on first use.
+
+    Compiled template bytecode is cached on disk so new processes skip the
+    parse/compile step for templates they have already seen.
+    """
+    global _environment
+    if _environment is None:
+        from jinja2 import BaseLoader, Environment, FileSystemBytecodeCache, TemplateNotFound
+
+        class _PathLoader(BaseLoader):
+            """Jinja2 loader that treats template names as absolute file paths."""
+
+            def get_source(self, environment, template):
+                path = Path(template)
+                if not path.exists():
+                    raise TemplateNotFound(template)
+                mtime = path.stat().st_mtime_ns
+                return path.read_text(), str(path), lambda: path.exists() and path.stat().st_mtime_ns == mtime
+
+        cache_dir = Path(tempfile.gettempdir()) / "prompt2production_jinja_cache"
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        _environment = Environment(
+            loader=_PathLoader(),
+            bytecode_cache=FileSystemBytecodeCache(str(cache_dir)),
+            auto_reload=True,
+        )
+    return _environment
+
+
+def _compile(path: Path) -> Any:
+    """Compile the template at ``path`` into a renderable object."""
+    if has_jinja2:
+        return _get_environment().get_template(str(path))
+
+    # Convert ``{{ var }}`` to ``{var}`` once so rendering is a single format call
+    return _VAR_PATTERN.sub(lambda m: f"{{{m.group(1)}}}", path.read_text())
+
+
+def get_template(path: Path) -> Any:
+    """Return the compiled template for ``path``.
+
+    Templates are cached per process and keyed by path and modification
+    time, so editing a template on disk invalidates its cache entry
+    automatically.
+    """
+    resolved = Path(path).resolve()
+    mtime = resolved.stat().st_mtime_ns
+
+    cached = _template_cache.get(resolved)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+
+    with _cache_lock:
+        cached = _template_cache.get(resolved)
+        if cached is None or cached[0] != mtime:
+            cached = (mtime, _compile(resolved))
+            _template_cache[resolved] = cached
+    return cached[1]
+
+
+def clear_template_cache() -> None:
+    """Drop all compiled templates held by this process."""
+    with _cache_lock:
+        _template_cache.clear()
 
 
 def render_template(path: Path, context: dict) -> str:
@@ -16,10 +94,8 @@ def render_template(path: Path, context: dict) -> str:
     replacement is performed so the pipeline can run without extra
     dependencies.
     """
-    text = path.read_text()
-    if Template is not None:
-        return Template(text).render(**context)
+    template = get_template(path)
+    if has_jinja2:
+        return template.render(**context)
 
-    pattern = re.compile(r"{{\s*(\w+)\s*}}")
-    sanitized = pattern.sub(lambda m: f"{{{m.group(1)}}}", text)
-    return sanitized.format(**context)
+    return template.format(**context)
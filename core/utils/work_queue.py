@@ -0,0 +1,463 @@
+"""Shared job queue with leases and heartbeats, for spreading work over worker processes.
+
+A job is a dict with ``id``, ``run_id``, ``kind``, ``payload`` (JSON),
+``state`` (``pending``, ``running``, ``done`` or ``failed``),
+``attempts``, ``worker``, ``lease_until``, ``result`` and ``error``.
+
+Workers ``claim`` a job, which leases it to them for ``lease_seconds``,
+and keep the lease alive with ``heartbeat`` while they work. A job whose
+lease runs out (its worker died or hung) is handed to the next worker
+that asks, until ``max_attempts`` claims have been used.
+
+Two backends share this interface:
+
+* ``sqlite``: one database file. Safe for processes on one host.
+* ``file``: one JSON file per job, moved between state directories under
+  an ``flock``. Works for hosts sharing a filesystem with working
+  ``flock`` (local disks, NFSv4).
+"""
+
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+import json
+import os
+from pathlib import Path
+import socket
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+from core.utils.config import config_for
+
+try:  # pragma: no cover - not available on Windows
+    import fcntl
+    has_fcntl = True
+except ImportError:  # pragma: no cover - not available on Windows
+    fcntl = None
+    has_fcntl = False
+
+
+FINISHED_STATES = ('done', 'failed')
+
+
+def default_worker_id() -> str:
+    """``host:pid``, unique across the machines sharing a queue."""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class WorkQueue(ABC):
+    """Interface shared by the queue backends."""
+
+    def __init__(self, lease_seconds: float = 300, max_attempts: int = 3):
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+
+    @abstractmethod
+    def put(self, run_id: str, kind: str, jobs: Iterable[Tuple[str, Dict]]) -> None:
+        """Add ``(job_id, payload)`` jobs for a run."""
+
+    @abstractmethod
+    def claim(self, worker: str, kinds: Optional[List[str]] = None,
+              run_id: Optional[str] = None) -> Optional[Dict]:
+        """Lease the oldest available job to ``worker``, or return None if there is none.
+
+        Args:
+            worker: Worker id recorded on the job
+            kinds: Only claim jobs of these kinds
+            run_id: Only claim jobs of this run
+        """
+
+    @abstractmethod
+    def heartbeat(self, job_id: str, worker: str) -> bool:
+        """Extend the lease on a job; False if ``worker`` no longer holds it."""
+
+    @abstractmethod
+    def complete(self, job_id: str, worker: str, result: Any = None) -> bool:
+        """Mark a job done; False (and nothing changes) if ``worker`` lost its lease."""
+
+    @abstractmethod
+    def fail(self, job_id: str, worker: str, error: str, retry: bool = True) -> bool:
+        """Record a failed attempt.
+
+        The job goes back to ``pending`` while attempts remain and
+        ``retry`` is set, otherwise it is marked ``failed``.
+        """
+
+    @abstractmethod
+    def jobs(self, run_id: str) -> List[Dict]:
+        """Every job of a run, in the order they were added."""
+
+    @abstractmethod
+    def purge(self, run_id: str) -> None:
+        """Remove every job of a run."""
+
+    def _claimable(self, job: Dict, now: float) -> bool:
+        return job['state'] == 'pending' or (job['state'] == 'running' and job['lease_until'] < now)
+
+    def _take(self, job: Dict, worker: str, now: float) -> bool:
+        """Lease ``job`` to ``worker`` in place; False if its attempts are used up."""
+        if job['attempts'] >= self.max_attempts:
+            job.update(state='failed', lease_until=None,
+                       error=job.get('error') or f"Lease expired on {job['worker']}")
+            return False
+        job.update(state='running', worker=worker, attempts=job['attempts'] + 1,
+                   lease_until=now + self.lease_seconds)
+        return True
+
+    def _after_failure(self, job: Dict, error: str, retry: bool) -> None:
+        retry = retry and job['attempts'] < self.max_attempts
+        job.update(state='pending' if retry else 'failed', lease_until=None, error=error)
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    id TEXT NOT NULL UNIQUE,
+    run_id TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    state TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    worker TEXT,
+    lease_until REAL,
+    result TEXT,
+    error TEXT,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_state ON jobs (state, seq);
+CREATE INDEX IF NOT EXISTS idx_jobs_run ON jobs (run_id);
+"""
+
+_COLUMNS = ('id', 'run_id', 'kind', 'payload', 'state', 'attempts', 'worker', 'lease_until', 'result', 'error')
+
+
+class SQLiteWorkQueue(WorkQueue):
+    """Queue stored in one SQLite database; claims run in ``BEGIN IMMEDIATE`` transactions."""
+
+    def __init__(self, path: Path, lease_seconds: float = 300, max_attempts: int = 3):
+        super().__init__(lease_seconds, max_attempts)
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, timeout=30,
+                                     isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._conn
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    @staticmethod
+    def _row(row) -> Dict:
+        job = dict(zip(_COLUMNS, row))
+        job['payload'] = json.loads(job['payload'])
+        job['result'] = json.loads(job['result']) if job['result'] is not None else None
+        return job
+
+    def _save(self, conn: sqlite3.Connection, job: Dict) -> None:
+        conn.execute(
+            "UPDATE jobs SET state = ?, attempts = ?, worker = ?, lease_until = ?, result = ?, error = ?, "
+            "updated_at = ? WHERE id = ?",
+            (job['state'], job['attempts'], job['worker'], job['lease_until'],
+             json.dumps(job['result']) if job['result'] is not None else None, job['error'],
+             time.time(), job['id'])
+        )
+
+    def _held(self, conn: sqlite3.Connection, job_id: str, worker: str) -> Optional[Dict]:
+        row = conn.execute(f"SELECT {', '.join(_COLUMNS)} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = self._row(row)
+        return job if job['state'] == 'running' and job['worker'] == worker else None
+
+    def put(self, run_id: str, kind: str, jobs: Iterable[Tuple[str, Dict]]) -> None:
+        now = time.time()
+        with self._transaction() as conn:
+            conn.executemany(
+                "INSERT INTO jobs (id, run_id, kind, payload, state, updated_at) VALUES (?, ?, ?, ?, 'pending', ?)",
+                [(job_id, run_id, kind, json.dumps(payload, default=str), now) for job_id, payload in jobs]
+            )
+
+    def claim(self, worker: str, kinds: Optional[List[str]] = None,
+              run_id: Optional[str] = None) -> Optional[Dict]:
+        now = time.time()
+        query = (f"SELECT {', '.join(_COLUMNS)} FROM jobs WHERE (state = 'pending' OR "
+                 f"(state = 'running' AND lease_until < ?))")
+        params: List[Any] = [now]
+        if kinds:
+            query += f" AND kind IN ({', '.join('?' * len(kinds))})"
+            params.extend(kinds)
+        if run_id is not None:
+            query += " AND run_id = ?"
+            params.append(run_id)
+        query += " ORDER BY seq LIMIT 1"
+
+        with self._transaction() as conn:
+            while True:
+                row = conn.execute(query, params).fetchone()
+                if row is None:
+                    return None
+                job = self._row(row)
+                taken = self._take(job, worker, now)
+                self._save(conn, job)
+                if taken:
+                    return job
+
+    def heartbeat(self, job_id: str, worker: str) -> bool:
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET lease_until = ?, updated_at = ? WHERE id = ? AND state = 'running' AND worker = ?",
+                (time.time() + self.lease_seconds, time.time(), job_id, worker)
+            )
+            return cursor.rowcount == 1
+
+    def complete(self, job_id: str, worker: str, result: Any = None) -> bool:
+        with self._transaction() as conn:
+            job = self._held(conn, job_id, worker)
+            if job is None:
+                return False
+            job.update(state='done', lease_until=None, result=result, error=None)
+            self._save(conn, job)
+            return True
+
+    def fail(self, job_id: str, worker: str, error: str, retry: bool = True) -> bool:
+        with self._transaction() as conn:
+            job = self._held(conn, job_id, worker)
+            if job is None:
+                return False
+            self._after_failure(job, error, retry)
+            self._save(conn, job)
+            return True
+
+    def jobs(self, run_id: str) -> List[Dict]:
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {', '.join(_COLUMNS)} FROM jobs WHERE run_id = ? ORDER BY seq", (run_id,)
+            ).fetchall()
+        return [self._row(row) for row in rows]
+
+    def purge(self, run_id: str) -> None:
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM jobs WHERE run_id = ?", (run_id,))
+
+
+class FileWorkQueue(WorkQueue):
+    """Queue stored as JSON files in ``pending/``, ``running/`` and ``finished/``.
+
+    Every change happens under an exclusive ``flock`` on ``queue.lock``,
+    and files are written to a temporary name and renamed into place, so
+    readers never see a partial job.
+    """
+
+    def __init__(self, directory: Path, lease_seconds: float = 300, max_attempts: int = 3):
+        if not has_fcntl:
+            raise RuntimeError("The file work queue needs fcntl (not available on this platform)")
+        super().__init__(lease_seconds, max_attempts)
+        self.directory = Path(directory)
+        for state in ('pending', 'running', 'finished'):
+            (self.directory / state).mkdir(parents=True, exist_ok=True)
+        self._lock_path = self.directory / "queue.lock"
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def _locked(self) -> Iterator[None]:
+        with self._lock, open(self._lock_path, 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _dir(self, state: str) -> Path:
+        return self.directory / ('finished' if state in FINISHED_STATES else state)
+
+    def _read(self, path: Path) -> Optional[Dict]:
+        try:
+            return json.loads(path.read_text())
+        except (OSError, ValueError):
+            return None
+
+    def _write(self, job: Dict, previous_state: Optional[str] = None) -> None:
+        """Write ``job`` into its state directory and drop the copy in the old one."""
+        path = self._dir(job['state']) / job['file']
+        tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+        tmp_path.write_text(json.dumps(job, default=str))
+        os.replace(tmp_path, path)
+        if previous_state is not None and self._dir(previous_state) != self._dir(job['state']):
+            try:
+                (self._dir(previous_state) / job['file']).unlink()
+            except FileNotFoundError:
+                pass
+
+    def _find(self, job_id: str) -> Optional[Dict]:
+        for state in ('running', 'pending', 'finished'):
+            for path in (self.directory / state).glob(f"*--{job_id}.json"):
+                return self._read(path)
+        return None
+
+    def put(self, run_id: str, kind: str, jobs: Iterable[Tuple[str, Dict]]) -> None:
+        with self._locked():
+            # Nanosecond prefix keeps files in the order they were added
+            base = time.time_ns()
+            for offset, (job_id, payload) in enumerate(jobs):
+                job = {'id': job_id, 'run_id': run_id, 'kind': kind, 'payload': payload,
+                       'state': 'pending', 'attempts': 0, 'worker': None, 'lease_until': None,
+                       'result': None, 'error': None, 'file': f"{base + offset:020d}--{job_id}.json"}
+                self._write(job)
+
+    def claim(self, worker: str, kinds: Optional[List[str]] = None,
+              run_id: Optional[str] = None) -> Optional[Dict]:
+        now = time.time()
+        with self._locked():
+            candidates = sorted((self.directory / 'running').glob('*.json'))
+            candidates += sorted((self.directory / 'pending').glob('*.json'))
+            for path in candidates:
+                job = self._read(path)
+                if job is None or not self._claimable(job, now):
+                    continue
+                if (kinds and job['kind'] not in kinds) or (run_id is not None and job['run_id'] != run_id):
+                    continue
+                previous = job['state']
+                taken = self._take(job, worker, now)
+                self._write(job, previous)
+                if taken:
+                    return job
+        return None
+
+    def _update_held(self, job_id: str, worker: str, changes) -> bool:
+        with self._locked():
+            job = self._find(job_id)
+            if job is None or job['state'] != 'running' or job['worker'] != worker:
+                return False
+            changes(job)
+            self._write(job, 'running')
+            return True
+
+    def heartbeat(self, job_id: str, worker: str) -> bool:
+        return self._update_held(job_id, worker,
+                                 lambda job: job.update(lease_until=time.time() + self.lease_seconds))
+
+    def complete(self, job_id: str, worker: str, result: Any = None) -> bool:
+        return self._update_held(job_id, worker,
+                                 lambda job: job.update(state='done', lease_until=None, result=result, error=None))
+
+    def fail(self, job_id: str, worker: str, error: str, retry: bool = True) -> bool:
+        return self._update_held(job_id, worker, lambda job: self._after_failure(job, error, retry))
+
+    def jobs(self, run_id: str) -> List[Dict]:
+        # Reads need no lock: files are replaced atomically. A job moving
+        # between directories mid-scan can show up twice; keep the
+        # furthest-along copy.
+        found: Dict[str, Dict] = {}
+        order = {'pending': 0, 'running': 1, 'done': 2, 'failed': 2}
+        for state in ('pending', 'running', 'finished'):
+            for path in (self.directory / state).glob('*.json'):
+                job = self._read(path)
+                if job is None or job['run_id'] != run_id:
+                    continue
+                current = found.get(job['id'])
+                if current is None or order[job['state']] >= order[current['state']]:
+                    found[job['id']] = job
+        return sorted(found.values(), key=lambda job: job['file'])
+
+    def purge(self, run_id: str) -> None:
+        with self._locked():
+            for job in self.jobs(run_id):
+                try:
+                    (self._dir(job['state']) / job['file']).unlink()
+                except FileNotFoundError:
+                    pass
+
+
+def open_work_queue(project_config: Optional[Dict] = None) -> Optional[WorkQueue]:
+    """Open the queue configured under ``pipeline.work_queue``, or return None when it is off."""
+    settings = config_for(project_config)
+    backend = settings.get('pipeline.work_queue.backend', 'none')
+    if not backend or backend == 'none':
+        return None
+    lease = float(settings.get('pipeline.work_queue.lease_seconds', 300))
+    attempts = int(settings.get('pipeline.work_queue.max_attempts', 3))
+    path = Path(settings.get('pipeline.work_queue.path', 'queue/render_queue')).expanduser()
+    if backend == 'sqlite':
+        return SQLiteWorkQueue(path.with_suffix('.sqlite3'), lease, attempts)
+    if backend == 'file':
+        return FileWorkQueue(path, lease, attempts)
+    raise ValueError(f"Unknown pipeline.work_queue.backend: {backend!r} (expected none, sqlite or file)")
+
+
+def _keep_alive(queue: WorkQueue, job: Dict, worker: str, interval: float, done: threading.Event,
+                logger=None) -> None:
+    while not done.wait(interval):
+        if not queue.heartbeat(job['id'], worker):
+            if logger:
+                logger.warning(f"Lost the lease on job {job['id']}; another worker may take it over")
+            return
+
+
+def serve(queue: WorkQueue, handlers: Dict[str, Any], worker: Optional[str] = None,
+          stop: Optional[threading.Event] = None, run_id: Optional[str] = None,
+          poll_interval: float = 1.0, heartbeat_interval: float = 30.0,
+          idle_exit: Optional[float] = None, logger=None) -> int:
+    """Claim and run jobs until ``stop`` is set (or the queue stays empty for ``idle_exit`` seconds).
+
+    Each job is passed to ``handlers[job['kind']]`` with its payload; the
+    return value is stored as the job's result. A heartbeat thread keeps
+    the lease alive while the handler runs. Errors the retry module
+    classifies as transient put the job back for another attempt.
+
+    Args:
+        queue: Queue to pull from
+        handlers: Handler function per job kind
+        worker: Worker id (defaults to ``host:pid``)
+        stop: Event that ends the loop once the current job is finished
+        run_id: Only take jobs of this run
+        poll_interval: Seconds to wait when no job is available
+        heartbeat_interval: Seconds between lease renewals
+        idle_exit: Return after this many seconds without a job
+        logger: Optional logger
+
+    Returns:
+        Number of jobs handled
+    """
+    from core.utils.retry import is_retryable
+    worker = worker or default_worker_id()
+    stop = stop or threading.Event()
+    handled = 0
+    idle_since = time.time()
+    while not stop.is_set():
+        job = queue.claim(worker, list(handlers), run_id)
+        if job is None:
+            if idle_exit is not None and time.time() - idle_since >= idle_exit:
+                break
+            stop.wait(poll_interval)
+            continue
+
+        done = threading.Event()
+        heartbeat = threading.Thread(target=_keep_alive, name=f"heartbeat-{job['id']}",
+                                     args=(queue, job, worker, heartbeat_interval, done, logger), daemon=True)
+        heartbeat.start()
+        try:
+            result = handlers[job['kind']](job['payload'])
+        except Exception as e:
+            retry = is_retryable(e)
+            if logger:
+                logger.error(f"Job {job['id']} failed on attempt {job['attempts']}: {type(e).__name__}: {e}")
+            queue.fail(job['id'], worker, f"{type(e).__name__}: {e}", retry=retry)
+        else:
+            if not queue.complete(job['id'], worker, result) and logger:
+                logger.warning(f"Job {job['id']} finished after its lease was taken over; result dropped")
+        finally:
+            done.set()
+            heartbeat.join()
+        handled += 1
+        idle_since = time.time()
+    return handled
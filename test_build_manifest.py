@@ -0,0 +1,118 @@
+"""How edits to a finished run map onto segments and clips for ``--rebuild``."""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from core.chains.build_manifest import (
+    load_manifest, parse_storyboard, plan_rebuild, retext_segments, stale_segments, write_manifest
+)
+from core.chains.segment_visualizer import create_storyboard_summary
+from core.utils.config import config
+
+MODEL = "test/model"
+TEXTS = [
+    "Wifi sends data over radio waves.",
+    "Your router talks to every device.",
+    "Each device listens on a channel.",
+]
+
+
+def _segments():
+    segments = []
+    for i, text in enumerate(TEXTS):
+        segments.append({
+            'index': i + 1, 'text': text, 'words': len(text.split()), 'duration': 5,
+            'start_time': i * 5, 'end_time': (i + 1) * 5,
+            'visual_prompt': f"Scene {i + 1}: a glowing router\n**Camera:** slow pan",
+            'visual_theme': "neon",
+        })
+    # Scene 3 reuses scene 1's clip (see visual_dedup)
+    segments[2].update(reuse_of=1, reuse_similarity=0.95, reuse_source_duration=5, reuse_action='reuse')
+    return segments
+
+
+def _build(tmp_path):
+    """Write the artifacts and manifest of a finished three-segment run."""
+    segments = _segments()
+    script = " ".join(TEXTS)
+    (tmp_path / "full_script.txt").write_text(script)
+    (tmp_path / "storyboard.md").write_text(create_storyboard_summary(segments))
+    clips = []
+    for segment in segments:
+        clip = tmp_path / "segments" / f"segment_{segment['index']:02d}.mp4"
+        clip.parent.mkdir(exist_ok=True)
+        clip.write_bytes(b"clip")
+        clips.append(str(clip))
+    project = config.merge_project_config({'output_dir': str(tmp_path), 'video_model': MODEL})
+    write_manifest(tmp_path, project, script, segments, clips, None, None, None, str(tmp_path / "final.mp4"))
+    return load_manifest(tmp_path)
+
+
+def test_word_inserted_at_boundary_stays_with_the_segment_before():
+    new = retext_segments(TEXTS, " ".join(TEXTS).replace("waves. Your", "waves. Fast. Your"))
+    assert new == ["Wifi sends data over radio waves. Fast.", TEXTS[1], TEXTS[2]]
+
+
+def test_replacement_spanning_two_segments_is_shared_out():
+    script = " ".join(TEXTS).replace("every device. Each device", "each laptop, phone and console; each one")
+    new = retext_segments(TEXTS, script)
+    assert new[0] == TEXTS[0]
+    assert new[1] != TEXTS[1] and new[2] != TEXTS[2]
+    assert new[1].startswith("Your router talks to each")
+    assert new[2].endswith("listens on a channel.")
+    assert " ".join(new) == script
+
+
+def test_unchanged_script_keeps_every_segment():
+    assert retext_segments(TEXTS, "\n".join(TEXTS)) == TEXTS
+
+
+def test_parse_storyboard_keeps_multiline_prompts():
+    prompts = parse_storyboard(create_storyboard_summary(_segments()))
+    assert prompts[2] == "Scene 2: a glowing router\n**Camera:** slow pan"
+    assert sorted(prompts) == [1, 2, 3]
+
+
+def test_storyboard_prompt_edit_is_detected(tmp_path):
+    manifest = _build(tmp_path)
+    storyboard = tmp_path / "storyboard.md"
+    storyboard.write_text(storyboard.read_text().replace("Scene 2: a glowing router", "Scene 2: a busy cafe"))
+
+    plan = plan_rebuild(manifest, tmp_path)
+    assert not plan['script_changed']
+    assert plan['text_changed'] == set()
+    assert plan['prompt_edited'] == {2}
+    assert plan['segments'][1]['visual_prompt'] == "Scene 2: a busy cafe\n**Camera:** slow pan"
+    assert stale_segments(plan['segments'], manifest, tmp_path, MODEL, plan['prompt_edited']) == {2}
+
+
+def test_script_edit_marks_only_the_edited_segment(tmp_path):
+    manifest = _build(tmp_path)
+    (tmp_path / "full_script.txt").write_text(" ".join(TEXTS).replace("every device", "each laptop"))
+
+    plan = plan_rebuild(manifest, tmp_path)
+    assert plan['script_changed']
+    assert plan['text_changed'] == {2}
+    assert plan['segments'][1]['text'] == "Your router talks to each laptop."
+    assert plan['segments'][1]['words'] == 6
+
+
+def test_reused_segment_is_rendered_when_its_source_goes_stale(tmp_path):
+    manifest = _build(tmp_path)
+    storyboard = tmp_path / "storyboard.md"
+    storyboard.write_text(storyboard.read_text().replace("Scene 1: a glowing router", "Scene 1: a satellite"))
+
+    plan = plan_rebuild(manifest, tmp_path)
+    segments = plan['segments']
+    assert stale_segments(segments, manifest, tmp_path, MODEL, plan['prompt_edited']) == {1, 3}
+    assert 'reuse_of' not in segments[2]
+
+
+def test_missing_clip_is_stale(tmp_path):
+    manifest = _build(tmp_path)
+    (tmp_path / "segments" / "segment_02.mp4").write_bytes(b"")
+
+    plan = plan_rebuild(manifest, tmp_path)
+    assert stale_segments(plan['segments'], manifest, tmp_path, MODEL, set()) == {2}
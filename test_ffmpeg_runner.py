@@ -0,0 +1,62 @@
+"""Timeouts of ffmpeg processes whose output is read as it is produced."""
+
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from core.services.video_composer import _mux_to_stream
+from core.utils.config import load_profile
+from core.utils.ffmpeg_runner import FFmpegTimeout
+from core.utils.logger import setup_logger
+
+# Stands in for a mux that writes some output and then stalls
+STALLED = [sys.executable, "-c", "import sys, time; sys.stdout.write('moov'); sys.stdout.flush(); time.sleep(60)"]
+FINISHED = [sys.executable, "-c", "import sys; sys.stdout.write('moov' * 1000)"]
+
+
+def _project(timeout: float) -> dict:
+    return load_profile(overrides={'pipeline.ffmpeg.timeout_seconds': timeout}).merge_project_config({})
+
+
+def test_stalled_mux_is_killed_while_its_output_is_read(tmp_path):
+    received = []
+
+    def sink(fileobj, path):
+        while True:
+            chunk = fileobj.read(4096)
+            if not chunk:
+                break
+            received.append(chunk)
+
+    started = time.time()
+    with pytest.raises(FFmpegTimeout):
+        _mux_to_stream(STALLED, tmp_path / "final.mp4", sink, setup_logger(__name__), _project(0.5))
+    assert time.time() - started < 10
+    assert b"".join(received) == b"moov"
+    assert (tmp_path / "final.mp4").read_bytes() == b"moov"
+
+
+def test_stalled_sink_is_abandoned_at_the_deadline(tmp_path):
+    never = threading.Event()
+
+    def sink(fileobj, path):
+        fileobj.read(4)
+        never.wait()
+
+    started = time.time()
+    with pytest.raises(FFmpegTimeout):
+        _mux_to_stream(FINISHED, tmp_path / "final.mp4", sink, setup_logger(__name__), _project(0.5))
+    assert time.time() - started < 10
+
+
+def test_finished_mux_keeps_the_local_copy(tmp_path):
+    def sink(fileobj, path):
+        fileobj.read(4)
+
+    _mux_to_stream(FINISHED, tmp_path / "final.mp4", sink, setup_logger(__name__), _project(30))
+    assert (tmp_path / "final.mp4").read_bytes() == b"moov" * 1000
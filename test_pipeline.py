@@ -74,4 +74,130 @@ def test_basic_functionality():
         print(f"✗ basic functionality test failed: {e}")
         return False
     
-    return True 
\ No newline at end of file
+    return True 
+
+def test_render_template():
+    """Render a shipped template with whichever renderer is installed."""
+    from core.utils.template_renderer import render_template
+
+    template = Path(__file__).parent / "core" / "templates" / "vo_prompt.jinja"
+    prompt = render_template(template, {
+        "technical_topic": "DNS",
+        "metaphor_world": "a library",
+        "narrator_style": "calm",
+        "tone": "friendly",
+        "scene_count": 3,
+        "index": 1,
+    })
+    assert "DNS" in prompt
+    assert "{{" not in prompt
+
+
+def test_long_form_stub_run(tmp_path, monkeypatch):
+    """A long-form run in stub mode, configured the way the CLI does, produces a video and dashboard."""
+    from cli.build_project import build_project_from_dict
+
+    # Logs and other relative paths land in the temporary directory
+    monkeypatch.chdir(tmp_path)
+    output_dir = tmp_path / "output"
+    build_project_from_dict({
+        "project_name": "long_form_smoke",
+        "technical_topic": "how wifi works",
+        "total_duration": 60,
+        "segment_duration": 5,
+        "segments": 12,
+        "long_form": True,
+        "output_dir": str(output_dir),
+    }, overrides={
+        'development.use_stubs': True,
+        'development.stub_delay': 0,
+        'development.prompt_store': str(tmp_path / "prompts.sqlite3"),
+        'development.latency_store': str(tmp_path / "latency.sqlite3"),
+        'pipeline.long_form.chapter_duration': 30,
+    })
+    assert (output_dir / "final_video.mp4").exists()
+    assert (output_dir / "dashboard.html").exists()
+    assert len((output_dir / "segments.jsonl").read_text().splitlines()) == 12
+
+
+def test_preview_dashboard_is_written_before_composition(tmp_path, monkeypatch):
+    """With the preview on, the dashboard exists while segments are still rendering."""
+    from cli import build_project
+
+    monkeypatch.chdir(tmp_path)
+    output_dir = tmp_path / "output"
+    seen = []
+    compose = build_project.compose_video_segments
+
+    def compose_and_check(*args, **kwargs):
+        seen.append((output_dir / "dashboard.html").exists())
+        return compose(*args, **kwargs)
+
+    monkeypatch.setattr(build_project, 'compose_video_segments', compose_and_check)
+    build_project.build_project_from_dict({
+        "project_name": "preview_smoke",
+        "technical_topic": "how wifi works",
+        "total_duration": 15,
+        "segment_duration": 5,
+        "output_dir": str(output_dir),
+    }, overrides={
+        'development.use_stubs': True,
+        'development.stub_delay': 0,
+        'development.prompt_store': str(tmp_path / "prompts.sqlite3"),
+        'development.latency_store': str(tmp_path / "latency.sqlite3"),
+        'pipeline.preview.enabled': True,
+    })
+    assert seen == [True]
+    assert 'data-preview-src="preview/preview.mp4"' in (output_dir / "dashboard.html").read_text()
+
+
+def test_slow_attempts_do_not_use_up_the_retry_budget():
+    """A render that times out after minutes still gets all its attempts."""
+    from core.utils.clock import VirtualClock, use_clock
+    from core.utils.retry import RetryPolicy, RetryableError, call_with_retry
+
+    calls = []
+    virtual = VirtualClock(start=0)
+
+    def attempt():
+        calls.append(virtual.time())
+        virtual.advance(600)
+        if len(calls) < 3:
+            raise RetryableError("prediction timed out")
+        return "clip"
+
+    with use_clock(virtual):
+        result = call_with_retry(attempt, RetryPolicy(max_attempts=3, max_elapsed=300), 'replicate', 'render')
+    assert result == "clip"
+    assert len(calls) == 3
+
+
+def test_short_clip_is_padded_to_its_narration(tmp_path, monkeypatch):
+    """A clip the model capped below its narration holds its last frame."""
+    from core.services import video_composer
+
+    clips = []
+    for i in range(2):
+        clip = tmp_path / f"segment_{i + 1:02d}.mp4"
+        clip.write_bytes(b"clip")
+        clips.append(str(clip))
+    lengths = {clips[0]: 6.0, clips[1]: 5.0}
+    calls = []
+
+    def fake_run_ffmpeg(cmd, operation, **kwargs):
+        calls.append(operation)
+        if operation == 'concat':
+            calls.append((tmp_path / "segments.txt").read_text())
+        Path(cmd[-1]).write_bytes(b"video")
+
+    monkeypatch.setattr(video_composer, 'validate_video_file', lambda path: True)
+    monkeypatch.setattr(video_composer, 'probe_duration', lambda path: lengths[path])
+    monkeypatch.setattr(video_composer, 'run_ffmpeg', fake_run_ffmpeg)
+    info = [{'duration': 9, 'narration_seconds': 8.4}, {'duration': 5, 'narration_seconds': 4.6}]
+    video_composer.compose_video_segments(clips, str(tmp_path / "voice.mp3"), info, str(tmp_path / "final.mp4"))
+
+    assert calls[0] == 'pad_clip'
+    concat_list = calls[2]
+    assert f"{tmp_path / 'padded' / 'segment_01.mp4'}'\n" in concat_list
+    assert f"{clips[1]}'\noutpoint 4.600\n" in concat_list
+    assert not (tmp_path / "padded").exists()
@@ -0,0 +1,119 @@
+"""Lease, retry and ownership rules shared by the work queue backends."""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from core.utils import work_queue
+from core.utils.work_queue import FileWorkQueue, SQLiteWorkQueue
+
+LEASE = 60
+
+
+class _FakeTime:
+    """Stands in for the ``time`` module so leases expire on demand."""
+
+    def __init__(self):
+        self.now = 1_000_000.0
+        self._ticks = 0
+
+    def time(self) -> float:
+        return self.now
+
+    def time_ns(self) -> int:
+        self._ticks += 1
+        return int(self.now * 1e9) + self._ticks
+
+    def advance(self, seconds: float) -> None:
+        self.now += seconds
+
+
+@pytest.fixture
+def fake_time(monkeypatch):
+    fake = _FakeTime()
+    monkeypatch.setattr(work_queue, 'time', fake)
+    return fake
+
+
+@pytest.fixture(params=['sqlite', 'file'])
+def make_queue(request, tmp_path):
+    def _make(max_attempts: int = 3):
+        if request.param == 'sqlite':
+            return SQLiteWorkQueue(tmp_path / "queue.sqlite3", LEASE, max_attempts)
+        return FileWorkQueue(tmp_path / "queue", LEASE, max_attempts)
+    return _make
+
+
+def _job(queue, job_id: str):
+    return next(job for job in queue.jobs('run') if job['id'] == job_id)
+
+
+def test_expired_lease_is_taken_over(make_queue, fake_time):
+    queue = make_queue()
+    queue.put('run', 'render', [('job-1', {'n': 1})])
+    assert queue.claim('a')['id'] == 'job-1'
+    assert queue.claim('b') is None
+
+    fake_time.advance(LEASE + 1)
+    job = queue.claim('b')
+    assert (job['id'], job['worker'], job['attempts']) == ('job-1', 'b', 2)
+    assert not queue.heartbeat('job-1', 'a')
+    assert queue.complete('job-1', 'b', {'bytes': 10})
+    assert _job(queue, 'job-1')['state'] == 'done'
+
+
+def test_heartbeat_keeps_the_lease(make_queue, fake_time):
+    queue = make_queue()
+    queue.put('run', 'render', [('job-1', {})])
+    queue.claim('a')
+    fake_time.advance(LEASE - 1)
+    assert queue.heartbeat('job-1', 'a')
+    fake_time.advance(LEASE - 1)
+    assert queue.claim('b') is None
+
+
+def test_max_attempts_exhausted_by_expired_leases(make_queue, fake_time):
+    queue = make_queue(max_attempts=2)
+    queue.put('run', 'render', [('job-1', {})])
+    assert queue.claim('a') is not None
+    fake_time.advance(LEASE + 1)
+    assert queue.claim('b') is not None
+    fake_time.advance(LEASE + 1)
+
+    assert queue.claim('c') is None
+    job = _job(queue, 'job-1')
+    assert job['state'] == 'failed'
+    assert job['attempts'] == 2
+    assert job['error'] == "Lease expired on b"
+
+
+def test_complete_after_losing_the_lease_returns_false(make_queue, fake_time):
+    queue = make_queue()
+    queue.put('run', 'render', [('job-1', {})])
+    queue.claim('a')
+    fake_time.advance(LEASE + 1)
+    queue.claim('b')
+
+    assert not queue.complete('job-1', 'a', {'bytes': 1})
+    assert not queue.fail('job-1', 'a', "too late")
+    job = _job(queue, 'job-1')
+    assert (job['state'], job['worker'], job['result']) == ('running', 'b', None)
+
+
+def test_failed_attempts_retry_until_exhausted(make_queue, fake_time):
+    queue = make_queue(max_attempts=2)
+    queue.put('run', 'render', [('job-1', {}), ('job-2', {})])
+
+    queue.claim('a', run_id='run')
+    assert queue.fail('job-1', 'a', "transient")
+    assert _job(queue, 'job-1')['state'] == 'pending'
+    assert queue.claim('a')['id'] == 'job-1'
+    assert queue.fail('job-1', 'a', "transient again")
+    assert _job(queue, 'job-1')['state'] == 'failed'
+
+    assert queue.claim('a')['id'] == 'job-2'
+    assert queue.fail('job-2', 'a', "fatal", retry=False)
+    assert _job(queue, 'job-2')['state'] == 'failed'